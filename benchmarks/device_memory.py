@@ -0,0 +1,146 @@
+"""
+Measure the memory and construction cost of the device model.
+
+Usage:
+    python benchmarks/device_memory.py [--devices 5000] [--events 10000]
+
+Builds a synthetic account of `--devices` devices shaped like the
+get_object_list response, plus `--events` camera events, once with the
+current `Device`/`Event` classes and once with an equivalent of the previous
+model that copied every API field into the instance `__dict__`. Reports the
+memory retained by the objects (excluding the API dictionaries themselves,
+which both models share) and the time taken to build them.
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from wyzeapy.types import Device, Event
+
+
+class LegacyModel:
+    """The previous model: every API field copied into `__dict__`."""
+
+    def __init__(self, dictionary: Dict[Any, Any]):
+        self.available = False
+        self.raw_dict = dictionary
+        for k, v in dictionary.items():
+            setattr(self, k, v)
+
+
+def make_device(index: int) -> Dict[str, Any]:
+    mac = f"2CAA8E{index:06X}"
+    return {
+        "mac": mac,
+        "product_type": "Light",
+        "product_model": "WLPA19",
+        "nickname": f"Light {index}",
+        "hardware_ver": "0.0.0.0",
+        "firmware_ver": "1.2.0.250",
+        "user_role": 1,
+        "binding_user_nickname": "owner",
+        "conn_state": 1,
+        "conn_state_ts": 1700000000000 + index,
+        "push_switch": 1,
+        "device_params": {
+            "ip": f"10.0.{index // 256 % 256}.{index % 256}",
+            "rssi": "-55",
+            "ssid": "home",
+            "switch_state": 1,
+        },
+        "is_in_auto": 0,
+        "event_master_switch": 1,
+        "parent_device_mac": "",
+        "parent_device_enr": "",
+        "enr": "x" * 16,
+        "binding_ts": 1600000000000,
+        "first_binding_ts": 1600000000000,
+        "first_activation_ts": 1600000000000,
+        "product_model_logo_url": "https://example.invalid/logo.png",
+        "timezone_name": "America/Chicago",
+        "is_sharing_account": False,
+        "device_sort_id": index,
+        "p2p_id": "",
+        "p2p_type": 0,
+        "is_fanl_device": 0,
+        "is_in_group": 0,
+    }
+
+
+def make_event(index: int) -> Dict[str, Any]:
+    return {
+        "event_id": f"event{index}",
+        "device_mac": f"2CAA8E{index % 50:06X}",
+        "device_model": "WYZE_CAKP2JFUS",
+        "event_category": 1,
+        "event_value": "13",
+        "event_ts": 1700000000000 + index,
+        "event_ack_result": 0,
+        "is_feedback_correct": 0,
+        "is_feedback_face": 0,
+        "is_feedback_person": 0,
+        "file_list": [],
+        "event_params": {},
+        "recognized_instance_list": [],
+        "tag_list": [101],
+        "read_state": 0,
+        "event_seq": index,
+        "main_event_type": 1,
+        "alarm_type": 0,
+    }
+
+
+def measure(factory: Callable[[Dict[Any, Any]], Any], raws: List[Dict[str, Any]]):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    objects = [factory(raw) for raw in raws]
+    elapsed = time.perf_counter() - started
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return retained, elapsed
+
+
+def report(name: str, count: int, legacy, current):
+    (legacy_bytes, legacy_time), (bytes_, time_) = legacy, current
+    print(f"{name} ({count} objects)")
+    print(
+        f"  legacy:  {legacy_bytes / 1024:9.1f} KiB "
+        f"({legacy_bytes / count:6.0f} B/object), built in {legacy_time * 1000:7.2f} ms"
+    )
+    print(
+        f"  current: {bytes_ / 1024:9.1f} KiB "
+        f"({bytes_ / count:6.0f} B/object), built in {time_ * 1000:7.2f} ms"
+    )
+    print(f"  memory saved: {1 - bytes_ / legacy_bytes:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=10000)
+    args = parser.parse_args()
+
+    devices = [make_device(i) for i in range(args.devices)]
+    events = [make_event(i) for i in range(args.events)]
+
+    report(
+        "Device",
+        args.devices,
+        measure(LegacyModel, devices),
+        measure(Device, devices),
+    )
+    report(
+        "Event",
+        args.events,
+        measure(LegacyModel, events),
+        measure(Event, events),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Measure the cost of reconciling irrigation zones with schedule runs.
+
+Usage:
+    python benchmarks/irrigation_runs.py [--zones 16] [--runs 500] [--idle 2]
+                                         [--repeat 20]
+
+Builds a synthetic controller with `--zones` zones and a schedule_runs history
+of `--runs` past schedules, each watering a few zones, plus one running and a
+few upcoming schedules. `--idle` of the zones never appear in the history
+(e.g. disabled zones). Times three ways of applying the history to the zones:
+
+* legacy: the previous nested loops over schedules, zone runs and zones,
+  parsing timestamps on every visit
+* full: a fresh `ZoneRunIndex` merging the whole history in one pass
+* incremental: an index that already merged the history, merging a response
+  with one new past schedule
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from wyzeapy.services.irrigation_service import (
+    Irrigation,
+    IrrigationService,
+    Zone,
+    _parse_utc,
+)
+from wyzeapy.types import DeviceTypes
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def utc(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def make_schedule(index: int, watered: int, state: str = "past") -> Dict[str, Any]:
+    start = START + timedelta(hours=12 * index)
+    zone_runs = []
+    for offset in range(4):
+        zone_start = start + timedelta(minutes=10 * offset)
+        zone_runs.append(
+            {
+                "zone_number": (index * 3 + offset) % watered + 1,
+                "start_utc": utc(zone_start),
+                "end_utc": utc(zone_start + timedelta(minutes=10)),
+                "duration": 600,
+            }
+        )
+    return {
+        "schedule_id": f"schedule{index}",
+        "schedule_state": state,
+        "schedule_name": f"Schedule {index % 7}",
+        "start_utc": utc(start),
+        "end_utc": zone_runs[-1]["end_utc"],
+        "zone_runs": zone_runs,
+    }
+
+
+def make_history(watered: int, runs: int) -> List[Dict[str, Any]]:
+    """Most recent first, like the API."""
+    upcoming = [make_schedule(runs + 1 + i, watered, "upcoming") for i in range(3)]
+    running = [make_schedule(runs, watered, "running")]
+    past = [make_schedule(i, watered) for i in reversed(range(runs))]
+    return upcoming + running + past
+
+
+def make_irrigation(zones: int) -> Irrigation:
+    irrigation = Irrigation(
+        {
+            "mac": "BS_WK1_BENCH",
+            "product_model": "BS_WK1",
+            "product_type": DeviceTypes.IRRIGATION.value,
+        }
+    )
+    irrigation.zones = [
+        Zone({"zone_number": i + 1, "name": f"Zone {i + 1}"}) for i in range(zones)
+    ]
+    return irrigation
+
+
+def legacy_apply(irrigation: Irrigation, response: Dict[str, Any]) -> None:
+    """The reconciliation before the zone-run index."""
+    for zone in irrigation.zones:
+        zone.is_running = False
+        zone.remaining_time = 0
+    schedules = response.get("data", {}).get("schedules", [])
+    now = datetime.now(timezone.utc)
+    for schedule in schedules:
+        if schedule.get("schedule_state") == "running":
+            end_utc_str = schedule.get("end_utc")
+            if end_utc_str:
+                datetime.fromisoformat(end_utc_str.replace("Z", "+00:00"))
+                for zone_run in schedule.get("zone_runs", []):
+                    zone_number = zone_run.get("zone_number")
+                    zone_end_utc = zone_run.get("end_utc")
+                    if zone_end_utc:
+                        zone_end_time = datetime.fromisoformat(
+                            zone_end_utc.replace("Z", "+00:00")
+                        )
+                        zone_remaining = int((zone_end_time - now).total_seconds())
+                        for zone in irrigation.zones:
+                            if zone.zone_number == zone_number:
+                                if zone_remaining > 0:
+                                    zone.is_running = True
+                                    zone.remaining_time = zone_remaining
+                                break
+    past_schedules = [s for s in schedules if s.get("schedule_state") == "past"]
+    for zone in irrigation.zones:
+        for schedule in past_schedules:
+            for zone_run in schedule.get("zone_runs", []):
+                if zone_run.get("zone_number") == zone.zone_number:
+                    zone_end_utc = zone_run.get("end_utc")
+                    if zone_end_utc:
+                        zone.last_watered = zone_end_utc
+                        break
+            if zone.last_watered:
+                break
+    upcoming = [s for s in schedules if s.get("schedule_state") == "upcoming"]
+    if upcoming:
+        irrigation.next_scheduled_run = upcoming[0].get("start_utc")
+    if past_schedules:
+        irrigation.last_run_end_time = past_schedules[0].get("end_utc")
+
+
+def measure(run: Callable[[], None], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=16)
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--idle", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    watered = args.zones - args.idle
+    history = make_history(watered, args.runs)
+    response = {"data": {"schedules": history}}
+
+    def legacy():
+        legacy_apply(make_irrigation(args.zones), response)
+
+    def full():
+        _parse_utc.cache_clear()
+        IrrigationService._apply_running_status(make_irrigation(args.zones), response)
+
+    merged = make_irrigation(args.zones)
+    IrrigationService._apply_running_status(merged, response)
+    newest = make_schedule(args.runs + 10, watered)
+    next_response = {"data": {"schedules": [newest] + history[:-1]}}
+
+    def incremental():
+        # Alternate so that every call has exactly one unmerged schedule
+        merged.zone_runs._merged.discard(newest["schedule_id"])
+        IrrigationService._apply_running_status(merged, next_response)
+
+    print(
+        f"{args.zones} zones ({args.idle} idle), {args.runs} past schedules "
+        f"(best of {args.repeat})"
+    )
+    baseline = measure(legacy, args.repeat)
+    for name, seconds in (
+        ("legacy", baseline),
+        ("full", measure(full, args.repeat)),
+        ("incremental", measure(incremental, args.repeat)),
+    ):
+        print(f"  {name:12} {seconds * 1000:8.3f} ms  {baseline / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
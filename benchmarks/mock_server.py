@@ -0,0 +1,347 @@
+"""
+Local stand-in for the Wyze cloud endpoints used by wyzeapy.
+
+Usage:
+    python benchmarks/mock_server.py [--port 8080] [--devices 100]
+        [--latency 0.02] [--jitter 0.01] [--error-rate 0.0]
+
+The server answers on every path regardless of the host the client meant to
+reach, so a client only has to rewrite the scheme and host of its requests;
+`redirect_to()` returns a request pipeline stage that does exactly that:
+
+```python
+server = MockWyzeServer(fleet_size=100, latency=0.02)
+base_url = await server.start()
+wyze = await Wyzeapy.create(middlewares=[redirect_to(base_url)])
+```
+
+It keeps per-device state, so commands sent through set_property_list or
+run_action_list are visible to the next get_property_list. Latency (uniform
+in `latency ± jitter`) is added to every response, and a fraction
+`error_rate` of responses is replaced by an HTTP 500 carrying an API error in
+the envelope of the endpoint that was called.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+from wyzeapy.pipeline import Handler, Middleware, Request
+from wyzeapy.types import PropertyIDs
+
+INJECTED_ERROR = "Injected error"
+
+# Fleet mix by fraction of the device count: (product_type, product_model)
+FLEET_MIX = [
+    (0.4, "Light", "WLPA19"),
+    (0.2, "MeshLight", "WLPA19C"),
+    (0.2, "Plug", "WLPP1CFH"),
+    (0.1, "Lock", "YD.LO1"),
+    (0.1, "Common", "BS_WK1"),
+]
+
+
+def make_fleet(size: int) -> List[Dict[str, Any]]:
+    """Build the device list of a synthetic account with `size` devices."""
+    fleet = []
+    for share, product_type, product_model in FLEET_MIX:
+        for _ in range(max(1, round(size * share))):
+            if len(fleet) == size:
+                break
+            index = len(fleet)
+            mac = f"{product_model}.{index:08X}"
+            fleet.append(
+                {
+                    "mac": mac,
+                    "nickname": f"{product_type} {index}",
+                    "product_type": product_type,
+                    "product_model": product_model,
+                    "firmware_ver": "1.2.0.250",
+                    "hardware_ver": "0.0.0.0",
+                    "conn_state": 1,
+                    "push_switch": 1,
+                    "enr": "b" * 16,
+                    "device_params": {
+                        "ip": f"10.0.{index // 256 % 256}.{index % 256}",
+                        "rssi": "-55",
+                        "switch_state": 0,
+                    },
+                    "timezone_name": "America/Chicago",
+                }
+            )
+    return fleet
+
+
+class MockWyzeServer:
+    """aiohttp server imitating the Wyze cloud for a synthetic account.
+
+    Attributes:
+        fleet: Raw device list returned by get_object_list.
+        latency: Mean seconds added to every response.
+        jitter: Maximum deviation from `latency`, in seconds.
+        error_rate: Fraction of responses replaced by an API error.
+        request_count: Requests served, by path.
+    """
+
+    def __init__(
+        self,
+        fleet_size: int = 100,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = 0,
+    ):
+        self.fleet = make_fleet(fleet_size)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.request_count: Dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._state: Dict[str, Dict[str, str]] = {
+            device["mac"]: {
+                PropertyIDs.ON.value: "0",
+                PropertyIDs.AVAILABLE.value: "1",
+                PropertyIDs.BRIGHTNESS.value: "100",
+                PropertyIDs.COLOR_TEMP.value: "2700",
+                PropertyIDs.COLOR.value: "FFFFFF",
+            }
+            for device in self.fleet
+        }
+        self._routes: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            "/api/user/login": self._login,
+            "/app/user/refresh_token": self._refresh_token,
+            "/app/v2/home_page/get_object_list": self._get_object_list,
+            "/app/v2/device/get_property_list": self._get_property_list,
+            "/app/v2/device/set_property_list": self._set_property_list,
+            "/app/v2/auto/run_action_list": self._run_action_list,
+            "/plugin/irrigation/get_iot_prop": self._irrigation_iot_prop,
+            "/plugin/irrigation/zone": self._irrigation_zones,
+            "/plugin/irrigation/schedule_runs": self._irrigation_schedule_runs,
+            "/openapi/lock/v1/info": self._lock_info,
+        }
+        self._runner: Optional[web.AppRunner] = None
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self._handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving on the running loop and return the base URL."""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        path = "/" + request.match_info["path"]
+        self.request_count[path] = self.request_count.get(path, 0) + 1
+        route = self._routes.get(path)
+        if route is None:
+            return web.json_response({"code": "1", "msg": "", "data": {}})
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(
+                max(0.0, self._random.uniform(-1, 1) * self.jitter + self.latency)
+            )
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            return web.json_response(
+                {
+                    "code": "5000",
+                    "errorCode": 5000,
+                    "ErrNo": 5000,
+                    "status": 500,
+                    "msg": INJECTED_ERROR,
+                    "response": {"errors": [{"message": INJECTED_ERROR}]},
+                },
+                status=500,
+            )
+
+        if request.can_read_body:
+            body = await request.json()
+        else:
+            body = {}
+        body.update(request.query)
+        return web.json_response(route(body))
+
+    # Endpoint handlers
+
+    @staticmethod
+    def _login(body):
+        return {
+            "access_token": "bench-access-token",
+            "refresh_token": "bench-refresh-token",
+            "user_id": "bench-user",
+        }
+
+    @staticmethod
+    def _refresh_token(body):
+        return {
+            "code": "1",
+            "msg": "",
+            "data": {
+                "access_token": "bench-access-token",
+                "refresh_token": "bench-refresh-token",
+            },
+        }
+
+    def _get_object_list(self, body):
+        return {"code": "1", "msg": "", "data": {"device_list": self.fleet}}
+
+    def _get_property_list(self, body):
+        state = self._state.get(body.get("device_mac"), {})
+        return {
+            "code": "1",
+            "msg": "",
+            "data": {
+                "property_list": [
+                    {"pid": pid, "value": value} for pid, value in state.items()
+                ]
+            },
+        }
+
+    def _apply(self, mac: str, plist: List[Dict[str, Any]]):
+        state = self._state.setdefault(mac, {})
+        for item in plist:
+            state[item["pid"]] = str(item.get("pvalue", item.get("value")))
+
+    def _set_property_list(self, body):
+        self._apply(body.get("device_mac"), body.get("property_list", []))
+        return {"code": "1", "msg": "", "data": {}}
+
+    def _run_action_list(self, body):
+        for action in body.get("action_list", []):
+            for target in action["action_params"]["list"]:
+                self._apply(target["mac"], target["plist"])
+        return {"code": "1", "msg": "", "data": {}}
+
+    @staticmethod
+    def _irrigation_iot_prop(body):
+        return {
+            "code": 1,
+            "data": {
+                "props": {
+                    "iot_state": "connected",
+                    "RSSI": -60,
+                    "IP": "10.0.0.50",
+                    "sn": "SN-" + body.get("did", ""),
+                    "ssid": "home",
+                }
+            },
+        }
+
+    @staticmethod
+    def _irrigation_zones(body):
+        return {
+            "code": 1,
+            "data": {
+                "zones": [
+                    {
+                        "zone_number": number,
+                        "name": f"Zone {number}",
+                        "enabled": True,
+                        "zone_id": f"zone-{number}",
+                        "smart_duration": 600,
+                    }
+                    for number in range(1, 9)
+                ]
+            },
+        }
+
+    @staticmethod
+    def _irrigation_schedule_runs(body):
+        now = time.time()
+        schedules = []
+        for index in range(int(body.get("limit", 10))):
+            start = now - (index + 1) * 86400
+            schedules.append(
+                {
+                    "schedule_state": "past",
+                    "start_utc": _iso(start),
+                    "end_utc": _iso(start + 3600),
+                    "zone_runs": [
+                        {
+                            "zone_number": zone,
+                            "start_utc": _iso(start + (zone - 1) * 450),
+                            "end_utc": _iso(start + zone * 450),
+                        }
+                        for zone in range(1, 9)
+                    ],
+                }
+            )
+        return {"code": 1, "data": {"schedules": schedules}}
+
+    @staticmethod
+    def _lock_info(body):
+        return {
+            "ErrNo": 0,
+            "device": {
+                "uuid": body.get("uuid"),
+                "onoff_line": 1,
+                "door_open_status": 0,
+                "trash_mode": 0,
+                "locker_status": {"hardlock": 1},
+            },
+        }
+
+
+def _iso(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def redirect_to(base_url: str) -> Middleware:
+    """Return a pipeline stage sending every request to `base_url` instead."""
+    base = urlsplit(base_url)
+
+    async def redirect(request: Request, handler: Handler) -> Dict[Any, Any]:
+        url = urlsplit(request.url)
+        request.url = url._replace(scheme=base.scheme, netloc=base.netloc).geturl()
+        return await handler(request)
+
+    return redirect
+
+
+async def _serve(args) -> None:
+    server = MockWyzeServer(
+        fleet_size=args.devices,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    base_url = await server.start(port=args.port)
+    print(f"Serving {len(server.fleet)} devices on {base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
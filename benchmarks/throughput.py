@@ -0,0 +1,269 @@
+"""
+Offline throughput benchmark for wyzeapy.
+
+Usage:
+    python benchmarks/throughput.py [--fleet-sizes 10,100,1000]
+        [--latency 0.02] [--jitter 0.01] [--error-rate 0.0] [--json out.json]
+
+For every fleet size a `MockWyzeServer` is started in a separate process (so
+that its work does not count against the client) and the following scenarios
+are run against it through the real library:
+
+* login: create a client, log in and close it, `--logins` times
+* discovery: fetch the device list, `--discoveries` times
+* poll: one full poll cycle over every bulb, plug, lock and irrigation
+  controller of the account
+* burst: turn every bulb on and off again, all commands issued at once
+
+Each scenario reports the HTTP requests it made, requests/sec, p50 and p99
+request latency as seen by the client, client CPU time, and the memory the
+client allocated (peak, measured in a second run with tracemalloc enabled so
+that tracing does not distort the timings).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import statistics
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List
+
+from mock_server import INJECTED_ERROR, MockWyzeServer, redirect_to
+
+from wyzeapy import Wyzeapy
+from wyzeapy.pipeline import Handler, Request
+from wyzeapy.services.base_service import BaseService
+
+CREDENTIALS = ("bench@example.com", "password", "key-id", "api-key")
+
+
+class Recorder:
+    """Pipeline stage recording the latency and outcome of every request.
+
+    A request counts as an error when it raised or when the server answered
+    with an injected error.
+    """
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def reset(self):
+        self.latencies = []
+        self.errors = 0
+
+    async def __call__(self, request: Request, handler: Handler) -> Dict[Any, Any]:
+        started = time.perf_counter()
+        try:
+            response = await handler(request)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+        if response.get("msg") == INJECTED_ERROR:
+            self.errors += 1
+        return response
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+class Benchmark:
+    def __init__(self, base_url: str, args):
+        self.base_url = base_url
+        self.args = args
+        self.recorder = Recorder()
+
+    def client(self) -> Wyzeapy:
+        # Every request goes to the mock server's single host; without this
+        # the per-host rate limit rather than the library would be measured
+        return Wyzeapy(
+            middlewares=[redirect_to(self.base_url), self.recorder], rate_limit=None
+        )
+
+    async def login(self):
+        for _ in range(self.args.logins):
+            async with self.client() as wyze:
+                try:
+                    await wyze.login(*CREDENTIALS)
+                except Exception:
+                    pass  # Counted by the recorder
+
+    async def logged_in_client(self) -> Wyzeapy:
+        """Log in and load the device list, retrying injected errors."""
+        wyze = self.client()
+        while True:
+            try:
+                await wyze.login(*CREDENTIALS)
+                break
+            except Exception:
+                await wyze.close()
+        service = await wyze.bulb_service
+        while True:
+            try:
+                await service.get_object_list()
+                return wyze
+            except Exception:
+                pass
+
+    async def discovery(self, wyze: Wyzeapy):
+        service = await wyze.bulb_service
+        for _ in range(self.args.discoveries):
+            try:
+                await service.get_object_list()
+            except Exception:
+                pass
+
+    async def poll(self, wyze: Wyzeapy):
+        bulb_service = await wyze.bulb_service
+        switch_service = await wyze.switch_service
+        lock_service = await wyze.lock_service
+        irrigation_service = await wyze.irrigation_service
+
+        bulbs = await bulb_service.get_bulbs()
+        switches = await switch_service.get_switches()
+        locks = await lock_service.get_locks()
+        irrigations = await irrigation_service.get_irrigations()
+        self.recorder.reset()
+
+        await asyncio.gather(
+            bulb_service.update_all(bulbs),
+            switch_service.update_all(switches),
+            *(lock_service.update(lock) for lock in locks),
+            *(irrigation_service.update(irrigation) for irrigation in irrigations),
+            return_exceptions=True,
+        )
+
+    async def burst(self, wyze: Wyzeapy):
+        bulb_service = await wyze.bulb_service
+        bulbs = await bulb_service.get_bulbs()
+        self.recorder.reset()
+
+        for command in (bulb_service.turn_on, bulb_service.turn_off):
+            await asyncio.gather(
+                *(command(bulb, local_control=False) for bulb in bulbs),
+                return_exceptions=True,
+            )
+
+    async def run(self, scenario: str, trace_memory: bool) -> Dict[str, Any]:
+        # Every run starts from an empty device cache
+        BaseService._registry.invalidate()
+        BaseService._devices = None
+        wyze = None
+        if scenario != "login":
+            wyze = await self.logged_in_client()
+        self.recorder.reset()
+
+        body: Callable[[], Awaitable[None]] = (
+            self.login if scenario == "login" else lambda: getattr(self, scenario)(wyze)
+        )
+        try:
+            if trace_memory:
+                tracemalloc.start()
+                await body()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                return {"alloc_peak_kib": peak / 1024}
+
+            cpu = time.process_time()
+            wall = time.perf_counter()
+            await body()
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+        finally:
+            if wyze is not None:
+                await wyze.close()
+
+        latencies = self.recorder.latencies
+        return {
+            "requests": len(latencies),
+            "errors": self.recorder.errors,
+            "wall_s": wall,
+            "rps": len(latencies) / wall if wall else 0.0,
+            "p50_ms": _percentile(latencies, 50) * 1000,
+            "p99_ms": _percentile(latencies, 99) * 1000,
+            "cpu_ms": cpu * 1000,
+        }
+
+
+def _serve(fleet_size: int, args, queue: multiprocessing.Queue):
+    async def serve():
+        server = MockWyzeServer(
+            fleet_size=fleet_size,
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+        )
+        queue.put(await server.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def bench_fleet(fleet_size: int, args) -> Dict[str, Dict[str, Any]]:
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=_serve, args=(fleet_size, args, queue), daemon=True
+    )
+    server.start()
+    try:
+        benchmark = Benchmark(queue.get(timeout=30), args)
+        results = {}
+        for scenario in ("login", "discovery", "poll", "burst"):
+            result = asyncio.run(benchmark.run(scenario, trace_memory=False))
+            result.update(asyncio.run(benchmark.run(scenario, trace_memory=True)))
+            results[scenario] = result
+        return results
+    finally:
+        server.terminate()
+        server.join()
+
+
+def print_results(fleet_size: int, results: Dict[str, Dict[str, Any]]):
+    print(f"\nFleet of {fleet_size} devices")
+    print(
+        f"{'scenario':<10} {'requests':>8} {'errors':>6} {'req/s':>9} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'cpu ms':>9} {'alloc KiB':>10}"
+    )
+    for scenario, r in results.items():
+        print(
+            f"{scenario:<10} {r['requests']:>8} {r['errors']:>6} {r['rps']:>9.1f} "
+            f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['cpu_ms']:>9.1f} "
+            f"{r['alloc_peak_kib']:>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fleet-sizes", default="10,100,1000")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--discoveries", type=int, default=10)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    # Injected errors are expected; keep per-device warnings off the report
+    logging.getLogger("wyzeapy").setLevel(logging.CRITICAL)
+
+    all_results = {}
+    for fleet_size in (int(size) for size in args.fleet_sizes.split(",")):
+        all_results[fleet_size] = bench_fleet(fleet_size, args)
+        print_results(fleet_size, all_results[fleet_size])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
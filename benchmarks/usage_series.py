@@ -0,0 +1,121 @@
+"""
+Measure energy analytics over plug usage with `UsageSeries`.
+
+Usage:
+    python benchmarks/usage_series.py [--plugs 100] [--days 365]
+                                      [--baseline-plugs 1]
+
+Builds a synthetic year of minute-level energy samples for `--plugs` plugs
+(about 420 MB of float64 at the defaults) and times the `UsageSeries`
+operations over all of them: per-plug totals, the sum across plugs, hourly
+and daily resampling, percentiles and peak detection.
+
+For comparison, the same aggregations are computed the way consumers did
+before, looping over one dict per record, for `--baseline-plugs` plugs. The
+loop's time is scaled up to all plugs.
+"""
+
+import argparse
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from wyzeapy.services.usage_series import UsageSeries
+
+MINUTE_MS = 60 * 1000
+START = 1735689600000  # 2025-01-01T00:00:00Z
+
+
+def make_series(plugs: int, days: int, seed: int = 0) -> UsageSeries:
+    rng = np.random.default_rng(seed)
+    samples = days * 24 * 60
+    timestamps = START + np.arange(samples, dtype=np.int64) * MINUTE_MS
+    minute_of_day = np.arange(samples) % (24 * 60)
+    daily_shape = 1 + 0.5 * np.sin(2 * np.pi * minute_of_day / (24 * 60))
+    energy = np.empty((plugs, samples))
+    for row in range(plugs):
+        base = rng.uniform(0.2, 2.0)
+        energy[row] = base * daily_shape + rng.exponential(0.1, samples)
+        spikes = rng.integers(0, samples, samples // 5000)
+        energy[row, spikes] += rng.uniform(20, 50, len(spikes))
+    return UsageSeries([f"PLUG{row:04d}" for row in range(plugs)], timestamps, energy)
+
+
+def python_aggregations(records: List[Dict[str, Any]]) -> None:
+    """Per-record loops, as consumers wrote them over usage_history dicts."""
+    total = 0.0
+    hourly: Dict[int, float] = defaultdict(float)
+    daily: Dict[int, float] = defaultdict(float)
+    for record in records:
+        total += record["wh"]
+        hourly[record["timestamp"] // 3600000] += record["wh"]
+        daily[record["timestamp"] // 86400000] += record["wh"]
+    values = sorted(record["wh"] for record in records)
+    [values[int(len(values) * q / 100) - 1] for q in (50, 95, 99)]
+    mean = total / len(values)
+    std = (sum((value - mean) ** 2 for value in values) / len(values)) ** 0.5
+    limit = mean + 3 * std
+    [
+        index
+        for index in range(1, len(records) - 1)
+        if records[index]["wh"] > limit
+        and records[index]["wh"] > records[index - 1]["wh"]
+        and records[index]["wh"] >= records[index + 1]["wh"]
+    ]
+
+
+def timed(run: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--plugs", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--baseline-plugs", type=int, default=1)
+    args = parser.parse_args()
+
+    series = make_series(args.plugs, args.days)
+    samples = series.energy.size
+    print(
+        f"{args.plugs} plugs x {len(series)} minutes = {samples / 1e6:.1f}M samples "
+        f"({series.energy.nbytes / 2**20:.0f} MiB)"
+    )
+
+    operations = {
+        "total_kwh": series.total_kwh,
+        "sum across plugs": series.sum,
+        "resample hourly": lambda: series.resample(timedelta(hours=1)),
+        "resample daily": lambda: series.resample(timedelta(days=1)),
+        "percentile 50/95/99": lambda: series.percentile([50, 95, 99]),
+        "peaks": series.peaks,
+    }
+    vectorized = 0.0
+    for name, run in operations.items():
+        seconds = timed(run)
+        vectorized += seconds
+        print(f"  {name:20} {seconds * 1000:9.1f} ms")
+    print(f"  {'all':20} {vectorized * 1000:9.1f} ms")
+
+    baseline_plugs = min(args.baseline_plugs, args.plugs)
+    records = [
+        {"timestamp": int(ts), "wh": float(wh)}
+        for row in range(baseline_plugs)
+        for ts, wh in zip(series.timestamps, series.energy[row])
+    ]
+    loop = timed(lambda: python_aggregations(records))
+    scaled = loop * args.plugs / baseline_plugs
+    print(
+        f"Python loops over {baseline_plugs} plug(s): {loop:.2f} s, "
+        f"about {scaled:.1f} s for {args.plugs} plugs "
+        f"({scaled / vectorized:.0f}x the vectorized time)"
+    )
+
+
+if __name__ == "__main__":
+    main()
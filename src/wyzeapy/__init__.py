@@ -3,10 +3,12 @@
 #  of the attached license. You should have received a copy of
 #  the license with this file. If not, please write to:
 #  katie@mulliken.net to receive a copy
+import asyncio
 import logging
 from inspect import iscoroutinefunction
-from typing import List, Optional, Set, Callable
+from typing import Any, Iterator, List, Optional, Set, Callable
 
+from . import snapshot
 from .exceptions import TwoFactorAuthenticationEnabled
 from .services.base_service import BaseService
 from .services.bulb_service import BulbService
@@ -43,7 +45,9 @@ class Wyzeapy:
     # _client: Client
     _auth_lib: WyzeAuthLib
 
-    def __init__(self):
+    def __init__(self, **session_options):
+        self._session_options = session_options
+        self._auth_lib: Optional[WyzeAuthLib] = None
         self._bulb_service = None
         self._switch_service = None
         self._camera_service = None
@@ -62,19 +66,49 @@ class Wyzeapy:
         self._token_callbacks: List[Callable] = []
 
     @classmethod
-    async def create(cls):
+    async def create(cls, **session_options):
         """
         Creates and initializes the Wyzeapy class asynchronously.
 
-        This factory method provides a way to instantiate the class using async/await syntax,
-        though it's currently a simple implementation that may be expanded in the future.
+        This factory method provides a way to instantiate the class using async/await syntax.
+
+        **Args:**
+        * `**session_options`: Connection pool and pipeline options forwarded to
+          `WyzeAuthLib` (`session`, `connection_limit`, `connection_limit_per_host`,
+          `keepalive_timeout`, `middlewares`, `metrics`, `retry_policy`,
+          `circuit_breaker`, `rate_limit`)
 
         **Returns:**
             `Wyzeapy`: A new instance of the Wyzeapy class ready for authentication.
         """
-        self = cls()
+        self = cls(**session_options)
+        return self
+
+    async def close(self):
+        """
+        Closes the HTTP sessions and releases all pooled connections, including
+        the local-control connections to bulbs.
+
+        **Example:**
+        ```python
+        wyze = await Wyzeapy.create()
+        try:
+            await wyze.login(email, password, key_id, api_key)
+        finally:
+            await wyze.close()
+        ```
+        """
+        if self._bulb_service is not None:
+            await self._bulb_service.local_control.close()
+        if self._auth_lib is not None:
+            await self._auth_lib.close()
+
+    async def __aenter__(self):
         return self
 
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
     async def login(
         self, email, password, key_id, api_key, token: Optional[Token] = None
     ):
@@ -103,7 +137,13 @@ class Wyzeapy:
 
         try:
             self._auth_lib = await WyzeAuthLib.create(
-                email, password, key_id, api_key, token, self.execute_token_callbacks
+                email,
+                password,
+                key_id,
+                api_key,
+                token,
+                self.execute_token_callbacks,
+                **self._session_options,
             )
             if token:
                 # User token supplied, refresh on startup
@@ -210,6 +250,88 @@ class Wyzeapy:
 
         return device_ids
 
+    async def snapshot_rows(self) -> Iterator[snapshot.Row]:
+        """
+        Returns a lazy iterator over the normalized state of every device.
+
+        Each row holds one value per `wyzeapy.snapshot.SNAPSHOT_SCHEMA` column
+        (mac, model, availability and the state fields of the device services),
+        None where a field does not apply. State is read from the device
+        objects the services have already updated; only the device list is
+        refreshed, and only if it is stale.
+
+        **Returns:**
+        * `Iterator[Tuple]`: One row per device
+        """
+
+        if BaseService._registry.is_stale:
+            await self._service.get_object_list()
+        return snapshot.rows(BaseService._registry.views())
+
+    async def export_snapshot(
+        self,
+        sink: Any,
+        format: str = "parquet",
+        batch_size: int = snapshot.DEFAULT_BATCH_SIZE,
+    ) -> int:
+        """
+        Streams the state of every device into a columnar file.
+
+        The device state is read on the event loop `batch_size` rows at a
+        time; each batch is then encoded and written in a worker thread, so
+        that only one batch of rows is held in memory. Requires the `pyarrow`
+        package (`pip install wyzeapy[export]`).
+
+        **Args:**
+        * `sink` (Any): Path or writable binary file
+        * `format` (str): `"parquet"` for a Parquet file or `"arrow"` for an Arrow IPC stream
+        * `batch_size` (int): Rows per row group or record batch
+
+        **Returns:**
+        * `int`: Number of devices written
+
+        **Example:**
+        ```python
+        await wyze.export_snapshot("devices.parquet")
+        ```
+        """
+
+        if format not in snapshot.SnapshotWriter.FORMATS:
+            raise ValueError(f"Unsupported snapshot format: {format}")
+        rows = await self.snapshot_rows()
+        writer = await asyncio.to_thread(snapshot.SnapshotWriter, sink, format)
+        try:
+            # Rows are built here so the worker thread does not race updates
+            for batch in snapshot.batches(rows, batch_size):
+                await asyncio.to_thread(writer.write, batch)
+        finally:
+            await asyncio.to_thread(writer.close)
+        return writer.count
+
+    async def snapshot_array(self, batch_size: int = snapshot.DEFAULT_BATCH_SIZE):
+        """
+        Returns the state of every device as a NumPy structured array.
+
+        Requires the `numpy` package (`pip install wyzeapy[export]`). Missing
+        values are -1 in boolean and integer fields, NaN in float fields and
+        an empty string in string fields. Rows are converted `batch_size` at a
+        time rather than all being built first.
+
+        **Args:**
+        * `batch_size` (int): Rows converted at a time
+
+        **Returns:**
+        * `numpy.ndarray`: One record per device, with the fields of `wyzeapy.snapshot.SNAPSHOT_SCHEMA`
+
+        **Example:**
+        ```python
+        devices = await wyze.snapshot_array()
+        offline = devices[devices["available"] == 0]["mac"]
+        ```
+        """
+
+        return snapshot.to_numpy(await self.snapshot_rows(), batch_size)
+
     @property
     async def notifications_are_on(self) -> bool:
         """
@@ -285,10 +407,10 @@ class Wyzeapy:
         ```
         """
 
-        self = cls()
-        await self.login(email, password, key_id, api_key)
+        async with cls() as self:
+            await self.login(email, password, key_id, api_key)
 
-        return not self._auth_lib.should_refresh
+            return not self._auth_lib.should_refresh
 
     @property
     async def bulb_service(self) -> BulbService:
@@ -0,0 +1,190 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Per-host circuit breakers for the Wyze backends.
+
+Each backend host (api.wyzecam.com, wyze-earth-service, yd-saas-toc, ...) gets
+its own breaker. After `failure_threshold` consecutive failures (connection
+errors, timeouts or 5xx responses) the breaker opens and requests to that host
+fail immediately with `CircuitOpenError`, without touching the network. Once
+`reset_timeout` has passed the breaker lets a probe request through
+(half-open): if it succeeds the breaker closes again, otherwise it stays open
+for another `reset_timeout`.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, Tuple, Type
+
+from aiohttp import ClientConnectionError, ClientPayloadError
+
+from .exceptions import CircuitOpenError
+from .pipeline import Handler, Request
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class CircuitBreakerPolicy:
+    """When to open a circuit breaker and when to probe it again.
+
+    Attributes:
+        failure_threshold: Consecutive failures that open the breaker.
+        reset_timeout: Seconds an open breaker waits before letting a probe
+            request through.
+        half_open_probes: Requests allowed through at the same time while
+            half-open.
+        failure_exceptions: Exceptions that count as a failure of the host.
+    """
+
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    half_open_probes: int = 1
+    failure_exceptions: Tuple[Type[BaseException], ...] = (
+        ClientConnectionError,
+        ClientPayloadError,
+        asyncio.TimeoutError,
+    )
+
+
+DEFAULT_CIRCUIT_BREAKER_POLICY = CircuitBreakerPolicy()
+
+
+class CircuitBreaker:
+    """Circuit breaker guarding a single host.
+
+    Attributes:
+        state: Current `CircuitState`.
+        failures: Consecutive failures seen.
+    """
+
+    def __init__(self, policy: CircuitBreakerPolicy = DEFAULT_CIRCUIT_BREAKER_POLICY):
+        self.policy = policy
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a probe through."""
+        if self.state is not CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.policy.reset_timeout - time.monotonic())
+
+    @property
+    def is_open(self) -> bool:
+        """Whether a request sent now would be rejected."""
+        if self.state is CircuitState.OPEN:
+            return self.retry_in > 0
+        if self.state is CircuitState.HALF_OPEN:
+            return self._probes >= self.policy.half_open_probes
+        return False
+
+    def allow(self) -> bool:
+        """Admit a request, moving an expired open breaker to half-open."""
+        if self.state is CircuitState.OPEN:
+            if self.retry_in > 0:
+                return False
+            self.state = CircuitState.HALF_OPEN
+            self._probes = 0
+        if self.state is CircuitState.HALF_OPEN:
+            if self._probes >= self.policy.half_open_probes:
+                return False
+            self._probes += 1
+        return True
+
+    def release(self) -> None:
+        """Give back the probe slot of a request that ended without a verdict."""
+        if self.state is CircuitState.HALF_OPEN:
+            self._probes -= 1
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.state = CircuitState.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if (
+            self.state is CircuitState.HALF_OPEN
+            or self.failures >= self.policy.failure_threshold
+        ):
+            self.state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+
+
+class CircuitBreakers:
+    """Pipeline stage keeping one `CircuitBreaker` per host.
+
+    Requests to a host whose breaker is open raise `CircuitOpenError`.
+    """
+
+    def __init__(self, policy: CircuitBreakerPolicy = DEFAULT_CIRCUIT_BREAKER_POLICY):
+        self.policy = policy
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, host: str) -> CircuitBreaker:
+        """Return the breaker of `host`, creating it on first use."""
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.policy)
+        return breaker
+
+    def is_open(self, host: str) -> bool:
+        """Whether requests to `host` are currently rejected."""
+        breaker = self._breakers.get(host)
+        return breaker is not None and breaker.is_open
+
+    @property
+    def states(self) -> Dict[str, CircuitState]:
+        """State of the breaker of every host contacted so far."""
+        return {host: breaker.state for host, breaker in self._breakers.items()}
+
+    async def __call__(self, request: Request, handler: Handler) -> Dict[Any, Any]:
+        host = request.host
+        breaker = self.get(host)
+        if not breaker.allow():
+            raise CircuitOpenError(host, breaker.retry_in)
+
+        try:
+            response = await handler(request)
+        except self.policy.failure_exceptions:
+            self._failed(host, breaker)
+            raise
+        except Exception:
+            self._record_status(host, breaker, request.context.get("status"))
+            raise
+        except BaseException:
+            # Cancelled: the host has not been judged either way
+            breaker.release()
+            raise
+        self._record_status(host, breaker, request.context.get("status"))
+        return response
+
+    def _record_status(self, host: str, breaker: CircuitBreaker, status) -> None:
+        if isinstance(status, int) and status >= 500:
+            self._failed(host, breaker)
+        else:
+            breaker.record_success()
+
+    @staticmethod
+    def _failed(host: str, breaker: CircuitBreaker) -> None:
+        was_open = breaker.state is not CircuitState.CLOSED
+        breaker.record_failure()
+        if breaker.state is CircuitState.OPEN and not was_open:
+            _LOGGER.warning(
+                f"{host} failed {breaker.failures} times in a row, pausing requests "
+                f"for {breaker.policy.reset_timeout:.0f}s"
+            )
@@ -34,3 +34,12 @@ class UnknownApiError(Exception):
 
 class TwoFactorAuthenticationEnabled(Exception):
     """Raised when two-factor authentication is required for login."""
+
+
+class CircuitOpenError(Exception):
+    """Raised without a network round trip while a backend host is failing."""
+
+    def __init__(self, host: str, retry_in: float):
+        self.host = host
+        self.retry_in = retry_in
+        super().__init__(f"{host} is failing, next attempt in {retry_in:.0f}s")
@@ -0,0 +1,428 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Request metrics and tracing hooks.
+
+Instrumentation is off by default and costs nothing until a hook is
+installed. A hook is any object implementing the `MetricsHook` methods; pass
+it to the client to receive a call for every HTTP request, API error, retry,
+token refresh and scheduled device update:
+
+```python
+metrics = Metrics()
+wyze = await Wyzeapy.create(metrics=metrics)
+...
+print(metrics.snapshot())
+```
+
+`Metrics` aggregates everything in memory. `OpenTelemetryHook` reports every
+request as an OpenTelemetry span instead (requires `opentelemetry-api`), and
+`CombinedHook` forwards to several hooks at once.
+"""
+
+import json
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from .pipeline import Handler, Middleware, Request
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricsHook:
+    """Receiver of instrumentation events. Every method is a no-op by default."""
+
+    def on_request(
+        self,
+        request: Request,
+        status: Optional[int],
+        elapsed: float,
+        bytes_sent: int,
+        bytes_received: Optional[int],
+        error: Optional[BaseException],
+    ) -> None:
+        """Called once per HTTP attempt, after the response was decoded.
+
+        Args:
+            request: The request that was sent.
+            status: HTTP status code, or None when no response arrived.
+            elapsed: Seconds from sending the request to decoding the response.
+            bytes_sent: Size of the request body.
+            bytes_received: Size of the response body as reported by the
+                server, or None when unknown.
+            error: Exception raised by the attempt, if any.
+        """
+
+    def on_api_error(self, source: str, code: Any) -> None:
+        """Called when a `check_for_errors_*` function rejects a response.
+
+        Args:
+            source: Which check rejected it: `standard`, `lock`,
+                `devicemgmt`, `iot` or `hms`.
+            code: Error code reported by the API.
+        """
+
+    def on_retry(self, request: Request, attempt: int, delay: float) -> None:
+        """Called when a pipeline stage is about to retry a request.
+
+        Args:
+            request: The request being retried.
+            attempt: Number of the upcoming attempt, starting at 2.
+            delay: Seconds waited before the attempt.
+        """
+
+    def on_rate_limit_wait(self, request: Request, priority: int, wait: float) -> None:
+        """Called when the rate limiter lets a request through.
+
+        Args:
+            request: The request that was let through.
+            priority: Lane the request waited in (see `wyzeapy.rate_limiter`).
+            wait: Seconds the request waited for a token.
+        """
+
+    def on_token_refresh(self) -> None:
+        """Called after the access token was refreshed."""
+
+    def on_scheduler_lag(self, lag: float) -> None:
+        """Called when a device update is dispatched.
+
+        Args:
+            lag: Seconds between the update's due time and its dispatch.
+        """
+
+
+class Histogram:
+    """Fixed-bucket histogram.
+
+    Attributes:
+        bounds: Upper bounds of the buckets; values above the last bound go
+            to an overflow bucket.
+        counts: Number of values per bucket, including the overflow bucket.
+        count: Number of recorded values.
+        total: Sum of the recorded values.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimate the `q` quantile as the upper bound of its bucket.
+
+        Values in the overflow bucket are reported as infinity.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "buckets": dict(zip([*self.bounds, float("inf")], self.counts)),
+        }
+
+
+class EndpointStats:
+    """Aggregated requests to one endpoint.
+
+    Attributes:
+        latency: Histogram of request latencies, in seconds.
+        statuses: Number of responses per HTTP status code.
+        errors: Number of attempts that raised.
+        bytes_sent: Total size of the request bodies.
+        bytes_received: Total size of the response bodies, where known.
+    """
+
+    __slots__ = ("latency", "statuses", "errors", "bytes_sent", "bytes_received")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses: Dict[int, int] = {}
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    @property
+    def count(self) -> int:
+        return self.latency.count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "statuses": dict(self.statuses),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency": self.latency.to_dict(),
+        }
+
+
+class Metrics(MetricsHook):
+    """In-memory aggregation of every instrumentation event.
+
+    Attributes:
+        endpoints: Request statistics keyed by `Request.endpoint`.
+        api_errors: Number of API errors keyed by `(source, code)`.
+        retries: Number of retries keyed by endpoint.
+        rate_limit_wait: Histograms of rate limiter waits, in seconds, keyed by
+            lane name.
+        token_refreshes: Number of access token refreshes.
+        scheduler_lag: Histogram of update dispatch delays, in seconds.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Discard everything recorded so far."""
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.api_errors: Dict[Tuple[str, str], int] = {}
+        self.retries: Dict[str, int] = {}
+        self.rate_limit_wait: Dict[str, Histogram] = {}
+        self.token_refreshes = 0
+        self.scheduler_lag = Histogram()
+
+    def on_request(
+        self, request, status, elapsed, bytes_sent, bytes_received, error
+    ) -> None:
+        endpoint = request.endpoint
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = EndpointStats()
+        stats.latency.record(elapsed)
+        if status is not None:
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if error is not None:
+            stats.errors += 1
+        stats.bytes_sent += bytes_sent
+        if bytes_received:
+            stats.bytes_received += bytes_received
+
+    def on_api_error(self, source, code) -> None:
+        key = (source, str(code))
+        self.api_errors[key] = self.api_errors.get(key, 0) + 1
+
+    def on_retry(self, request, attempt, delay) -> None:
+        endpoint = request.endpoint
+        self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+
+    def on_rate_limit_wait(self, request, priority, wait) -> None:
+        lane = getattr(priority, "name", str(priority)).lower()
+        histogram = self.rate_limit_wait.get(lane)
+        if histogram is None:
+            histogram = self.rate_limit_wait[lane] = Histogram()
+        histogram.record(wait)
+
+    def on_token_refresh(self) -> None:
+        self.token_refreshes += 1
+
+    def on_scheduler_lag(self, lag) -> None:
+        self.scheduler_lag.record(lag)
+
+    @property
+    def request_count(self) -> int:
+        """Number of HTTP attempts across all endpoints."""
+        return sum(stats.count for stats in self.endpoints.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return everything recorded so far as plain, JSON-friendly data."""
+        return {
+            "endpoints": {
+                endpoint: stats.to_dict() for endpoint, stats in self.endpoints.items()
+            },
+            "api_errors": {
+                f"{source}:{code}": count
+                for (source, code), count in self.api_errors.items()
+            },
+            "retries": dict(self.retries),
+            "rate_limit_wait": {
+                lane: histogram.to_dict()
+                for lane, histogram in self.rate_limit_wait.items()
+            },
+            "token_refreshes": self.token_refreshes,
+            "scheduler_lag": self.scheduler_lag.to_dict(),
+        }
+
+
+class CombinedHook(MetricsHook):
+    """Forward every event to several hooks, in order."""
+
+    def __init__(self, *hooks: MetricsHook):
+        self.hooks: List[MetricsHook] = list(hooks)
+
+    def on_request(self, *args) -> None:
+        for hook in self.hooks:
+            hook.on_request(*args)
+
+    def on_api_error(self, *args) -> None:
+        for hook in self.hooks:
+            hook.on_api_error(*args)
+
+    def on_retry(self, *args) -> None:
+        for hook in self.hooks:
+            hook.on_retry(*args)
+
+    def on_rate_limit_wait(self, *args) -> None:
+        for hook in self.hooks:
+            hook.on_rate_limit_wait(*args)
+
+    def on_token_refresh(self) -> None:
+        for hook in self.hooks:
+            hook.on_token_refresh()
+
+    def on_scheduler_lag(self, *args) -> None:
+        for hook in self.hooks:
+            hook.on_scheduler_lag(*args)
+
+
+class OpenTelemetryHook(MetricsHook):
+    """Report every HTTP attempt as an OpenTelemetry client span.
+
+    Spans are children of the span that is current when the request is made.
+    API errors, retries and token refreshes are added as events to the current
+    span. Requires the `opentelemetry-api` package.
+    """
+
+    def __init__(self, tracer=None):
+        """
+        Args:
+            tracer: Tracer to create spans with; defaults to the `wyzeapy`
+                tracer of the global tracer provider.
+        """
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError(
+                "OpenTelemetryHook requires the opentelemetry-api package"
+            ) from e
+        self._trace = trace
+        self._tracer = tracer or trace.get_tracer("wyzeapy")
+
+    def on_request(
+        self, request, status, elapsed, bytes_sent, bytes_received, error
+    ) -> None:
+        end = time.time_ns()
+        span = self._tracer.start_span(
+            f"{request.method} {request.endpoint}",
+            kind=self._trace.SpanKind.CLIENT,
+            start_time=end - int(elapsed * 1e9),
+            attributes={
+                "http.request.method": request.method,
+                "server.address": request.host,
+                "url.path": request.endpoint[len(request.host) :],
+                "http.request.body.size": bytes_sent,
+            },
+        )
+        if status is not None:
+            span.set_attribute("http.response.status_code", status)
+        if bytes_received is not None:
+            span.set_attribute("http.response.body.size", bytes_received)
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        span.end(end_time=end)
+
+    def on_api_error(self, source, code) -> None:
+        self._trace.get_current_span().add_event(
+            "wyze.api_error",
+            {"wyze.error.source": source, "wyze.error.code": str(code)},
+        )
+
+    def on_retry(self, request, attempt, delay) -> None:
+        self._trace.get_current_span().add_event(
+            "wyze.retry",
+            {
+                "url.path": request.endpoint,
+                "wyze.attempt": attempt,
+                "wyze.delay": delay,
+            },
+        )
+
+    def on_token_refresh(self) -> None:
+        self._trace.get_current_span().add_event("wyze.token_refresh")
+
+
+def request_size(request: Request) -> int:
+    """Size in bytes of the body aiohttp sends for `request`.
+
+    `WyzeAuthLib` encodes JSON bodies itself and records their size, so this
+    is only needed for requests sent some other way.
+    """
+    if request.json is not None:
+        return len(json.dumps(request.json).encode())
+    data = request.data
+    if data is None:
+        return 0
+    if isinstance(data, bytes):
+        return len(data)
+    if isinstance(data, str):
+        return len(data.encode())
+    if isinstance(data, dict):
+        return len(urlencode(data).encode())
+    return 0
+
+
+def metrics_middleware(hook: MetricsHook) -> Middleware:
+    """Return a pipeline stage reporting every attempt to `hook`.
+
+    The stage reads the HTTP status, request size and response size that
+    `WyzeAuthLib` leaves in `Request.context` under `status`, `bytes_sent` and
+    `bytes_received`. Attempts that fail before sending report 0 bytes sent.
+    """
+
+    async def record(request: Request, handler: Handler) -> Dict[Any, Any]:
+        context = request.context
+        context.pop("status", None)
+        context.pop("bytes_sent", None)
+        context.pop("bytes_received", None)
+        error = None
+        started = time.perf_counter()
+        try:
+            return await handler(request)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            hook.on_request(
+                request,
+                context.get("status"),
+                time.perf_counter() - started,
+                context.get("bytes_sent", 0),
+                context.get("bytes_received"),
+                error,
+            )
+
+    return record
+
+
+def report_api_error(service, source: str, code: Any) -> None:
+    """Report an API error seen by a `check_for_errors_*` function."""
+    auth_lib = getattr(service, "_auth_lib", service)
+    if (hook := getattr(auth_lib, "metrics", None)) is not None:
+        hook.on_api_error(source, code)
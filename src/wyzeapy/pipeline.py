@@ -0,0 +1,88 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Request pipeline used by WyzeAuthLib for every HTTP call.
+
+A request is described by a `Request` object and passed through a chain of
+middleware stages before it reaches the network. Each stage is an async
+callable taking the request and the next handler in the chain:
+
+```python
+async def add_header(request: Request, handler: Handler) -> Dict[Any, Any]:
+    request.headers = {**(request.headers or {}), "X-Example": "1"}
+    return await handler(request)
+
+auth_lib.add_middleware(add_header)
+```
+
+Stages may modify the request, short-circuit with their own response, retry
+by calling `handler` more than once, or observe the decoded response.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
+from urllib.parse import urlsplit
+
+
+@dataclass
+class Request:
+    """A single HTTP request travelling through the pipeline.
+
+    Attributes:
+        method: HTTP method, upper case.
+        url: Request URL.
+        headers: Optional request headers.
+        params: Optional query parameters.
+        json: Optional JSON payload.
+        data: Optional form or raw body.
+        context: Free-form metadata shared between middleware stages.
+    """
+
+    method: str
+    url: str
+    headers: Optional[Dict[str, Any]] = None
+    params: Optional[Dict[str, Any]] = None
+    json: Any = None
+    data: Any = None
+    context: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def host(self) -> str:
+        """Host name the request is sent to."""
+        return urlsplit(self.url).hostname or ""
+
+    @property
+    def endpoint(self) -> str:
+        """Host and path of the request, without the query string."""
+        parts = urlsplit(self.url)
+        return f"{parts.hostname}{parts.path}"
+
+
+Handler = Callable[[Request], Awaitable[Dict[Any, Any]]]
+Middleware = Callable[[Request, Handler], Awaitable[Dict[Any, Any]]]
+
+
+def build_handler(middlewares: Sequence[Middleware], send: Handler) -> Handler:
+    """Compose middleware stages around the final `send` handler.
+
+    Args:
+        middlewares: Stages ordered from outermost to innermost.
+        send: The handler that performs the actual network call.
+
+    Returns:
+        A handler that runs the request through every stage in order.
+    """
+    handler = send
+    for middleware in reversed(middlewares):
+        handler = _bind(middleware, handler)
+    return handler
+
+
+def _bind(middleware: Middleware, handler: Handler) -> Handler:
+    async def run(request: Request) -> Dict[Any, Any]:
+        return await middleware(request, handler)
+
+    return run
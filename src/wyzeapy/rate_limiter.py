@@ -0,0 +1,234 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Token-bucket rate limiting for Wyze API calls.
+
+`WyzeAuthLib` sends every request through a `RateLimiter` pipeline stage that
+keeps one token bucket per host. Requests wait in priority order for a token:
+user commands (`Priority.COMMAND`, the default) go ahead of background polling
+(`Priority.POLL`), which the update scheduler selects with `request_priority`.
+"""
+
+import asyncio
+import contextlib
+import itertools
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from heapq import heappop, heappush
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .metrics import MetricsHook
+from .pipeline import Handler, Request
+
+
+class TokenBucket:
+    """Asynchronous token bucket.
+
+    Tokens are added continuously at `rate` per second up to `capacity`.
+    `acquire()` takes tokens, waiting until enough have accumulated.
+
+    Attributes:
+        rate: Tokens added per second.
+        capacity: Maximum number of tokens, i.e. the allowed burst size.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        """Number of tokens currently available."""
+        self._refill()
+        return self._tokens
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take `tokens` if they are available right now, without waiting."""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def put(self, tokens: float = 1) -> None:
+        """Add `tokens` to the bucket, up to its capacity."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def time_until(self, tokens: float = 1) -> float:
+        """Seconds until `tokens` are available, 0 if they already are."""
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1) -> float:
+        """Take `tokens`, waiting until they are available.
+
+        Waiters are served in arrival order.
+
+        :return: Seconds spent waiting
+        """
+        if tokens > self.capacity:
+            raise ValueError("Cannot acquire more tokens than the bucket capacity")
+        started = time.monotonic()
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+        return time.monotonic() - started
+
+
+class Priority(IntEnum):
+    """Rate limiter lanes; lower values are served first."""
+
+    COMMAND = 0
+    POLL = 1
+
+
+_priority: ContextVar[Priority] = ContextVar(
+    "wyzeapy_priority", default=Priority.COMMAND
+)
+
+
+@contextlib.contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Send the requests made inside the block in the `priority` lane.
+
+    ```python
+    with request_priority(Priority.POLL):
+        await service.update(device)
+    ```
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """Request rates allowed per host.
+
+    Attributes:
+        requests_per_second: Sustained rate allowed for each host.
+        burst: Requests that may be sent back to back to each host.
+        hosts: Per-host `(requests_per_second, burst)` overriding the defaults.
+    """
+
+    requests_per_second: float = 10.0
+    burst: float = 20.0
+    hosts: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+
+    def for_host(self, host: str) -> Tuple[float, float]:
+        return self.hosts.get(host, (self.requests_per_second, self.burst))
+
+
+DEFAULT_RATE_LIMIT_POLICY = RateLimitPolicy()
+
+
+class HostLimiter:
+    """Token bucket of one host, handing out tokens in priority order.
+
+    Waiters are kept in a heap ordered by priority, then arrival, and woken by
+    a single timer when the next token is due, so a command that arrives while
+    polls are queued is served before all of them.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.bucket = TokenBucket(rate, capacity)
+        self._sequence = itertools.count()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def waiting(self) -> int:
+        """Number of requests waiting for a token."""
+        return sum(not future.done() for _, _, future in self._waiters)
+
+    async def acquire(self, priority: Priority = Priority.COMMAND) -> float:
+        """Wait for a token.
+
+        :return: Seconds spent waiting
+        """
+        if not self._waiters and self.bucket.try_acquire():
+            return 0.0
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heappush(self._waiters, (priority, next(self._sequence), future))
+        self._schedule()
+        await future
+        return time.monotonic() - started
+
+    def _schedule(self) -> None:
+        if self._timer is None and self._waiters:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.bucket.time_until(), self._release
+            )
+
+    def _release(self) -> None:
+        self._timer = None
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():
+                # Cancelled while waiting
+                heappop(self._waiters)
+            elif self.bucket.try_acquire():
+                heappop(self._waiters)
+                future.set_result(None)
+            else:
+                break
+        self._schedule()
+
+
+class RateLimiter:
+    """Pipeline stage limiting the request rate to every host.
+
+    A request's lane is taken from its `priority` context entry, or else from
+    the surrounding `request_priority` block.
+
+    Attributes:
+        policy: The rates allowed.
+        metrics: Hook told how long every request waited, or None.
+    """
+
+    def __init__(
+        self,
+        policy: RateLimitPolicy = DEFAULT_RATE_LIMIT_POLICY,
+        metrics: Optional[MetricsHook] = None,
+    ):
+        self.policy = policy
+        self.metrics = metrics
+        self._hosts: Dict[str, HostLimiter] = {}
+
+    def get(self, host: str) -> HostLimiter:
+        """Return the limiter of `host`, creating it on first use."""
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            limiter = self._hosts[host] = HostLimiter(*self.policy.for_host(host))
+        return limiter
+
+    async def __call__(self, request: Request, handler: Handler) -> Dict[Any, Any]:
+        priority = request.context.get("priority")
+        if priority is None:
+            priority = _priority.get()
+        waited = await self.get(request.host).acquire(priority)
+        if self.metrics is not None:
+            self.metrics.on_rate_limit_wait(request, priority, waited)
+        return await handler(request)
@@ -0,0 +1,251 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Retries for transient request failures.
+
+`WyzeAuthLib` runs every request through a `Retry` pipeline stage. A request
+that fails with a connection error, a timeout or a retryable HTTP status is
+sent again after an exponentially growing, jittered delay. A server that
+answers 429 or 503 with a `Retry-After` header is given the time it asked for.
+
+Only idempotent requests are retried after they may have reached the server:
+GETs and the POST endpoints listed in `RetryPolicy.idempotent_paths`. Other
+requests, such as lock control, are retried only when the connection could
+not be established or the server rejected them with 429, so a command is
+never executed twice. A single request can opt in or out by passing
+`idempotent=True/False` as request context.
+
+Retries draw from a shared `RetryBudget`, which every new request refills
+by a fraction of a retry. During an outage the budget runs dry and requests fail fast
+instead of multiplying the load on the Wyze servers.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, FrozenSet, Optional, Tuple, Type
+
+from aiohttp import ClientConnectionError, ClientConnectorError, ClientPayloadError
+
+from .metrics import MetricsHook
+from .pipeline import Handler, Request
+from .rate_limiter import TokenBucket
+
+_LOGGER = logging.getLogger(__name__)
+
+# Paths of POST/PUT endpoints that only read state or set it to an absolute
+# value, so that sending them twice has the same effect as sending them once
+IDEMPOTENT_PATHS = frozenset(
+    {
+        "/app/v2/home_page/get_object_list",
+        "/app/v2/device/get_property_list",
+        "/app/v2/device/get_device_Info",
+        "/app/v2/device/get_event_list",
+        "/app/v2/device/set_property",
+        "/app/v2/device/set_property_list",
+        "/app/v2/plug/usage_record_list",
+        "/app/v2/platform/get_user_profile",
+        "/platform/v2/membership/get_plan_binding_list_by_user",
+        "/device-management/api/device-property/get_iot_prop",
+        "/plugin/earth/get_iot_prop",
+        "/plugin/sirius/get_iot_prop",
+        "/openapi/lock/v1/info",
+    }
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """When and how often to retry a request.
+
+    Attributes:
+        max_attempts: Attempts per request, including the first one.
+        base_delay: Delay before the first retry, in seconds; doubled for
+            every further retry.
+        max_delay: Longest delay between two attempts. A `Retry-After` longer
+            than this is not waited for and the request fails instead.
+        jitter: Pick every delay uniformly between zero and the backoff
+            ("full jitter") so that clients failing together do not retry
+            together.
+        retry_statuses: HTTP statuses retried for idempotent requests.
+        retry_exceptions: Exceptions retried for idempotent requests.
+        rate_limit_codes: API error codes in the response body that signal
+            rate limiting; retried like a 429.
+        idempotent_paths: POST/PUT paths that are safe to send twice.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    jitter: bool = True
+    retry_statuses: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+    retry_exceptions: Tuple[Type[BaseException], ...] = (
+        ClientConnectionError,
+        ClientPayloadError,
+        asyncio.TimeoutError,
+    )
+    rate_limit_codes: FrozenSet[str] = frozenset()
+    idempotent_paths: FrozenSet[str] = IDEMPOTENT_PATHS
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before attempt number `attempt` (2 for the first retry)."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 2))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def is_idempotent(self, request: Request) -> bool:
+        idempotent = request.context.get("idempotent")
+        if idempotent is not None:
+            return idempotent
+        if request.method in ("GET", "HEAD", "OPTIONS"):
+            return True
+        return request.endpoint[len(request.host) :] in self.idempotent_paths
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class RetryBudget:
+    """Caps retries at a fraction of the requests sent.
+
+    Every first attempt adds `ratio` tokens and every retry takes one, so
+    retries can make up at most about `ratio` of the traffic. A trickle of
+    `min_per_second` tokens keeps a quiet client able to retry at all.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_per_second: float = 0.5, capacity: float = 10
+    ):
+        self.ratio = ratio
+        self._bucket = TokenBucket(min_per_second, capacity)
+
+    @property
+    def available(self) -> float:
+        """Number of retries that may be made right now."""
+        return self._bucket.tokens
+
+    def deposit(self) -> None:
+        self._bucket.put(self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take one retry from the budget, returning False if it is spent."""
+        return self._bucket.try_acquire()
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds to wait according to a `Retry-After` header, if present."""
+    value = headers.get("Retry-After") if headers else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Retry:
+    """Pipeline stage retrying failed requests according to a `RetryPolicy`.
+
+    Attributes:
+        policy: The retry policy.
+        budget: Budget shared by all requests of the client.
+        metrics: Hook told about every retry, or None.
+    """
+
+    def __init__(
+        self,
+        policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+        budget: Optional[RetryBudget] = None,
+        metrics: Optional[MetricsHook] = None,
+    ):
+        self.policy = policy
+        self.budget = budget or RetryBudget()
+        self.metrics = metrics
+
+    async def __call__(self, request: Request, handler: Handler) -> Dict[Any, Any]:
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            request.context.pop("status", None)
+            request.context.pop("response_headers", None)
+            try:
+                response = await handler(request)
+                error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                response = None
+                error = e
+
+            delay = self._retry_delay(request, response, error, attempt)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+
+            attempt += 1
+            _LOGGER.debug(
+                f"Retrying {request.method} {request.endpoint} in {delay:.2f}s "
+                f"(attempt {attempt}): {error or request.context.get('status')}"
+            )
+            if self.metrics is not None:
+                self.metrics.on_retry(request, attempt, delay)
+            await asyncio.sleep(delay)
+
+    def _retry_delay(
+        self,
+        request: Request,
+        response: Optional[Dict[Any, Any]],
+        error: Optional[Exception],
+        attempt: int,
+    ) -> Optional[float]:
+        """Seconds to wait before retrying, or None to give up."""
+        policy = self.policy
+        if attempt >= policy.max_attempts:
+            return None
+
+        status = request.context.get("status")
+        rate_limited = status == 429 or (
+            isinstance(response, dict)
+            and str(response.get("code")) in policy.rate_limit_codes
+        )
+        if rate_limited or isinstance(error, ClientConnectorError):
+            # Turned away or never reached the server: safe for any request
+            retryable = True
+        elif error is not None:
+            retryable = (
+                isinstance(error, policy.retry_exceptions)
+                or status in policy.retry_statuses
+            ) and policy.is_idempotent(request)
+        else:
+            retryable = status in policy.retry_statuses and policy.is_idempotent(
+                request
+            )
+        if not retryable:
+            return None
+
+        delay = policy.backoff(attempt + 1)
+        if status in (429, 503):
+            requested = retry_after(request.context.get("response_headers"))
+            if requested is not None:
+                if requested > policy.max_delay:
+                    _LOGGER.warning(
+                        f"{request.endpoint} asked to retry after {requested:.0f}s, "
+                        "giving up"
+                    )
+                    return None
+                delay = requested
+
+        if not self.budget.withdraw():
+            _LOGGER.debug(f"Retry budget exhausted, not retrying {request.endpoint}")
+            return None
+        return delay
@@ -7,10 +7,10 @@ import asyncio
 import json
 import logging
 import time
-from typing import List, Tuple, Any, Dict, Optional
+from typing import List, Tuple, Any, Dict, Optional, Callable, Awaitable
 
-import aiohttp
 
+from .device_registry import DeviceRegistry
 from .update_manager import DeviceUpdater, UpdateManager
 from ..const import (
     PHONE_SYSTEM_TYPE,
@@ -26,6 +26,7 @@ from ..const import (
     SOURCE,
 )
 from ..crypto import olive_create_signature
+from ..exceptions import CircuitOpenError
 from ..payload_factory import (
     olive_create_hms_patch_payload,
     olive_create_hms_payload,
@@ -48,7 +49,6 @@ from ..utils import (
     check_for_errors_hms,
     check_for_errors_lock,
     check_for_errors_iot,
-    wyze_encrypt,
     check_for_errors_devicemgmt,
 )
 from ..wyze_auth_lib import WyzeAuthLib
@@ -92,15 +92,15 @@ class BaseService:
     """
 
     _devices: Optional[List[Device]] = None
-    _last_updated_time: time = (
-        0  # preload a value of 0 so that comparison will succeed on the first run
-    )
     _min_update_time = 1200  # lets let the device_params update every 20 minutes for now. This could probably reduced signicficantly.
+    _registry: DeviceRegistry = DeviceRegistry(ttl=_min_update_time)
     _update_lock: asyncio.Lock = asyncio.Lock()  # fmt: skip
     _update_manager: UpdateManager = UpdateManager()
     _update_loop = None
     _updater: DeviceUpdater = None
     _updater_dict = {}
+    _property_fetch_concurrency = 8  # parallel get_property_list calls per batch
+    _action_list_chunk_size = 20  # devices per run_action_list request
 
     def __init__(self, auth_lib: WyzeAuthLib):
         """Initialize the base service with authentication.
@@ -124,9 +124,7 @@ class BaseService:
         """
         if BaseService._update_loop is None:
             BaseService._update_loop = asyncio.get_event_loop()
-            BaseService._update_loop.create_task(
-                BaseService._update_manager.update_next()
-            )
+            BaseService._update_manager.start()
 
     def register_updater(self, device: Device, interval):
         """Register a device for automatic status updates at a specified interval.
@@ -145,6 +143,8 @@ class BaseService:
         ```
         """
         self._updater = DeviceUpdater(self, device, interval)
+        if self._auth_lib.metrics is not None:
+            BaseService._update_manager.metrics = self._auth_lib.metrics
         BaseService._update_manager.add_updater(self._updater)
         self._updater_dict[self._updater.device] = self._updater
 
@@ -234,7 +234,19 @@ class BaseService:
             print(f"Device: {device.nickname} ({device.product_model})")
         ```
 
-        **Note:** Results are cached and shared across all BaseService instances
+        **Note:** Results are cached and shared across all BaseService instances.
+        Devices are kept in a registry keyed by MAC and updated in place, and
+        concurrent calls share a single request.
+        """
+        BaseService._devices = await BaseService._registry.refresh(
+            self._fetch_device_list
+        )
+        return BaseService._devices
+
+    async def _fetch_device_list(self) -> List[Dict[str, Any]]:
+        """Wraps the api.wyzecam.com/app/v2/home_page/get_object_list endpoint
+
+        :return: The raw device list
         """
         await self._auth_lib.refresh_if_should()
 
@@ -255,12 +267,7 @@ class BaseService:
         )
 
         check_for_errors_standard(self, response_json)
-        # Cache the devices so that update calls can pull more recent device_params
-        BaseService._devices = [
-            Device(device) for device in response_json["data"]["device_list"]
-        ]
-
-        return BaseService._devices
+        return response_json["data"]["device_list"]
 
     async def get_updated_params(
         self, device_mac: str = None
@@ -270,14 +277,10 @@ class BaseService:
         :param device_mac: The device mac to get updated params for.
         :return: Updated params for the device.
         """
-        if time.time() - BaseService._last_updated_time >= BaseService._min_update_time:
+        if BaseService._registry.is_stale:
             await self.get_object_list()
-            BaseService._last_updated_time = time.time()
-        ret_params = {}
-        for dev in BaseService._devices:
-            if dev.mac == device_mac:
-                ret_params = dev.device_params
-        return ret_params
+        device = BaseService._registry.get(device_mac)
+        return device.device_params if device is not None else {}
 
     async def _get_property_list(self, device: Device) -> List[Tuple[PropertyIDs, Any]]:
         """Wraps the api.wyzecam.com/app/v2/device/get_property_list endpoint
@@ -319,6 +322,61 @@ class BaseService:
 
         return property_list
 
+    async def _gather_per_device(
+        self,
+        devices: List[Device],
+        fetch: Callable[[Device], Awaitable[Any]],
+        concurrency: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Run `fetch` for every device concurrently with bounded parallelism.
+
+        :param devices: Devices to fetch data for
+        :param fetch: Coroutine function called once per device
+        :param concurrency: Maximum number of requests in flight
+        :return: Results keyed by device mac. A device whose fetch failed maps
+            to the raised exception so one bad device does not fail the batch.
+        :raises: The `BaseException` (e.g. `asyncio.CancelledError`) of a fetch
+            that was cancelled or interrupted, which is not a per-device error.
+        """
+        semaphore = asyncio.Semaphore(
+            concurrency or BaseService._property_fetch_concurrency
+        )
+
+        async def bounded_fetch(device: Device) -> Any:
+            async with semaphore:
+                return await fetch(device)
+
+        results = await asyncio.gather(
+            *(bounded_fetch(device) for device in devices), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        return {device.mac: result for device, result in zip(devices, results)}
+
+    async def _get_property_lists(
+        self, devices: List[Device], concurrency: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Batch variant of `_get_property_list` for many devices.
+
+        The get_property_list endpoint only accepts a single device, so the
+        requests are issued concurrently, at most `concurrency` at a time.
+
+        :param devices: Devices to get properties for
+        :param concurrency: Maximum number of requests in flight
+        :return: Property lists keyed by device mac, or the exception raised
+            for that device
+        """
+        return await self._gather_per_device(
+            devices, self._get_property_list, concurrency
+        )
+
+    async def _refresh_device_params(self, devices: List[Device]) -> None:
+        """Copy the cached device_params onto each device in `devices`."""
+        async with BaseService._update_lock:
+            for device in devices:
+                device.device_params = await self.get_updated_params(device.mac)
+
     async def _set_property_list(self, device: Device, plist: List[Dict[str, str]]):
         """Wraps the api.wyzecam.com/app/v2/device/set_property_list endpoint
 
@@ -355,6 +413,25 @@ class BaseService:
         :param device: The device for which to run the action list
         :param plist: A list of properties [{"pid": pid, "pvalue": pvalue},...]
         """
+        await self._post_action_list([self._mesh_property_action(device, plist)])
+
+    @staticmethod
+    def _mesh_property_action(
+        device: Device, plist: List[Dict[Any, Any]]
+    ) -> Dict[str, Any]:
+        """Builds a set_mesh_property entry of a run_action_list action_list"""
+        return {
+            "instance_id": device.mac,
+            "action_params": {"list": [{"mac": device.mac, "plist": plist}]},
+            "provider_key": device.product_model,
+            "action_key": "set_mesh_property",
+        }
+
+    async def _post_action_list(self, action_list: List[Dict[str, Any]]):
+        """Sends `action_list` in a single run_action_list request
+
+        :param action_list: Actions as built by `_mesh_property_action`
+        """
         await self._auth_lib.refresh_if_should()
 
         payload = {
@@ -367,14 +444,7 @@ class BaseService:
             "access_token": self._auth_lib.token.access_token,
             "phone_id": PHONE_ID,
             "app_name": APP_NAME,
-            "action_list": [
-                {
-                    "instance_id": device.mac,
-                    "action_params": {"list": [{"mac": device.mac, "plist": plist}]},
-                    "provider_key": device.product_model,
-                    "action_key": "set_mesh_property",
-                }
-            ],
+            "action_list": action_list,
         }
 
         response_json = await self._auth_lib.post(
@@ -383,18 +453,79 @@ class BaseService:
 
         check_for_errors_standard(self, response_json)
 
-    async def _get_event_list(self, count: int) -> Dict[Any, Any]:
+    async def _run_group_action_list(
+        self,
+        actions: List[Tuple[Device, Dict[str, Any]]],
+        fallback: Callable[[Device], Awaitable[Any]],
+        chunk_size: Optional[int] = None,
+    ) -> Dict[str, Optional[Exception]]:
+        """Runs the actions of many devices with as few run_action_list requests as possible.
+
+        The actions are packed into requests of at most `chunk_size` devices.
+        When such a request fails, `fallback` is called for each of its
+        devices so that one bad device does not fail the whole group.
+
+        :param actions: (device, action) pairs, one per device
+        :param fallback: Coroutine function sending the command to a single device
+        :param chunk_size: Maximum number of actions per request
+        :return: None for every device mac whose command succeeded, otherwise
+            the exception raised for that device
+        """
+        chunk_size = chunk_size or BaseService._action_list_chunk_size
+        chunks = [
+            actions[i : i + chunk_size] for i in range(0, len(actions), chunk_size)
+        ]
+
+        async def run_chunk(
+            chunk: List[Tuple[Device, Dict[str, Any]]],
+        ) -> Dict[str, Any]:
+            devices = [device for device, _ in chunk]
+            try:
+                await self._post_action_list([action for _, action in chunk])
+            except CircuitOpenError as e:
+                # The individual requests would go to the same host
+                return {device.mac: e for device in devices}
+            except Exception as e:
+                if len(chunk) == 1:
+                    return {devices[0].mac: e}
+                _LOGGER.debug(
+                    f"Group command for {len(chunk)} devices failed ({e}), "
+                    "retrying per device"
+                )
+                return await self._gather_per_device(devices, fallback)
+            return {device.mac: None for device in devices}
+
+        results = {}
+        for chunk_results in await asyncio.gather(
+            *(run_chunk(chunk) for chunk in chunks)
+        ):
+            for mac, result in chunk_results.items():
+                results[mac] = result if isinstance(result, Exception) else None
+        return results
+
+    async def _get_event_list(
+        self,
+        count: int,
+        begin_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+    ) -> Dict[Any, Any]:
         """Wraps the api.wyzecam.com/app/v2/device/get_event_list endpoint
 
-        :param count: Number of events to gather
+        :param count: Number of events to gather, newest first
+        :param begin_time: Oldest event time in ms, defaults to an hour ago
+        :param end_time: Newest event time in ms, defaults to now
         :return: Response from the server after being validated
         """
 
         await self._auth_lib.refresh_if_should()
 
+        if begin_time is None:
+            begin_time = int((time.time() - (60 * 60)) * 1000)
+        if end_time is None:
+            end_time = int(time.time() * 1000)
         payload = {
             "phone_id": PHONE_ID,
-            "begin_time": int((time.time() - (60 * 60)) * 1000),
+            "begin_time": begin_time,
             "event_type": "",
             "app_name": APP_NAME,
             "count": count,
@@ -405,7 +536,7 @@ class BaseService:
             "device_mac_list": [],
             "event_tag_list": [],
             "sv": "782ced6909a44d92a1f70d582bbe88be",
-            "end_time": int(time.time() * 1000),
+            "end_time": end_time,
             "phone_system_type": PHONE_SYSTEM_TYPE,
             "app_ver": APP_VER,
             "ts": 1623612037763,
@@ -837,41 +968,6 @@ class BaseService:
 
         check_for_errors_iot(self, response_json)
 
-    async def _local_bulb_command(self, bulb, plist):
-        # await self._auth_lib.refresh_if_should()
-
-        characteristics = {
-            "mac": bulb.mac.upper(),
-            "index": "1",
-            "ts": str(int(time.time_ns() // 1000000)),
-            "plist": plist,
-        }
-
-        characteristics_str = json.dumps(characteristics, separators=(",", ":"))
-        characteristics_enc = wyze_encrypt(bulb.enr, characteristics_str)
-
-        payload = {
-            "request": "set_status",
-            "isSendQueue": 0,
-            "characteristics": characteristics_enc,
-        }
-
-        # JSON likes to add a second \ so we have to remove it for the bulb to be happy
-        payload_str = json.dumps(payload, separators=(",", ":")).replace("\\\\", "\\")
-
-        url = "http://%s:88/device_request" % bulb.ip
-
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, data=payload_str) as response:
-                    print(await response.text())
-        except aiohttp.ClientConnectionError:
-            _LOGGER.warning(
-                "Failed to connect to bulb %s, reverting to cloud." % bulb.mac
-            )
-            await self._run_action_list(bulb, plist)
-            bulb.cloud_fallback = True
-
     async def _get_plug_history(
         self, device: Device, start_time, end_time
     ) -> Dict[Any, Any]:
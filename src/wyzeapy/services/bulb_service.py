@@ -3,12 +3,17 @@
 #  of the attached license. You should have received a copy of
 #  the license with this file. If not, please write to:
 #  katie@mulliken.net to receive a copy
+import asyncio
 import logging
 import re
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 
 from .base_service import BaseService
+from .command_coalescer import CommandCoalescer, CommandSender
+from .local_control import LOCAL_CONTROL_ERRORS, LOCAL_STATE_ERRORS, LocalControl
+from ..exceptions import CircuitOpenError
 from ..types import Device, PropertyIDs, DeviceTypes
+from ..wyze_auth_lib import WyzeAuthLib
 from ..utils import create_pid_pair
 
 _LOGGER = logging.getLogger(__name__)
@@ -40,6 +45,10 @@ class Bulb(Device):
         if self.type is DeviceTypes.MESH_LIGHT or self.type is DeviceTypes.LIGHTSTRIP:
             self._color = "000000"
 
+    def update_raw(self, dictionary: Dict[Any, Any]):
+        super().update_raw(dictionary)
+        self.ip = self.device_params["ip"]
+
     @property
     def brightness(self) -> int:
         """Property that stores the brightness of the bulb
@@ -89,6 +98,30 @@ class Bulb(Device):
 class BulbService(BaseService):
     """Bulb service for interacting with Wyze bulbs."""
 
+    def __init__(
+        self,
+        auth_lib: WyzeAuthLib,
+        command_coalescer: Optional[CommandCoalescer] = None,
+        local_control: Optional[LocalControl] = None,
+        local_state: bool = False,
+    ):
+        """Initialize the bulb service.
+
+        :param auth_lib: The authentication library for API access
+        :param command_coalescer: Merges rapid commands to the same bulb (e.g.
+            from a brightness slider) into one request. Commands are sent
+            immediately when not set.
+        :param local_control: Connection manager for local control of mesh
+            bulbs and lightstrips. A default one is created when not set.
+        :param local_state: Read the state of mesh bulbs and lightstrips over
+            the local network, falling back to the cloud for bulbs that do not
+            answer.
+        """
+        super().__init__(auth_lib)
+        self.command_coalescer = command_coalescer
+        self.local_control = local_control or LocalControl()
+        self.local_state = local_state
+
     async def update(self, bulb: Bulb) -> Bulb:
         """Update the bulb object with the latest device parameters.
 
@@ -99,7 +132,77 @@ class BulbService(BaseService):
         async with BaseService._update_lock:
             bulb.device_params = await self.get_updated_params(bulb.mac)
 
-        device_info = await self._get_property_list(bulb)
+        device_info = (await self._get_local_states([bulb])).get(bulb.mac)
+        if device_info is None:
+            device_info = await self._get_property_list(bulb)
+        self._apply_properties(bulb, device_info)
+        await self.local_control.recover([bulb])
+
+        return bulb
+
+    async def update_all(self, bulbs: List[Bulb]) -> List[Bulb]:
+        """Update many bulbs with concurrent get_property_list requests.
+
+        With `local_state` set, bulbs that answer over the local network are
+        not polled through the cloud. A bulb whose request fails keeps its
+        previous state.
+
+        :param bulbs: Bulb objects to update
+        :return: The updated bulb objects
+        """
+        await self._refresh_device_params(bulbs)
+
+        property_lists = await self._get_local_states(bulbs)
+        cloud_bulbs = [bulb for bulb in bulbs if bulb.mac not in property_lists]
+        property_lists.update(await self._get_property_lists(cloud_bulbs))
+        for bulb in bulbs:
+            device_info = property_lists[bulb.mac]
+            if isinstance(device_info, CircuitOpenError):
+                # Backend known to be down, no request was made
+                bulb.available = False
+                continue
+            if isinstance(device_info, Exception):
+                _LOGGER.warning(f"Failed to update bulb {bulb.mac}: {device_info}")
+                continue
+            self._apply_properties(bulb, device_info)
+        await self.local_control.recover(bulbs)
+
+        return bulbs
+
+    async def _get_local_states(
+        self, bulbs: List[Bulb]
+    ) -> Dict[str, List[Tuple[PropertyIDs, Any]]]:
+        """Read the state of the bulbs that can be queried locally.
+
+        :param bulbs: Bulbs to consider
+        :return: Property lists keyed by mac, for the bulbs that answered
+        """
+        local_bulbs = [
+            bulb
+            for bulb in bulbs
+            if self.local_state
+            and bulb.type in [DeviceTypes.MESH_LIGHT, DeviceTypes.LIGHTSTRIP]
+            and not bulb.cloud_fallback
+            and bulb.ip
+            and bulb.enr
+            and self.local_control.supports_status(bulb)
+        ]
+        if not local_bulbs:
+            return {}
+
+        results = await self._gather_per_device(
+            local_bulbs, self.local_control.get_status
+        )
+        states = {}
+        for mac, result in results.items():
+            if isinstance(result, LOCAL_STATE_ERRORS):
+                _LOGGER.debug(f"Local state of {mac} unavailable ({result!r})")
+            elif not isinstance(result, Exception):
+                states[mac] = result
+        return states
+
+    @staticmethod
+    def _apply_properties(bulb: Bulb, device_info: List[Tuple[PropertyIDs, Any]]):
         for property_id, value in device_info:
             if property_id == PropertyIDs.BRIGHTNESS:
                 bulb.brightness = int(float(value))
@@ -126,8 +229,6 @@ class BulbService(BaseService):
             elif property_id == PropertyIDs.LIGHTSTRIP_MUSIC_MODE:
                 bulb.music_mode = value == "1"
 
-        return bulb
-
     async def get_bulbs(self) -> List[Bulb]:
         """Get a list of all bulbs.
 
@@ -143,7 +244,7 @@ class BulbService(BaseService):
             in [DeviceTypes.LIGHT, DeviceTypes.MESH_LIGHT, DeviceTypes.LIGHTSTRIP]
         ]
 
-        return [Bulb(bulb.raw_dict) for bulb in bulbs]
+        return [self._registry.wrap(Bulb, bulb) for bulb in bulbs]
 
     async def turn_on(self, bulb: Bulb, local_control, options=None):
         plist = [create_pid_pair(PropertyIDs.ON, "1")]
@@ -152,12 +253,12 @@ class BulbService(BaseService):
             plist.extend(options)
 
         if bulb.type is DeviceTypes.LIGHT:
-            await self._set_property_list(bulb, plist)
+            await self._send_command(self._set_property_list, bulb, plist)
 
         elif bulb.type in [DeviceTypes.MESH_LIGHT, DeviceTypes.LIGHTSTRIP]:
             # Local Control
             if local_control and not bulb.cloud_fallback:
-                await self._local_bulb_command(bulb, plist)
+                await self._send_command(self._local_bulb_command, bulb, plist)
 
             # Cloud Control
             elif (
@@ -165,53 +266,170 @@ class BulbService(BaseService):
             ):  # Sun match for mesh bulbs needs to be set on a different endpoint for some reason
                 for item in plist:
                     if item["pid"] == PropertyIDs.SUN_MATCH.value:
-                        await self._set_property_list(bulb, [item])
+                        await self._send_command(self._set_property_list, bulb, [item])
                         plist.remove(item)
-                await self._run_action_list(bulb, plist)
-            else:
-                await self._run_action_list(bulb, plist)  # Lightstrips
+                await self._send_command(self._run_action_list, bulb, plist)
+            else:  # Lightstrips
+                await self._send_command(self._run_action_list, bulb, plist)
 
     async def turn_off(self, bulb: Bulb, local_control):
         plist = [create_pid_pair(PropertyIDs.ON, "0")]
 
         if bulb.type in [DeviceTypes.LIGHT]:
-            await self._set_property_list(bulb, plist)
+            await self._send_command(self._set_property_list, bulb, plist)
         elif bulb.type in [DeviceTypes.MESH_LIGHT, DeviceTypes.LIGHTSTRIP]:
             if local_control and not bulb.cloud_fallback:
-                await self._local_bulb_command(bulb, plist)
+                await self._send_command(self._local_bulb_command, bulb, plist)
             else:
-                await self._run_action_list(bulb, plist)
+                await self._send_command(self._run_action_list, bulb, plist)
 
     async def set_color_temp(self, bulb: Bulb, color_temp: int):
         plist = [create_pid_pair(PropertyIDs.COLOR_TEMP, str(color_temp))]
 
         if bulb.type in [DeviceTypes.LIGHT]:
-            await self._set_property_list(bulb, plist)
+            await self._send_command(self._set_property_list, bulb, plist)
         elif bulb.type in [DeviceTypes.MESH_LIGHT]:
-            await self._local_bulb_command(bulb, plist)
+            await self._send_command(self._local_bulb_command, bulb, plist)
 
     async def set_color(self, bulb: Bulb, color: str, local_control):
         plist = [create_pid_pair(PropertyIDs.COLOR, str(color))]
         if bulb.type in [DeviceTypes.MESH_LIGHT]:
             if local_control and not bulb.cloud_fallback:
-                await self._local_bulb_command(bulb, plist)
+                await self._send_command(self._local_bulb_command, bulb, plist)
             else:
-                await self._run_action_list(bulb, plist)
+                await self._send_command(self._run_action_list, bulb, plist)
 
     async def set_brightness(self, bulb: Device, brightness: int):
         plist = [create_pid_pair(PropertyIDs.BRIGHTNESS, str(brightness))]
 
         if bulb.type in [DeviceTypes.LIGHT]:
-            await self._set_property_list(bulb, plist)
+            await self._send_command(self._set_property_list, bulb, plist)
         if bulb.type in [DeviceTypes.MESH_LIGHT]:
-            await self._local_bulb_command(bulb, plist)
+            await self._send_command(self._local_bulb_command, bulb, plist)
 
     async def music_mode_on(self, bulb: Device):
         plist = [create_pid_pair(PropertyIDs.LIGHTSTRIP_MUSIC_MODE, "1")]
 
-        await self._run_action_list(bulb, plist)
+        await self._send_command(self._run_action_list, bulb, plist)
 
     async def music_mode_off(self, bulb: Device):
         plist = [create_pid_pair(PropertyIDs.LIGHTSTRIP_MUSIC_MODE, "0")]
 
-        await self._run_action_list(bulb, plist)
+        await self._send_command(self._run_action_list, bulb, plist)
+
+    async def run_group_command(
+        self, commands: List[Tuple[Bulb, List[Dict[str, str]]]], local_control
+    ) -> Dict[str, Optional[Exception]]:
+        """Send property lists to many bulbs at once.
+
+        Cloud commands for mesh bulbs and lightstrips are packed into as few
+        run_action_list requests as possible; a device in a request that fails
+        is retried on its own. Other bulbs are sent their commands concurrently.
+
+        :param commands: (bulb, plist) pairs, one per bulb
+        :param local_control: Send commands to mesh bulbs and lightstrips over
+            the local network where possible
+        :return: None for every bulb mac whose command succeeded, otherwise the
+            exception raised for that bulb
+        """
+        grouped: List[Tuple[Bulb, List[Dict[str, str]]]] = []
+        single: List[Tuple[CommandSender, Bulb, List[Dict[str, str]]]] = []
+        for bulb, plist in commands:
+            if bulb.type is DeviceTypes.LIGHT:
+                single.append((self._set_property_list, bulb, plist))
+            elif bulb.type in [DeviceTypes.MESH_LIGHT, DeviceTypes.LIGHTSTRIP]:
+                if local_control and not bulb.cloud_fallback:
+                    single.append((self._local_bulb_command, bulb, plist))
+                    continue
+                if bulb.type is DeviceTypes.MESH_LIGHT:
+                    # Sun match for mesh bulbs is set on a different endpoint
+                    sun_match = [
+                        item
+                        for item in plist
+                        if item["pid"] == PropertyIDs.SUN_MATCH.value
+                    ]
+                    if sun_match:
+                        single.append((self._set_property_list, bulb, sun_match))
+                        plist = [item for item in plist if item not in sun_match]
+                if plist:
+                    grouped.append((bulb, plist))
+
+        plists = {bulb.mac: plist for bulb, plist in grouped}
+        grouped_results, *single_results = await asyncio.gather(
+            self._run_group_action_list(
+                [
+                    (bulb, self._mesh_property_action(bulb, plist))
+                    for bulb, plist in grouped
+                ],
+                lambda bulb: self._run_action_list(bulb, plists[bulb.mac]),
+            ),
+            *(self._send_command(*command) for command in single),
+            return_exceptions=True,
+        )
+        for result in (grouped_results, *single_results):
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        if isinstance(grouped_results, BaseException):
+            raise grouped_results
+
+        results: Dict[str, Optional[Exception]] = {
+            bulb.mac: None for bulb, _ in commands
+        }
+        for mac, result in grouped_results.items():
+            results[mac] = result
+        for (_, bulb, _), result in zip(single, single_results):
+            if isinstance(result, Exception) and results[bulb.mac] is None:
+                results[bulb.mac] = result
+        return results
+
+    async def turn_on_group(
+        self, bulbs: List[Bulb], local_control, options=None
+    ) -> Dict[str, Optional[Exception]]:
+        """Turn on many bulbs with as few requests as possible.
+
+        :param bulbs: Bulbs to turn on
+        :param local_control: Use local control where possible
+        :param options: Extra properties to set on every bulb
+        :return: Per-bulb results as returned by `run_group_command`
+        """
+        plist = [create_pid_pair(PropertyIDs.ON, "1")]
+        if options is not None:
+            plist.extend(options)
+        return await self.run_group_command(
+            [(bulb, list(plist)) for bulb in bulbs], local_control
+        )
+
+    async def turn_off_group(
+        self, bulbs: List[Bulb], local_control
+    ) -> Dict[str, Optional[Exception]]:
+        """Turn off many bulbs with as few requests as possible.
+
+        :param bulbs: Bulbs to turn off
+        :param local_control: Use local control where possible
+        :return: Per-bulb results as returned by `run_group_command`
+        """
+        plist = [create_pid_pair(PropertyIDs.ON, "0")]
+        return await self.run_group_command(
+            [(bulb, list(plist)) for bulb in bulbs], local_control
+        )
+
+    async def _local_bulb_command(self, bulb: Bulb, plist: List[Dict[str, str]]):
+        """Send `plist` to `bulb` over the local network, or through the cloud
+        when the bulb cannot be reached.
+
+        :param bulb: The bulb to send the command to
+        :param plist: A list of properties [{"pid": pid, "pvalue": pvalue},...]
+        """
+        try:
+            await self.local_control.send(bulb, plist)
+        except LOCAL_CONTROL_ERRORS as e:
+            _LOGGER.debug(f"Local command to {bulb.mac} failed ({e!r}), using cloud")
+            await self._run_action_list(bulb, plist)
+
+    async def _send_command(
+        self, send: CommandSender, bulb: Device, plist: List[Dict[str, str]]
+    ) -> None:
+        if self.command_coalescer is None:
+            await send(bulb, plist)
+        else:
+            await self.command_coalescer.submit(bulb, plist, send)
@@ -6,15 +6,14 @@
 import asyncio
 import logging
 import time
-from threading import Thread
-from typing import Any, List, Optional, Dict, Callable, Tuple
+from typing import Any, AsyncIterator, List, Optional, Dict, Callable, Tuple
 
-from aiohttp import ClientOSError, ContentTypeError
-
-from ..exceptions import UnknownApiError
 from .base_service import BaseService
+from .event_feed import EventCursor, EventFeed
+from ..exceptions import CircuitOpenError
+from .update_manager import DEFAULT_SUBSCRIPTION_INTERVAL, SubscriptionManager
 from ..types import Device, DeviceTypes, Event, PropertyIDs, DeviceMgmtToggleProps
-from ..utils import return_event_for_device, create_pid_pair
+from ..utils import create_pid_pair
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -39,110 +38,196 @@ class Camera(Device):
 
 
 class CameraService(BaseService):
-    _updater_thread: Optional[Thread] = None
-    _subscribers: List[Tuple[Camera, Callable[[Camera], None]]] = []
+    _subscriptions: Optional[SubscriptionManager] = None
+    _event_feed: Optional[EventFeed] = None
 
     async def update(self, camera: Camera):
         # Get updated device_params
         async with BaseService._update_lock:
             camera.device_params = await self.get_updated_params(camera.mac)
 
-        # Get camera events
-        response = await self._get_event_list(10)
-        raw_events = response["data"]["event_list"]
-        latest_events = [Event(raw_event) for raw_event in raw_events]
-
-        if (event := return_event_for_device(camera, latest_events)) is not None:
-            camera.last_event = event
-            camera.last_event_ts = event.event_ts
+        # Get camera events, shared with the other cameras of the account
+        self._apply_latest_event(camera, await self.event_feed.latest(camera.mac))
 
         # Update camera state
         if camera.product_model in DEVICEMGMT_API_MODELS:  # New api
             state_response: Dict[str, Any] = await self._get_iot_prop_devicemgmt(camera)
-            for propCategory in state_response["data"]["capabilities"]:
-                if propCategory["name"] == "camera":
-                    camera.motion = propCategory["properties"][
-                        "motion-detect-recording"
-                    ]
-                if (
-                    propCategory["name"] == "floodlight"
-                    or propCategory["name"] == "spotlight"
-                ):
-                    camera.floodlight = propCategory["properties"]["on"]
-                if propCategory["name"] == "siren":
-                    camera.siren = propCategory["properties"]["state"]
-                if propCategory["name"] == "iot-device":
-                    camera.notify = propCategory["properties"]["push-switch"]
-                    camera.on = propCategory["properties"]["iot-power"]
-                    camera.available = propCategory["properties"]["iot-state"]
-
+            self._apply_devicemgmt_state(camera, state_response)
         else:  # All other cam types (old api?)
             state_response: List[
                 Tuple[PropertyIDs, Any]
             ] = await self._get_property_list(camera)
-            for property, value in state_response:
-                if property is PropertyIDs.AVAILABLE:
-                    camera.available = value == "1"
-                if property is PropertyIDs.ON:
-                    camera.on = value == "1"
-                if property is PropertyIDs.CAMERA_SIREN:
-                    camera.siren = value == "1"
-                if property is PropertyIDs.ACCESSORY:
-                    camera.floodlight = value == "1"
-                    if camera.device_params["dongle_product_model"] == "HL_CGDC":
-                        camera.garage = (
-                            value == "1"
-                        )  # 1 = open, 2 = closed by automation or smart platform (Alexa, Google Home, Rules), 0 = closed by app
-                if property is PropertyIDs.NOTIFICATION:
-                    camera.notify = value == "1"
-                if property is PropertyIDs.MOTION_DETECTION:
-                    camera.motion = value == "1"
+            self._apply_properties(camera, state_response)
 
         return camera
 
+    async def update_all(self, cameras: List[Camera]) -> List[Camera]:
+        """Update many cameras at once.
+
+        The account-wide event list is fetched a single time and shared by all
+        cameras, and the per-camera state requests are issued concurrently.
+        A camera whose state request fails keeps its previous state.
+        """
+        await self._refresh_device_params(cameras)
+
+        await self.event_feed.update()
+
+        devicemgmt_cameras = [
+            camera
+            for camera in cameras
+            if camera.product_model in DEVICEMGMT_API_MODELS
+        ]
+        other_cameras = [
+            camera
+            for camera in cameras
+            if camera.product_model not in DEVICEMGMT_API_MODELS
+        ]
+        devicemgmt_states, property_lists = await asyncio.gather(
+            self._gather_per_device(devicemgmt_cameras, self._get_iot_prop_devicemgmt),
+            self._get_property_lists(other_cameras),
+        )
+
+        for camera in cameras:
+            self._apply_latest_event(camera, self.event_feed.get(camera.mac))
+            if camera.product_model in DEVICEMGMT_API_MODELS:
+                state = devicemgmt_states[camera.mac]
+                apply_state = self._apply_devicemgmt_state
+            else:
+                state = property_lists[camera.mac]
+                apply_state = self._apply_properties
+            if isinstance(state, CircuitOpenError):
+                # Backend known to be down, no request was made
+                camera.available = False
+                continue
+            if isinstance(state, Exception):
+                _LOGGER.warning(f"Failed to update camera {camera.mac}: {state}")
+                continue
+            apply_state(camera, state)
+
+        return cameras
+
+    @property
+    def event_feed(self) -> EventFeed:
+        """The account's event list, shared by all cameras."""
+        if self._event_feed is None:
+            self._event_feed = EventFeed(
+                lambda count, begin_time, end_time: self._get_event_list(
+                    count, begin_time, end_time
+                )
+            )
+        return self._event_feed
+
+    async def stream_events(
+        self,
+        cursor: Optional[EventCursor] = None,
+        interval: float = DEFAULT_SUBSCRIPTION_INTERVAL,
+    ) -> AsyncIterator[Event]:
+        """Yield new events of all cameras, oldest first, as they happen.
+
+        Each event is yielded once. To resume after a restart, persist
+        `EventCursor.advance` of the last handled event (see
+        `EventCursor.to_dict`) and pass it back in; the events since are
+        fetched first.
+
+        :param cursor: Position to resume from, defaults to now
+        :param interval: Seconds between checks for new events
+        """
+        feed = self.event_feed
+        listener = feed.subscribe()
+        try:
+            if cursor is None:
+                cursor = EventCursor.now()
+            else:
+                await feed.backfill(cursor.event_ts)
+            while True:
+                await feed.update()
+                events = self._take_events(listener)
+                if feed.missed(listener):
+                    # Fell behind the listener's buffer: fetch what was dropped
+                    events += await feed.backfill(cursor.event_ts)
+                    events += self._take_events(listener)
+                    feed.missed(listener)
+                events.sort(key=lambda event: event.event_ts)
+                for event in events:
+                    if cursor.is_new(event):
+                        cursor = cursor.advance(event)
+                        yield event
+                await asyncio.sleep(interval)
+        finally:
+            feed.unsubscribe(listener)
+
+    @staticmethod
+    def _take_events(listener: asyncio.Queue) -> List[Event]:
+        events = []
+        while not listener.empty():
+            events.append(listener.get_nowait())
+        return events
+
+    @staticmethod
+    def _apply_latest_event(camera: Camera, event: Optional[Event]):
+        if event is not None:
+            camera.last_event = event
+            camera.last_event_ts = event.event_ts
+
+    @staticmethod
+    def _apply_devicemgmt_state(camera: Camera, state_response: Dict[str, Any]):
+        for propCategory in state_response["data"]["capabilities"]:
+            if propCategory["name"] == "camera":
+                camera.motion = propCategory["properties"]["motion-detect-recording"]
+            if (
+                propCategory["name"] == "floodlight"
+                or propCategory["name"] == "spotlight"
+            ):
+                camera.floodlight = propCategory["properties"]["on"]
+            if propCategory["name"] == "siren":
+                camera.siren = propCategory["properties"]["state"]
+            if propCategory["name"] == "iot-device":
+                camera.notify = propCategory["properties"]["push-switch"]
+                camera.on = propCategory["properties"]["iot-power"]
+                camera.available = propCategory["properties"]["iot-state"]
+
+    @staticmethod
+    def _apply_properties(
+        camera: Camera, state_response: List[Tuple[PropertyIDs, Any]]
+    ):
+        for property, value in state_response:
+            if property is PropertyIDs.AVAILABLE:
+                camera.available = value == "1"
+            if property is PropertyIDs.ON:
+                camera.on = value == "1"
+            if property is PropertyIDs.CAMERA_SIREN:
+                camera.siren = value == "1"
+            if property is PropertyIDs.ACCESSORY:
+                camera.floodlight = value == "1"
+                if camera.device_params["dongle_product_model"] == "HL_CGDC":
+                    camera.garage = (
+                        value == "1"
+                    )  # 1 = open, 2 = closed by automation or smart platform (Alexa, Google Home, Rules), 0 = closed by app
+            if property is PropertyIDs.NOTIFICATION:
+                camera.notify = value == "1"
+            if property is PropertyIDs.MOTION_DETECTION:
+                camera.motion = value == "1"
+
     async def register_for_updates(
-        self, camera: Camera, callback: Callable[[Camera], None]
+        self,
+        camera: Camera,
+        callback: Callable[[Camera], None],
+        interval: Optional[float] = None,
     ):
-        loop = asyncio.get_event_loop()
-        if not self._updater_thread:
-            self._updater_thread = Thread(
-                target=self.update_worker,
-                args=[
-                    loop,
-                ],
-                daemon=True,
-            )
-            self._updater_thread.start()
+        """Poll the camera on the running event loop and pass changes to `callback`.
 
-        self._subscribers.append((camera, callback))
+        :param camera: The camera to poll
+        :param callback: Called as `callback(camera)` when its state changes, with
+            the names of the changed fields in `camera.changed_fields`
+        :param interval: Seconds between polls, defaults to `SubscriptionManager.interval`
+        """
+        if self._subscriptions is None:
+            self._subscriptions = SubscriptionManager(metrics=self._auth_lib.metrics)
+        self._subscriptions.subscribe(self, camera, callback, interval)
 
     async def deregister_for_updates(self, camera: Camera):
-        self._subscribers = [
-            (cam, callback)
-            for cam, callback in self._subscribers
-            if cam.mac != camera.mac
-        ]
-
-    def update_worker(self, loop):
-        while True:
-            if len(self._subscribers) < 1:
-                time.sleep(0.1)
-            else:
-                for camera, callback in self._subscribers:
-                    try:
-                        callback(
-                            asyncio.run_coroutine_threadsafe(
-                                self.update(camera), loop
-                            ).result()
-                        )
-                    except UnknownApiError as e:
-                        _LOGGER.warning(
-                            f"The update method detected an UnknownApiError: {e}"
-                        )
-                    except ClientOSError as e:
-                        _LOGGER.error(f"A network error was detected: {e}")
-                    except ContentTypeError as e:
-                        _LOGGER.error(f"Server returned unexpected ContentType: {e}")
+        if self._subscriptions is not None:
+            self._subscriptions.unsubscribe(camera)
 
     async def get_cameras(self) -> List[Camera]:
         if self._devices is None:
@@ -152,7 +237,7 @@ class CameraService(BaseService):
             device for device in self._devices if device.type is DeviceTypes.CAMERA
         ]
 
-        return [Camera(camera.raw_dict) for camera in cameras]
+        return [self._registry.wrap(Camera, camera) for camera in cameras]
 
     async def turn_on(self, camera: Camera):
         if camera.product_model in DEVICEMGMT_API_MODELS:
@@ -0,0 +1,143 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Debouncing and merging of rapid device commands.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..types import Device
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds to wait for further commands before sending
+DEFAULT_WINDOW = 0.1
+# Longest a command is held back while new ones keep arriving
+DEFAULT_MAX_DELAY = 0.5
+
+CommandSender = Callable[[Device, List[Dict[str, Any]]], Awaitable[Any]]
+
+
+class _Batch:
+    __slots__ = ("device", "send", "plist", "future", "started", "timer")
+
+    def __init__(self, device: Device, send: CommandSender, started: float):
+        self.device = device
+        self.send = send
+        self.plist: Dict[str, Dict[str, Any]] = {}
+        self.future = asyncio.get_running_loop().create_future()
+        self.started = started
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class CommandCoalescer:
+    """Merges property commands sent to a device in quick succession.
+
+    Commands for a device are held back until no new command arrived for
+    `window` seconds (or for at most `max_delay` seconds), then sent as a single
+    request carrying the latest value of every property id. Everybody who
+    submitted a command to that request gets its result.
+
+    Commands for a device that go through a different sender (e.g. cloud
+    `run_action_list` after local control) are never merged: the pending
+    request is sent first, and requests to the same device are always sent
+    one after the other, in submission order.
+
+    Attributes:
+        window: Seconds of quiet after which pending commands are sent.
+        max_delay: Longest a command is held back.
+        submitted: Number of commands submitted.
+        sent: Number of requests actually sent.
+    """
+
+    def __init__(
+        self, window: float = DEFAULT_WINDOW, max_delay: float = DEFAULT_MAX_DELAY
+    ):
+        self.window = window
+        self.max_delay = max(window, max_delay)
+        self.submitted = 0
+        self.sent = 0
+        self._pending: Dict[str, _Batch] = {}
+        self._sending: Dict[str, asyncio.Future] = {}
+
+    @property
+    def pending(self) -> int:
+        """Number of devices with commands waiting to be sent."""
+        return len(self._pending)
+
+    async def submit(
+        self, device: Device, plist: List[Dict[str, Any]], send: CommandSender
+    ) -> Any:
+        """Queue `plist` for `device` and wait until it has been sent.
+
+        :param device: Target device
+        :param plist: Property pairs, e.g. `[{"pid": "P3", "pvalue": "50"}]`
+        :param send: Coroutine function sending a merged plist to the device
+        :return: The result of `send` for the merged request
+        """
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(device.mac)
+        if batch is not None and batch.send != send:
+            self._flush(device.mac)
+            batch = None
+        if batch is None:
+            batch = self._pending[device.mac] = _Batch(device, send, loop.time())
+
+        for item in plist:
+            # Last write wins, sent in the order of the latest writes
+            batch.plist.pop(item["pid"], None)
+            batch.plist[item["pid"]] = item
+        batch.device = device
+        self.submitted += 1
+
+        if batch.timer is not None:
+            batch.timer.cancel()
+        delay = min(self.window, batch.started + self.max_delay - loop.time())
+        batch.timer = loop.call_later(max(0.0, delay), self._flush, device.mac)
+        # Shielded so that one cancelled caller does not cancel the request
+        # for the others
+        return await asyncio.shield(batch.future)
+
+    async def flush(self) -> None:
+        """Send all pending commands now and wait for them to complete."""
+        futures = [batch.future for batch in self._pending.values()]
+        for mac in list(self._pending):
+            self._flush(mac)
+        await asyncio.gather(*futures, return_exceptions=True)
+
+    def _flush(self, mac: str) -> None:
+        batch = self._pending.pop(mac, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        self.sent += 1
+        previous = self._sending.get(mac)
+        sending = self._sending[mac] = asyncio.ensure_future(
+            self._send(batch, previous)
+        )
+        sending.add_done_callback(lambda _: self._sent(mac, sending))
+
+    async def _send(self, batch: _Batch, previous: Optional[asyncio.Future]) -> None:
+        if previous is not None:
+            # Keep requests to one device in order
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            result = await batch.send(batch.device, list(batch.plist.values()))
+        except asyncio.CancelledError:
+            batch.future.cancel()
+            raise
+        except Exception as e:
+            _LOGGER.debug(f"Coalesced command for {batch.device.mac} failed: {e}")
+            batch.future.set_exception(e)
+        else:
+            batch.future.set_result(result)
+
+    def _sent(self, mac: str, sending: asyncio.Future) -> None:
+        if self._sending.get(mac) is sending:
+            del self._sending[mac]
@@ -0,0 +1,157 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Account-wide device registry shared by all services.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+from ..types import Device
+
+_LOGGER = logging.getLogger(__name__)
+
+# Refresh the device list every 20 minutes by default
+DEFAULT_TTL = 1200
+
+T = TypeVar("T", bound=Device)
+DeviceListFetcher = Callable[[], Awaitable[List[Dict[str, Any]]]]
+
+
+class DeviceRegistry:
+    """Devices of the account keyed by MAC address.
+
+    The registry holds one `Device` per MAC. Refreshing it with a new device
+    list updates the existing objects in place, adds new devices and drops the
+    ones that disappeared, so references held elsewhere stay current.
+
+    Refreshes are single-flight: callers that ask for a refresh while one is in
+    progress wait for that refresh instead of starting their own request.
+
+    Attributes:
+        ttl: Seconds after which the device list is considered stale.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._devices: Dict[str, Device] = {}
+        self._wrappers: Dict[Tuple[type, str], Device] = {}
+        # The device's raw_dict each view was last refreshed from; services
+        # may give a view a raw_dict of its own (e.g. LockService.update)
+        self._synced: Dict[Tuple[type, str], Dict[str, Any]] = {}
+        self._updated: Optional[float] = None
+        self._inflight: Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def __contains__(self, mac: str) -> bool:
+        return mac in self._devices
+
+    @property
+    def devices(self) -> List[Device]:
+        """All registered devices, in the order the API returned them."""
+        return list(self._devices.values())
+
+    @property
+    def is_stale(self) -> bool:
+        """Whether the device list has never been loaded or has outlived the TTL."""
+        return self._updated is None or time.monotonic() - self._updated >= self.ttl
+
+    def get(self, mac: str) -> Optional[Device]:
+        """Return the device with the given MAC, or None."""
+        return self._devices.get(mac)
+
+    def invalidate(self):
+        """Mark the device list stale so that the next read refreshes it."""
+        self._updated = None
+
+    def update(self, device_list: List[Dict[str, Any]]) -> List[Device]:
+        """Merge a `get_object_list` device list into the registry.
+
+        :param device_list: Raw device dictionaries as returned by the API
+        :return: The registered devices
+        """
+        devices = {}
+        for raw in device_list:
+            mac = raw.get("mac")
+            device = self._devices.get(mac)
+            if device is None:
+                device = Device(raw)
+            elif device.raw_dict is not raw:
+                device.update_raw(raw)
+            devices[mac] = device
+
+        for mac in self._devices.keys() - devices.keys():
+            _LOGGER.debug(f"Device {mac} is no longer part of the account")
+        self._wrappers = {
+            key: wrapper for key, wrapper in self._wrappers.items() if key[1] in devices
+        }
+        self._synced = {
+            key: raw for key, raw in self._synced.items() if key[1] in devices
+        }
+        self._devices = devices
+        self._updated = time.monotonic()
+        return self.devices
+
+    async def refresh(self, fetch: DeviceListFetcher) -> List[Device]:
+        """Reload the device list, sharing a refresh that is already in flight.
+
+        :param fetch: Coroutine function returning the raw device list
+        :return: The registered devices
+        """
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._refresh(fetch))
+        # Shield the shared refresh so one cancelled caller does not cancel it
+        # for everybody else
+        return await asyncio.shield(self._inflight)
+
+    async def _refresh(self, fetch: DeviceListFetcher) -> List[Device]:
+        try:
+            return self.update(await fetch())
+        finally:
+            self._inflight = None
+
+    async def get_devices(self, fetch: DeviceListFetcher) -> List[Device]:
+        """Return the registered devices, refreshing them first if stale."""
+        if self.is_stale:
+            return await self.refresh(fetch)
+        return self.devices
+
+    def wrap(self, cls: Type[T], device: Device) -> T:
+        """Return the `cls` view of a device, e.g. a `Bulb` for a light.
+
+        Views are cached per class and MAC, so repeated calls return the same
+        object. When the device list changed since the view was last returned,
+        the view is refreshed in place with `Device.update_raw`, keeping the
+        state services have set on it.
+        """
+        key = (cls, device.mac)
+        wrapper = self._wrappers.get(key)
+        if wrapper is None:
+            wrapper = self._wrappers[key] = cls(device.raw_dict)
+        elif self._synced.get(key) is not device.raw_dict:
+            wrapper.update_raw(device.raw_dict)
+        self._synced[key] = device.raw_dict
+        return wrapper
+
+    def views(self) -> List[List[Device]]:
+        """The views of every registered device, for reading its full state.
+
+        Each entry holds the views of one device, most recently created
+        first, followed by the device itself. Views are kept in step with the
+        device list by `wrap`, so their current state is returned as is.
+        """
+        views: Dict[str, List[Device]] = {mac: [] for mac in self._devices}
+        for (_, mac), wrapper in self._wrappers.items():
+            if mac in views:
+                views[mac].append(wrapper)
+        for mac, device in self._devices.items():
+            views[mac].reverse()
+            views[mac].append(device)
+        return list(views.values())
@@ -0,0 +1,284 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Account-wide camera event feed shared by all cameras.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
+
+from ..types import Event
+
+# Seconds a fetched event list is reused before fetching again. Cameras polled
+# in the same update cycle share one request.
+DEFAULT_MAX_AGE = 2.5
+# Events requested per get_event_list call
+DEFAULT_PAGE_SIZE = 10
+# Most pages fetched in one update when catching up
+DEFAULT_MAX_PAGES = 10
+# Events kept in memory per device
+DEFAULT_HISTORY_SIZE = 20
+# Events buffered per subscriber that has not taken them yet
+DEFAULT_LISTENER_SIZE = 100
+
+# (count, begin_time, end_time) -> get_event_list response. Times are in ms,
+# None meaning the endpoint's default.
+EventFetcher = Callable[[int, Optional[int], Optional[int]], Awaitable[Dict[Any, Any]]]
+
+
+def _raw_key(raw_event: Dict[str, Any]) -> Any:
+    return raw_event.get("event_id") or (raw_event["device_mac"], raw_event["event_ts"])
+
+
+def _event_key(event: Event) -> Any:
+    return getattr(event, "event_id", None) or (event.device_mac, event.event_ts)
+
+
+@dataclass(frozen=True)
+class EventCursor:
+    """Position in the event stream: every event up to this one has been
+    handled.
+
+    Attributes:
+        event_ts: Timestamp (ms) of the last handled event.
+        event_ids: Ids of the handled events at `event_ts`, which may share
+            their timestamp with events not handled yet.
+    """
+
+    event_ts: int = 0
+    event_ids: FrozenSet[Any] = field(default_factory=frozenset)
+
+    @classmethod
+    def now(cls) -> "EventCursor":
+        """A cursor skipping every event that happened before now."""
+        return cls(int(time.time() * 1000))
+
+    def is_new(self, event: Event) -> bool:
+        """Whether `event` comes after this cursor."""
+        if event.event_ts != self.event_ts:
+            return event.event_ts > self.event_ts
+        return _event_key(event) not in self.event_ids
+
+    def advance(self, event: Event) -> "EventCursor":
+        """The cursor after handling `event`."""
+        if event.event_ts > self.event_ts:
+            return EventCursor(event.event_ts, frozenset((_event_key(event),)))
+        if event.event_ts == self.event_ts:
+            return EventCursor(self.event_ts, self.event_ids | {_event_key(event)})
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form, for persisting the cursor."""
+        # Events without an id are keyed by a (mac, ts) tuple, stored as a list
+        keys = (list(key) if isinstance(key, tuple) else key for key in self.event_ids)
+        return {"event_ts": self.event_ts, "event_ids": sorted(keys, key=json.dumps)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EventCursor":
+        """The cursor of a `to_dict` result, also after a JSON round trip."""
+        return cls(
+            data["event_ts"],
+            frozenset(
+                tuple(key) if isinstance(key, list) else key
+                for key in data.get("event_ids", ())
+            ),
+        )
+
+
+class EventFeed:
+    """Cache of the account-wide event list, indexed by device mac.
+
+    The get_event_list endpoint returns the events of every camera on the
+    account, so one request serves all cameras. After the first fetch, only
+    events since the newest one already seen are requested, paging back from
+    the newest event while pages come back full.
+
+    Attributes:
+        max_age: Seconds a fetch is reused before fetching again.
+        page_size: Events requested per call.
+        history_size: Events kept in memory per device.
+        last_event_ts: Timestamp (ms) of the newest event seen, or None.
+    """
+
+    def __init__(
+        self,
+        fetch: EventFetcher,
+        max_age: float = DEFAULT_MAX_AGE,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        history_size: int = DEFAULT_HISTORY_SIZE,
+    ):
+        """
+        :param fetch: Coroutine function returning a get_event_list response
+        :param max_age: Seconds a fetch is reused before fetching again
+        :param page_size: Events requested per call
+        :param history_size: Events kept in memory per device
+        """
+        self.max_age = max_age
+        self.page_size = page_size
+        self.history_size = history_size
+        self.last_event_ts: Optional[int] = None
+        self._fetch = fetch
+        self._history: Dict[str, Deque[Event]] = {}
+        self._seen: Dict[Any, int] = {}
+        self._listeners: List[asyncio.Queue] = []
+        self._missed: Set[asyncio.Queue] = set()
+        self._fetched_at: Optional[float] = None
+        self._pending: Optional[asyncio.Future] = None
+
+    @property
+    def stale(self) -> bool:
+        """Whether the next `update` would fetch."""
+        return (
+            self._fetched_at is None
+            or time.monotonic() - self._fetched_at >= self.max_age
+        )
+
+    def get(self, mac: str) -> Optional[Event]:
+        """Newest known event of the device `mac`, without fetching."""
+        history = self._history.get(mac)
+        return history[0] if history else None
+
+    def history(self, mac: str) -> List[Event]:
+        """The last `history_size` events of the device `mac`, newest first."""
+        return list(self._history.get(mac, ()))
+
+    async def latest(self, mac: str) -> Optional[Event]:
+        """Newest event of the device `mac`, fetching if the cache is stale."""
+        await self.update()
+        return self.get(mac)
+
+    async def update(self, force: bool = False) -> List[Event]:
+        """Fetch new events unless the last fetch is recent enough.
+
+        Concurrent callers share a single request.
+
+        :param force: Fetch even if the cache is fresh
+        :return: Events not seen before, newest first
+        """
+        if self._pending is None:
+            if not (force or self.stale):
+                return []
+            self._pending = asyncio.ensure_future(self._update(self.last_event_ts))
+            self._pending.add_done_callback(self._done)
+        return await asyncio.shield(self._pending)
+
+    async def backfill(self, since: int) -> List[Event]:
+        """Fetch the events since `since` (ms), e.g. to resume from a cursor.
+
+        :param since: Oldest event time to fetch
+        :return: Events not seen before, newest first
+        """
+        if self._pending is not None:
+            await asyncio.gather(asyncio.shield(self._pending), return_exceptions=True)
+        return await self._update(since)
+
+    def subscribe(self, maxsize: int = DEFAULT_LISTENER_SIZE) -> asyncio.Queue:
+        """Start putting the events fetched from now on, oldest first, on the
+        returned queue.
+
+        The queue holds at most `maxsize` events. When the owner falls further
+        behind, the oldest events are dropped and `missed` reports it, so that
+        they can be fetched again with `backfill`.
+        """
+        listener: asyncio.Queue = asyncio.Queue(maxsize)
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener: asyncio.Queue) -> None:
+        self._listeners.remove(listener)
+        self._missed.discard(listener)
+
+    def missed(self, listener: asyncio.Queue) -> bool:
+        """Whether events were dropped from `listener` since the last call."""
+        if listener in self._missed:
+            self._missed.remove(listener)
+            return True
+        return False
+
+    def _deliver(self, listener: asyncio.Queue, events: Iterable[Event]) -> None:
+        for event in events:
+            if listener.full():
+                listener.get_nowait()
+                self._missed.add(listener)
+            listener.put_nowait(event)
+
+    def _done(self, _):
+        self._pending = None
+
+    async def _update(self, begin_time: Optional[int]) -> List[Event]:
+        raw_events: List[Dict[str, Any]] = []
+        end_time = None
+        for _ in range(DEFAULT_MAX_PAGES):
+            response = await self._fetch(self.page_size, begin_time, end_time)
+            page = response["data"]["event_list"]
+            raw_events.extend(page)
+            # Without a begin time the endpoint's default window is enough
+            if begin_time is None or len(page) < self.page_size:
+                break
+            oldest = min(raw_event["event_ts"] for raw_event in page)
+            if end_time is not None and oldest >= end_time:
+                break  # A full page of events sharing one timestamp
+            end_time = oldest
+        self._fetched_at = time.monotonic()
+        return self._index(raw_events)
+
+    def _index(self, raw_events: List[Dict[str, Any]]) -> List[Event]:
+        new_events = []
+        for raw_event in raw_events:
+            key = _raw_key(raw_event)
+            # Consecutive fetches and pages overlap at their boundaries; the
+            # events seen before are not parsed again
+            if key in self._seen:
+                continue
+            event = Event(raw_event)
+            self._seen[key] = event.event_ts
+            new_events.append(event)
+            if self.last_event_ts is None or event.event_ts > self.last_event_ts:
+                self.last_event_ts = event.event_ts
+
+        new_events.sort(key=lambda event: event.event_ts, reverse=True)
+        for event in reversed(new_events):
+            self._record(event)
+        for listener in self._listeners:
+            self._deliver(listener, reversed(new_events))
+
+        # Only events at the next begin time can be returned again
+        if self.last_event_ts is not None:
+            self._seen = {
+                key: ts for key, ts in self._seen.items() if ts >= self.last_event_ts
+            }
+        return new_events
+
+    def _record(self, event: Event) -> None:
+        history = self._history.get(event.device_mac)
+        if history is None:
+            history = self._history[event.device_mac] = deque(maxlen=self.history_size)
+        if not history or event.event_ts >= history[0].event_ts:
+            history.appendleft(event)
+            return
+
+        # Backfilled event older than the newest one
+        key = _event_key(event)
+        if any(_event_key(known) == key for known in history):
+            return
+        events = sorted([*history, event], key=lambda e: e.event_ts, reverse=True)
+        history.clear()
+        history.extend(events[: history.maxlen])
@@ -0,0 +1,180 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Local, append-only history of irrigation zone runs.
+"""
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS zone_runs (
+    run_id TEXT PRIMARY KEY,
+    device_mac TEXT NOT NULL,
+    zone_number INTEGER NOT NULL,
+    schedule_name TEXT,
+    start_ts INTEGER NOT NULL,
+    end_ts INTEGER NOT NULL,
+    duration INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS zone_runs_by_zone
+    ON zone_runs (device_mac, zone_number, start_ts, end_ts, duration);
+"""
+
+_SECONDS_PER_DAY = 86400
+
+
+def _timestamp(value: str) -> int:
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def _run_id(device_mac: str, zone_run: Dict[str, Any]) -> str:
+    for key in ("zone_run_id", "run_id", "id"):
+        if zone_run.get(key):
+            return str(zone_run[key])
+    # A zone runs once at a time, so its start identifies the run
+    return f"{device_mac}/{zone_run['zone_number']}/{zone_run['start_utc']}"
+
+
+@dataclass(frozen=True)
+class ZoneStats:
+    """Watering statistics of one zone.
+
+    Attributes:
+        zone_number: The zone.
+        runs: Number of finished runs.
+        total_minutes: Minutes watered over all runs.
+        last_watered: End of the most recent run.
+        runs_per_day: Average number of runs per day over the queried period.
+    """
+
+    zone_number: int
+    runs: int
+    total_minutes: float
+    last_watered: datetime
+    runs_per_day: float
+
+
+class IrrigationHistory:
+    """Zone runs of irrigation controllers, stored in SQLite.
+
+    Runs from successive schedule_runs responses are appended as they are
+    ingested, skipping the ones already stored, so the history grows beyond
+    the `limit` most recent runs the API returns. Aggregations are answered
+    from the local database without API calls.
+
+    Only finished ('past') schedules are stored; running and upcoming ones
+    may still change.
+
+    The history may be used from any thread, one call at a time, so that
+    `IrrigationService` can ingest runs without blocking the event loop.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """
+        :param path: Database file, created if missing. By default the history
+            is kept in memory and lost when closed.
+        """
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def ingest(self, device_mac: str, schedules: List[Dict[str, Any]]) -> int:
+        """Store the zone runs of the finished schedules in a schedule_runs
+        response.
+
+        :param device_mac: The controller the schedules belong to
+        :param schedules: The response's schedules
+        :return: Number of runs that were not stored yet
+        """
+        rows = []
+        for schedule in schedules:
+            if schedule.get("schedule_state") != "past":
+                continue
+            for zone_run in schedule.get("zone_runs", ()):
+                if not (zone_run.get("start_utc") and zone_run.get("end_utc")):
+                    continue
+                start_ts = _timestamp(zone_run["start_utc"])
+                end_ts = _timestamp(zone_run["end_utc"])
+                rows.append(
+                    (
+                        _run_id(device_mac, zone_run),
+                        device_mac,
+                        zone_run["zone_number"],
+                        schedule.get("schedule_name"),
+                        start_ts,
+                        end_ts,
+                        zone_run.get("duration") or end_ts - start_ts,
+                    )
+                )
+
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO zone_runs VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            return self._db.total_changes - before
+
+    def zone_stats(
+        self, device_mac: str, since: Optional[datetime] = None
+    ) -> Dict[int, ZoneStats]:
+        """Per-zone statistics of a controller.
+
+        :param device_mac: The controller
+        :param since: Only count runs started at or after this time. Defaults
+            to the whole history.
+        :return: Statistics keyed by zone number, for zones with runs
+        """
+        since_ts = int(since.timestamp()) if since else 0
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT zone_number, COUNT(*), SUM(duration), MAX(end_ts),"
+                " MIN(start_ts) FROM zone_runs WHERE device_mac = ? AND start_ts >= ?"
+                " GROUP BY zone_number",
+                (device_mac, since_ts),
+            ).fetchall()
+
+        now = time.time()
+        stats = {}
+        for zone_number, runs, duration, last_end, first_start in rows:
+            # At least a day, so a single recent run does not look frequent
+            period = max(now - (since_ts or first_start), _SECONDS_PER_DAY)
+            stats[zone_number] = ZoneStats(
+                zone_number=zone_number,
+                runs=runs,
+                total_minutes=duration / 60,
+                last_watered=datetime.fromtimestamp(last_end, timezone.utc),
+                runs_per_day=runs * _SECONDS_PER_DAY / period,
+            )
+        return stats
+
+    def last_watered(self, device_mac: str, zone_number: int) -> Optional[datetime]:
+        """End of the most recent stored run of a zone, or None."""
+        with self._lock:
+            (last_end,) = self._db.execute(
+                "SELECT MAX(end_ts) FROM zone_runs"
+                " WHERE device_mac = ? AND zone_number = ?",
+                (device_mac, zone_number),
+            ).fetchone()
+        return (
+            None if last_end is None else datetime.fromtimestamp(last_end, timezone.utc)
+        )
@@ -1,10 +1,15 @@
+import asyncio
 import logging
+import sqlite3
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Any, Dict, List
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set
 
 from .base_service import BaseService
+from .irrigation_history import IrrigationHistory
 from ..types import Device, IrrigationProps, DeviceTypes
+from ..wyze_auth_lib import WyzeAuthLib
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -74,6 +79,111 @@ class Zone:
         # Last watered timestamp - updated by get_schedule_runs()
         self.last_watered: str | None = None  # ISO format UTC timestamp when zone last finished watering
 
+
+@lru_cache(maxsize=1024)
+def _parse_utc(value: str) -> datetime:
+    """Parse an API timestamp such as '2025-11-07T08:10:00Z'."""
+    # Remove 'Z' suffix and parse
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _is_later(value: str, than: str) -> bool:
+    """Whether the API timestamp `value` is later than `than`."""
+    # UTC timestamps of the same shape order like strings; parse only the rest
+    if len(value) == len(than) and value[-1] == than[-1] == "Z":
+        return value > than
+    return _parse_utc(value) > _parse_utc(than)
+
+
+def _schedule_key(schedule: Dict[Any, Any]) -> Any:
+    return schedule.get("schedule_id") or (
+        schedule.get("schedule_name"),
+        schedule.get("start_utc"),
+    )
+
+
+class ZoneRunIndex:
+    """Schedule runs of one controller, indexed by zone number.
+
+    Past runs are merged incrementally: a past schedule already merged by an
+    earlier update is skipped, so an update only walks the runs that are new
+    since the last one. Running and upcoming schedules change between
+    updates and are taken from the latest response only.
+    """
+
+    def __init__(self):
+        # zone number -> end_utc of its most recent finished run
+        self.last_watered: Dict[int, str] = {}
+        # zone number -> end time of its current run
+        self.running: Dict[int, datetime] = {}
+        # start_utc of the earliest upcoming schedule
+        self.next_scheduled_run: Optional[str] = None
+        # end_utc of the most recent finished schedule
+        self.last_run_end: Optional[str] = None
+        self._merged: Set[Any] = set()
+
+    def merge(self, schedules: List[Dict[Any, Any]]) -> int:
+        """Merge a schedule_runs response in a single pass.
+
+        :param schedules: The response's schedules, in any order
+        :return: Number of past schedules that were new
+        """
+        running: Dict[int, datetime] = {}
+        next_run: Optional[str] = None
+        merged: Set[Any] = set()
+        new_past = 0
+
+        for schedule in schedules:
+            state = schedule.get("schedule_state")
+            if state == "past":
+                key = _schedule_key(schedule)
+                merged.add(key)
+                if key in self._merged:
+                    continue
+                new_past += 1
+                self._merge_past(schedule)
+            elif state == "running":
+                for zone_run in schedule.get("zone_runs", []):
+                    end_utc = zone_run.get("end_utc")
+                    if end_utc:
+                        end_time = _parse_utc(end_utc)
+                        zone_number = zone_run.get("zone_number")
+                        known = running.get(zone_number)
+                        if known is None or end_time > known:
+                            running[zone_number] = end_time
+            elif state == "upcoming":
+                start_utc = schedule.get("start_utc")
+                if start_utc and (next_run is None or _is_later(next_run, start_utc)):
+                    next_run = start_utc
+
+        self.running = running
+        self.next_scheduled_run = next_run
+        # Schedules that fell out of the response window cannot come back
+        self._merged = merged
+        return new_past
+
+    def _merge_past(self, schedule: Dict[Any, Any]) -> None:
+        end_utc = schedule.get("end_utc")
+        if end_utc and (
+            self.last_run_end is None or _is_later(end_utc, self.last_run_end)
+        ):
+            self.last_run_end = end_utc
+        last_watered = self.last_watered
+        for zone_run in schedule.get("zone_runs", ()):
+            end_utc = zone_run.get("end_utc")
+            if not end_utc:
+                continue
+            zone_number = zone_run.get("zone_number")
+            known = last_watered.get(zone_number)
+            # _is_later inlined for the common case, this runs for every zone run
+            if known is None or (
+                end_utc > known
+                if len(end_utc) == len(known) and end_utc[-1] == known[-1] == "Z"
+                else _is_later(end_utc, known)
+            ):
+                last_watered[zone_number] = end_utc
+
+
 class Irrigation(Device):
     def __init__(self, dictionary: Dict[Any, Any]):
         super().__init__(dictionary)
@@ -90,34 +200,73 @@ class Irrigation(Device):
         # Schedule information - updated by get_schedule_runs()
         self.next_scheduled_run: str | None = None  # ISO format UTC timestamp of next scheduled run
         self.last_run_end_time: str | None = None  # ISO format UTC timestamp when last run completed
+        # Schedule runs merged so far, so that updates only process new runs
+        self.zone_runs: ZoneRunIndex = ZoneRunIndex()
 
 
 class IrrigationService(BaseService):
-    async def update(self, irrigation: Irrigation) -> Irrigation:
-        """Update the irrigation device with latest data from Wyze API."""
-        # Get IoT properties
-        properties = (await self.get_iot_prop(irrigation))['data']['props']
+    def __init__(self, auth_lib: WyzeAuthLib, history: Optional[IrrigationHistory] = None):
+        """Initialize the irrigation service.
 
-        # Update device properties
-        irrigation.RSSI = properties.get('RSSI', -65)
-        irrigation.IP = properties.get('IP', '192.168.1.100')
-        irrigation.sn = properties.get('sn', 'SN123456789')
-        irrigation.ssid = properties.get('ssid', 'ssid')
-        irrigation.available = (properties.get(IrrigationProps.IOT_STATE.value) == 'connected')
-
-        # Get zones
-        zones = (await self.get_zone_by_device(irrigation))['data']['zones']
+        :param auth_lib: The authentication library for API access
+        :param history: Local store that every fetched schedule_runs response
+            is added to, for per-zone statistics beyond the runs the API
+            returns. Runs are not kept when not set.
+        """
+        super().__init__(auth_lib)
+        self.history = history
 
-        # Update zones
-        irrigation.zones = []
-        for zone in zones:
-            irrigation.zones.append(Zone(zone))
+    async def update(self, irrigation: Irrigation) -> Irrigation:
+        """Update the irrigation device with latest data from Wyze API.
 
-        # Get running status from schedule_runs API
-        try:
-            await self._update_running_status(irrigation)
-        except Exception as e:
-            _LOGGER.warning(f"Failed to update running status: {e}")
+        The IoT properties, zones and schedule runs are fetched concurrently.
+        Whatever was fetched is applied even if other requests failed; only
+        when all of them fail is the first error raised.
+        """
+        results = await asyncio.gather(
+            self.get_iot_prop(irrigation),
+            self.get_zone_by_device(irrigation),
+            self.get_schedule_runs(irrigation, limit=20),
+            return_exceptions=True,
+        )
+        for result in results:
+            # Cancellation is not a failed request
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        errors = [result for result in results if isinstance(result, Exception)]
+        if len(errors) == len(results):
+            raise errors[0]
+        iot_prop, zones, schedule_runs = results
+
+        if isinstance(iot_prop, Exception):
+            _LOGGER.warning(f"Failed to update properties of {irrigation.mac}: {iot_prop}")
+        else:
+            properties = iot_prop['data']['props']
+
+            # Update device properties
+            irrigation.RSSI = properties.get('RSSI', -65)
+            irrigation.IP = properties.get('IP', '192.168.1.100')
+            irrigation.sn = properties.get('sn', 'SN123456789')
+            irrigation.ssid = properties.get('ssid', 'ssid')
+            irrigation.available = (properties.get(IrrigationProps.IOT_STATE.value) == 'connected')
+
+        # Update zones, keeping the known ones if they could not be fetched
+        if isinstance(zones, Exception):
+            _LOGGER.warning(f"Failed to update zones of {irrigation.mac}: {zones}")
+        else:
+            irrigation.zones = []
+            for zone in zones['data']['zones']:
+                irrigation.zones.append(Zone(zone))
+
+        # Apply running status from schedule_runs API
+        if isinstance(schedule_runs, Exception):
+            _LOGGER.warning(f"Failed to update running status: {schedule_runs}")
+        else:
+            try:
+                self._apply_running_status(irrigation, schedule_runs)
+            except Exception as e:
+                _LOGGER.warning(f"Failed to update running status: {e}")
+            await self._record_history(irrigation, schedule_runs)
 
         return irrigation
     async def update_device_props(self, irrigation: Irrigation) -> Irrigation:
@@ -139,7 +288,7 @@ class IrrigationService(BaseService):
 
         irrigations = [device for device in self._devices if device.type == DeviceTypes.IRRIGATION and "BS_WK1" in device.product_model]
 
-        return [Irrigation(irrigation.raw_dict) for irrigation in irrigations]
+        return [self._registry.wrap(Irrigation, irrigation) for irrigation in irrigations]
 
     async def start_zone(self, irrigation: Device, zone_number: int, quickrun_duration: int) -> Dict[Any, Any]:
         """Start a zone with the specified duration.
@@ -260,72 +409,52 @@ class IrrigationService(BaseService):
         2. Updates is_running and remaining_time for each zone
         3. Updates last_watered timestamp from most recent past schedule
         """
-        # Reset all zones to not running
-        for zone in irrigation.zones:
-            zone.is_running = False
-            zone.remaining_time = 0
-
         # Get schedule runs (increase limit to get more past runs)
         try:
             response = await self.get_schedule_runs(irrigation, limit=20)
-            schedules = response.get('data', {}).get('schedules', [])
-
-            # Find running schedule
-            now = datetime.now(timezone.utc)
-            for schedule in schedules:
-                if schedule.get('schedule_state') == 'running':
-                    # Parse end time
-                    end_utc_str = schedule.get('end_utc')
-                    if end_utc_str:
-                        # Remove 'Z' suffix and parse
-                        end_time = datetime.fromisoformat(end_utc_str.replace('Z', '+00:00'))
-
-                        # Check zone_runs to find which zones are running
-                        zone_runs = schedule.get('zone_runs', [])
-                        for zone_run in zone_runs:
-                            zone_number = zone_run.get('zone_number')
-                            zone_end_utc = zone_run.get('end_utc')
-
-                            if zone_end_utc:
-                                zone_end_time = datetime.fromisoformat(zone_end_utc.replace('Z', '+00:00'))
-                                zone_remaining = int((zone_end_time - now).total_seconds())
-
-                                # Find matching zone and update status
-                                for zone in irrigation.zones:
-                                    if zone.zone_number == zone_number:
-                                        # Only mark as running if end time is in the future
-                                        if zone_remaining > 0:
-                                            zone.is_running = True
-                                            zone.remaining_time = zone_remaining
-                                        break
-
-            # Update last_watered timestamps from past schedules
-            # Find the most recent completed watering for each zone
-            past_schedules = [s for s in schedules if s.get('schedule_state') == 'past']
-            for zone in irrigation.zones:
-                # Look through past schedules for this zone (most recent first)
-                for schedule in past_schedules:
-                    zone_runs = schedule.get('zone_runs', [])
-                    for zone_run in zone_runs:
-                        if zone_run.get('zone_number') == zone.zone_number:
-                            # Found a past run for this zone, use its end time
-                            zone_end_utc = zone_run.get('end_utc')
-                            if zone_end_utc:
-                                zone.last_watered = zone_end_utc
-                                break  # Use the first (most recent) match
-                    if zone.last_watered:
-                        break  # Stop searching once we found the most recent
-
-            # Update device-level schedule information
-            upcoming_schedules = [s for s in schedules if s.get('schedule_state') == 'upcoming']
-            if upcoming_schedules:
-                # Get the first (next) upcoming schedule
-                irrigation.next_scheduled_run = upcoming_schedules[0].get('start_utc')
-
-            if past_schedules:
-                # Get the most recent past schedule end time
-                irrigation.last_run_end_time = past_schedules[0].get('end_utc')
-
+            self._apply_running_status(irrigation, response)
         except Exception as e:
             _LOGGER.debug(f"Could not update running status: {e}")
             # Silently fail - running status is optional
+            return
+        await self._record_history(irrigation, response)
+
+    async def _record_history(self, irrigation: Irrigation, response: Dict[Any, Any]) -> None:
+        """Add the finished runs of a schedule_runs response to `history`.
+
+        The database write runs in a worker thread, off the event loop.
+        """
+        if self.history is None:
+            return
+        try:
+            schedules = response.get('data', {}).get('schedules', [])
+            added = await asyncio.to_thread(self.history.ingest, irrigation.mac, schedules)
+        except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
+            _LOGGER.warning(f"Failed to record run history of {irrigation.mac}: {e}")
+            return
+        if added:
+            _LOGGER.debug(f"Recorded {added} new zone runs of {irrigation.mac}")
+
+    @staticmethod
+    def _apply_running_status(irrigation: Irrigation, response: Dict[Any, Any]) -> None:
+        """Update zone running status and watering times from a schedule_runs response."""
+        schedules = response.get("data", {}).get("schedules", [])
+        runs = irrigation.zone_runs
+        runs.merge(schedules)
+
+        now = datetime.now(timezone.utc)
+        for zone in irrigation.zones:
+            end_time = runs.running.get(zone.zone_number)
+            remaining = int((end_time - now).total_seconds()) if end_time else 0
+            # Only running if the end time is in the future
+            zone.is_running = remaining > 0
+            zone.remaining_time = max(remaining, 0)
+            last_watered = runs.last_watered.get(zone.zone_number)
+            if last_watered:
+                zone.last_watered = last_watered
+
+        # Update device-level schedule information
+        if runs.next_scheduled_run:
+            irrigation.next_scheduled_run = runs.next_scheduled_run
+        if runs.last_run_end:
+            irrigation.last_run_end_time = runs.last_run_end
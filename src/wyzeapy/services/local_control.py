@@ -0,0 +1,283 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Local (LAN) control of mesh bulbs and lightstrips.
+
+Bulbs accept encrypted commands and state queries on
+`http://<ip>:88/device_request`. One `LocalControl` keeps a keep-alive
+connection open to every bulb it talks to, so that consecutive requests skip
+the TCP handshake, and tracks how reliably each bulb answers. A bulb is only
+switched to cloud control after `failure_threshold` failures in a row, and
+switched back once a health check finds it reachable again.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+
+from ..types import Device, PropertyIDs
+from ..utils import PADDING, wyze_decrypt, wyze_encrypt
+
+_LOGGER = logging.getLogger(__name__)
+
+LOCAL_CONTROL_PORT = 88
+
+# Errors meaning the bulb could not be reached over the LAN
+LOCAL_CONTROL_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, OSError)
+# Errors of a local state query, which also fails on an unreadable answer
+LOCAL_STATE_ERRORS = LOCAL_CONTROL_ERRORS + (ValueError,)
+
+
+class LocalControl:
+    """Sends commands to and reads the state of bulbs over the local network.
+
+    Attributes:
+        failure_threshold: Consecutive failures after which a bulb is switched
+            to cloud control.
+        timeout: Seconds to wait for a bulb to answer a command.
+        health_check_timeout: Seconds to wait for a bulb to accept a connection
+            during a health check.
+        recheck_interval: Minimum seconds between health checks of a bulb that
+            was switched to cloud control.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        timeout: float = 2.0,
+        health_check_timeout: float = 0.5,
+        recheck_interval: float = 60.0,
+        keepalive_timeout: float = 30.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.timeout = timeout
+        self.health_check_timeout = health_check_timeout
+        self.recheck_interval = recheck_interval
+        self._keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._keys: Dict[str, Tuple[str, bytes]] = {}
+        self._failures: Dict[str, int] = {}
+        self._last_check: Dict[str, float] = {}
+        self._no_status: Set[str] = set()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    # One persistent connection per bulb; the bulbs handle
+                    # requests one at a time anyway
+                    limit=0,
+                    limit_per_host=1,
+                    keepalive_timeout=self._keepalive_timeout,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close all connections to the bulbs."""
+        if self._session is not None:
+            if not self._session.closed:
+                await self._session.close()
+            self._session = None
+
+    def failures(self, bulb: Device) -> int:
+        """Consecutive failed attempts to reach `bulb`."""
+        return self._failures.get(bulb.mac, 0)
+
+    def _key(self, bulb: Device) -> bytes:
+        cached = self._keys.get(bulb.mac)
+        if cached is None or cached[0] != bulb.enr:
+            cached = self._keys[bulb.mac] = (bulb.enr, bulb.enr.encode("ascii"))
+        return cached[1]
+
+    def _payload(
+        self, bulb: Device, plist: List[Dict[str, Any]], request: str = "set_status"
+    ) -> str:
+        characteristics = {
+            "mac": bulb.mac.upper(),
+            "index": "1",
+            "ts": str(int(time.time_ns() // 1000000)),
+            "plist": plist,
+        }
+        characteristics_str = json.dumps(characteristics, separators=(",", ":"))
+
+        payload = {
+            "request": request,
+            "isSendQueue": 0,
+            "characteristics": wyze_encrypt(self._key(bulb), characteristics_str),
+        }
+        # JSON likes to add a second \ so we have to remove it for the bulb to be happy
+        return json.dumps(payload, separators=(",", ":")).replace("\\\\", "\\")
+
+    async def _request(self, bulb: Device, payload: str) -> str:
+        url = f"http://{bulb.ip}:{LOCAL_CONTROL_PORT}/device_request"
+        async with self._get_session().post(url, data=payload) as response:
+            response.raise_for_status()
+            return await response.text()
+
+    async def _post(self, bulb: Device, payload: str) -> str:
+        try:
+            text = await self._request(bulb, payload)
+        except LOCAL_CONTROL_ERRORS as e:
+            self._failed(bulb, e)
+            raise
+        self._failures.pop(bulb.mac, None)
+        return text
+
+    async def send(self, bulb: Device, plist: List[Dict[str, Any]]) -> None:
+        """Send `plist` to `bulb` over the local network.
+
+        A bulb that failed `failure_threshold` times in a row gets
+        `cloud_fallback` set.
+
+        :param bulb: Bulb with `ip` and `enr` set
+        :param plist: A list of properties [{"pid": pid, "pvalue": pvalue},...]
+        :raises: One of `LOCAL_CONTROL_ERRORS` when the bulb could not be reached
+        """
+        text = await self._post(bulb, self._payload(bulb, plist))
+        _LOGGER.debug(f"Bulb {bulb.mac} replied: {text}")
+
+    def supports_status(self, bulb: Device) -> bool:
+        """Whether `bulb` has not yet rejected a status query or answered it
+        with something unreadable."""
+        return bulb.mac not in self._no_status
+
+    def _unsupported_status(self, bulb: Device, reason: Exception) -> None:
+        _LOGGER.info(
+            f"Bulb {bulb.mac} does not report its state locally ({reason!r}), "
+            "reading it from the cloud"
+        )
+        self._no_status.add(bulb.mac)
+
+    async def get_status(self, bulb: Device) -> List[Tuple[PropertyIDs, Any]]:
+        """Read the properties of `bulb` over the local network.
+
+        Failed status queries do not count towards `failure_threshold`, so a
+        bulb that cannot report its state keeps receiving commands locally.
+
+        :param bulb: Bulb with `ip` and `enr` set
+        :return: (property id, value) pairs, as returned by `_get_property_list`
+        :raises: One of `LOCAL_STATE_ERRORS` when the bulb could not be reached
+            or its answer could not be read. When the bulb rejected the query
+            or its answer was unreadable, it is not queried locally again.
+        """
+        payload = self._payload(bulb, [], request="get_status")
+        try:
+            text = await self._request(bulb, payload)
+        except aiohttp.ClientResponseError as e:
+            if 400 <= e.status < 500 or e.status == 501:
+                self._unsupported_status(bulb, e)
+            raise
+        try:
+            properties = self._parse_status(bulb, text)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._unsupported_status(bulb, e)
+            raise ValueError(f"Unreadable status from bulb {bulb.mac}") from e
+
+        # The bulb answered, so it is online
+        properties.append((PropertyIDs.AVAILABLE, "1"))
+        return properties
+
+    def _parse_status(self, bulb: Device, text: str) -> List[Tuple[PropertyIDs, Any]]:
+        response = json.loads(text)
+        characteristics = response["characteristics"]
+        if isinstance(characteristics, str):
+            decrypted = wyze_decrypt(bulb.enr, characteristics.replace("\\/", "/"))
+            characteristics = json.loads(decrypted.rstrip(PADDING.decode("ascii")))
+
+        properties = []
+        for prop in characteristics["plist"]:
+            try:
+                property_id = PropertyIDs(prop["pid"])
+            except ValueError:
+                continue
+            properties.append((property_id, prop.get("pvalue", prop.get("value"))))
+        if not properties:
+            raise ValueError("no known properties")
+        return properties
+
+    async def send_many(
+        self, commands: List[Tuple[Device, List[Dict[str, Any]]]]
+    ) -> Dict[str, Optional[Exception]]:
+        """Send commands to many bulbs concurrently.
+
+        :param commands: (bulb, plist) pairs
+        :return: None for every bulb mac the command reached, otherwise the
+            error raised for that bulb
+        """
+        results = await asyncio.gather(
+            *(self.send(bulb, plist) for bulb, plist in commands),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        return {
+            bulb.mac: result if isinstance(result, Exception) else None
+            for (bulb, _), result in zip(commands, results)
+        }
+
+    async def check(self, bulb: Device) -> bool:
+        """Check whether `bulb` accepts connections on the local network.
+
+        A reachable bulb is switched back from cloud to local control.
+
+        :param bulb: Bulb with `ip` set
+        :return: Whether the bulb is reachable
+        """
+        self._last_check[bulb.mac] = time.monotonic()
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(bulb.ip, LOCAL_CONTROL_PORT),
+                self.health_check_timeout,
+            )
+        except (asyncio.TimeoutError, OSError) as e:
+            self._failed(bulb, e)
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            # The connection was reset, but it was accepted
+            pass
+
+        self._failures.pop(bulb.mac, None)
+        if bulb.cloud_fallback:
+            _LOGGER.info(f"Bulb {bulb.mac} is reachable again, using local control")
+            bulb.cloud_fallback = False
+        return True
+
+    async def recover(self, bulbs: List[Device]) -> None:
+        """Health check the bulbs switched to cloud control, at most once per
+        `recheck_interval`.
+
+        :param bulbs: Bulbs to consider
+        """
+        now = time.monotonic()
+        due = [
+            bulb
+            for bulb in bulbs
+            if bulb.cloud_fallback
+            and bulb.ip
+            and now - self._last_check.get(bulb.mac, -self.recheck_interval)
+            >= self.recheck_interval
+        ]
+        if due:
+            await asyncio.gather(*(self.check(bulb) for bulb in due))
+
+    def _failed(self, bulb: Device, error: BaseException) -> None:
+        failures = self._failures[bulb.mac] = self._failures.get(bulb.mac, 0) + 1
+        if failures >= self.failure_threshold and not bulb.cloud_fallback:
+            _LOGGER.warning(
+                f"Bulb {bulb.mac} failed {failures} times in a row over the local "
+                f"network ({error!r}), reverting to cloud."
+            )
+            bulb.cloud_fallback = True
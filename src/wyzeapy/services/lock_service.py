@@ -54,7 +54,7 @@ class LockService(BaseService):
 
         locks = [device for device in self._devices if device.type is DeviceTypes.LOCK]
 
-        return [Lock(device.raw_dict) for device in locks]
+        return [self._registry.wrap(Lock, device) for device in locks]
 
     async def lock(self, lock: Lock):
         await self._lock_control(lock, "remoteLock")
@@ -3,15 +3,11 @@
 #  of the attached license. You should have received a copy of
 #  the license with this file. If not, please write to:
 #  katie@mulliken.net to receive a copy
-import asyncio
 import logging
-from threading import Thread
-from typing import List, Callable, Tuple, Optional
+from typing import List, Callable, Optional
 
-from aiohttp import ClientOSError, ContentTypeError
-
-from ..exceptions import UnknownApiError
 from .base_service import BaseService
+from .update_manager import SubscriptionManager
 from ..types import Device, PropertyIDs, DeviceTypes
 
 _LOGGER = logging.getLogger(__name__)
@@ -22,8 +18,7 @@ class Sensor(Device):
 
 
 class SensorService(BaseService):
-    _updater_thread: Optional[Thread] = None
-    _subscribers: List[Tuple[Sensor, Callable[[Sensor], None]]] = []
+    _subscriptions: Optional[SubscriptionManager] = None
 
     async def update(self, sensor: Sensor) -> Sensor:
         # Get updated device_params
@@ -46,47 +41,26 @@ class SensorService(BaseService):
         return sensor
 
     async def register_for_updates(
-        self, sensor: Sensor, callback: Callable[[Sensor], None]
+        self,
+        sensor: Sensor,
+        callback: Callable[[Sensor], None],
+        interval: Optional[float] = None,
     ):
-        _LOGGER.debug(f"Registering sensor: {sensor.nickname} for updates")
-        loop = asyncio.get_event_loop()
-        if not self._updater_thread:
-            self._updater_thread = Thread(
-                target=self.update_worker,
-                args=[
-                    loop,
-                ],
-                daemon=True,
-            )
-            self._updater_thread.start()
+        """Poll the sensor on the running event loop and pass changes to `callback`.
 
-        self._subscribers.append((sensor, callback))
+        :param sensor: The sensor to poll
+        :param callback: Called as `callback(sensor)` when its state changes, with
+            the names of the changed fields in `sensor.changed_fields`
+        :param interval: Seconds between polls, defaults to `SubscriptionManager.interval`
+        """
+        _LOGGER.debug(f"Registering sensor: {sensor.nickname} for updates")
+        if self._subscriptions is None:
+            self._subscriptions = SubscriptionManager(metrics=self._auth_lib.metrics)
+        self._subscriptions.subscribe(self, sensor, callback, interval)
 
     async def deregister_for_updates(self, sensor: Sensor):
-        self._subscribers = [
-            (sense, callback)
-            for sense, callback in self._subscribers
-            if sense.mac != sensor.mac
-        ]
-
-    def update_worker(self, loop):
-        while True:
-            for sensor, callback in self._subscribers:
-                _LOGGER.debug(f"Providing update for {sensor.nickname}")
-                try:
-                    callback(
-                        asyncio.run_coroutine_threadsafe(
-                            self.update(sensor), loop
-                        ).result()
-                    )
-                except UnknownApiError as e:
-                    _LOGGER.warning(
-                        f"The update method detected an UnknownApiError: {e}"
-                    )
-                except ClientOSError as e:
-                    _LOGGER.error(f"A network error was detected: {e}")
-                except ContentTypeError as e:
-                    _LOGGER.error(f"Server returned unexpected ContentType: {e}")
+        if self._subscriptions is not None:
+            self._subscriptions.unsubscribe(sensor)
 
     async def get_sensors(self) -> List[Sensor]:
         if self._devices is None:
@@ -98,4 +72,4 @@ class SensorService(BaseService):
             if device.type is DeviceTypes.MOTION_SENSOR
             or device.type is DeviceTypes.CONTACT_SENSOR
         ]
-        return [Sensor(sensor.raw_dict) for sensor in sensors]
+        return [self._registry.wrap(Sensor, sensor) for sensor in sensors]
@@ -3,12 +3,21 @@
 #  of the attached license. You should have received a copy of
 #  the license with this file. If not, please write to:
 #  katie@mulliken.net to receive a copy
-from typing import List, Dict, Any
+import logging
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Dict, Any, Optional, Tuple
 
 from .base_service import BaseService
+from ..exceptions import CircuitOpenError
 from ..types import Device, DeviceTypes, PropertyIDs
+from ..wyze_auth_lib import WyzeAuthLib
+from .usage_cache import DEFAULT_WINDOW_HOURS, UsageCache
 from datetime import timedelta, datetime
 
+if TYPE_CHECKING:
+    from .usage_series import UsageSeries
+
+_LOGGER = logging.getLogger(__name__)
+
 
 class Switch(Device):
     def __init__(self, dictionary: Dict[Any, Any]):
@@ -23,15 +32,39 @@ class SwitchService(BaseService):
             switch.device_params = await self.get_updated_params(switch.mac)
 
         device_info = await self._get_property_list(switch)
+        self._apply_properties(switch, device_info)
+
+        return switch
 
+    async def update_all(self, switches: List[Switch]) -> List[Switch]:
+        """Update many switches with concurrent get_property_list requests.
+
+        A switch whose request fails keeps its previous state.
+        """
+        await self._refresh_device_params(switches)
+
+        property_lists = await self._get_property_lists(switches)
+        for switch in switches:
+            device_info = property_lists[switch.mac]
+            if isinstance(device_info, CircuitOpenError):
+                # Backend known to be down, no request was made
+                switch.available = False
+                continue
+            if isinstance(device_info, Exception):
+                _LOGGER.warning(f"Failed to update switch {switch.mac}: {device_info}")
+                continue
+            self._apply_properties(switch, device_info)
+
+        return switches
+
+    @staticmethod
+    def _apply_properties(switch: Switch, device_info: List[Tuple[PropertyIDs, Any]]):
         for property_id, value in device_info:
             if property_id == PropertyIDs.ON:
                 switch.on = value == "1"
             elif property_id == PropertyIDs.AVAILABLE:
                 switch.available = value == "1"
 
-        return switch
-
     async def get_switches(self) -> List[Switch]:
         if self._devices is None:
             self._devices = await self.get_object_list()
@@ -42,7 +75,7 @@ class SwitchService(BaseService):
             if device.type is DeviceTypes.PLUG
             or device.type is DeviceTypes.OUTDOOR_PLUG
         ]
-        return [Switch(switch.raw_dict) for switch in devices]
+        return [self._registry.wrap(Switch, switch) for switch in devices]
 
     async def turn_on(self, switch: Switch):
         await self._set_property(switch, PropertyIDs.ON.value, "1")
@@ -50,18 +83,125 @@ class SwitchService(BaseService):
     async def turn_off(self, switch: Switch):
         await self._set_property(switch, PropertyIDs.ON.value, "0")
 
+    async def turn_on_group(
+        self, switches: List[Switch]
+    ) -> Dict[str, Optional[Exception]]:
+        """Turn on many plugs with as few requests as possible.
+
+        :param switches: Plugs to turn on
+        :return: None for every plug mac that was turned on, otherwise the
+            exception raised for that plug
+        """
+        return await self._set_group_power(switches, "power_on", self.turn_on)
+
+    async def turn_off_group(
+        self, switches: List[Switch]
+    ) -> Dict[str, Optional[Exception]]:
+        """Turn off many plugs with as few requests as possible.
+
+        :param switches: Plugs to turn off
+        :return: None for every plug mac that was turned off, otherwise the
+            exception raised for that plug
+        """
+        return await self._set_group_power(switches, "power_off", self.turn_off)
+
+    async def _set_group_power(
+        self,
+        switches: List[Switch],
+        action_key: str,
+        fallback: Callable[[Switch], Awaitable[None]],
+    ) -> Dict[str, Optional[Exception]]:
+        """Run `action_key` on many plugs, calling `fallback` for failed ones."""
+        actions = [
+            (
+                switch,
+                {
+                    "instance_id": switch.mac,
+                    "action_params": {},
+                    "provider_key": switch.product_model,
+                    "action_key": action_key,
+                },
+            )
+            for switch in switches
+        ]
+        return await self._run_group_action_list(actions, fallback)
+
 
 class SwitchUsageService(SwitchService):
-    """Class to retrieve the last 25 hours of usage data."""
+    """Class to retrieve the last 25 hours of usage data.
+
+    Records are cached per plug in a `UsageCache`. The first update of a plug
+    fetches the full window; later updates only fetch the records from the
+    newest cached one on, which may still have been filling up.
+    """
+
+    def __init__(self, auth_lib: WyzeAuthLib):
+        super().__init__(auth_lib)
+        self._usage: Dict[str, UsageCache] = {}
+
+    def usage(self, device: Device) -> Optional[UsageCache]:
+        """The cached usage of `device`, or None before its first update."""
+        return self._usage.get(device.mac)
+
+    def usage_series(self, devices: Optional[List[Device]] = None) -> "UsageSeries":
+        """The cached usage of many plugs as one NumPy-backed series.
+
+        Requires the `numpy` package (`pip install wyzeapy[analytics]`).
+
+        :param devices: Plugs to include, all updated plugs by default. Plugs
+            without cached usage are left out.
+        :return: A `UsageSeries` with one row per plug
+        """
+        try:
+            from .usage_series import UsageSeries
+        except ImportError as e:
+            raise ImportError("UsageSeries requires the numpy package") from e
+
+        if devices is None:
+            caches = self._usage
+        else:
+            caches = {
+                device.mac: self._usage[device.mac]
+                for device in devices
+                if device.mac in self._usage
+            }
+        return UsageSeries.from_caches(caches)
 
     async def update(self, device: Device):
-        start_time = int(
-            datetime.timestamp((datetime.now() - timedelta(hours=25))) * 1000
-        )
-        end_time = int(datetime.timestamp(datetime.now()) * 1000)
-
-        device.usage_history = await self._get_plug_history(
-            device, start_time, end_time
+        now = datetime.now()
+        window_start = int(
+            datetime.timestamp(now - timedelta(hours=DEFAULT_WINDOW_HOURS)) * 1000
         )
-
+        end_time = int(datetime.timestamp(now) * 1000)
+
+        cache = self._usage.get(device.mac)
+        start_time = window_start
+        if cache is not None and cache.last_record_ts is not None:
+            start_time = max(cache.last_record_ts, window_start)
+
+        records = await self._get_plug_history(device, start_time, end_time)
+
+        try:
+            if cache is None:
+                cache = UsageCache()
+            cache.merge(records)
+        except (KeyError, TypeError, ValueError) as e:
+            # Not records we know how to read; keep the response as it is
+            _LOGGER.debug(f"Not caching usage of {device.mac}: {e!r}")
+            if self._usage.pop(device.mac, None) is not None:
+                # Only the records since the cached ones were fetched
+                return await self.update(device)
+            device.usage_history = records
+            return device
+
+        self._usage[device.mac] = cache
+        device.usage_history = cache.records(window_start)
         return device
+
+    async def update_all(self, devices: List[Device]) -> List[Device]:
+        """Fetch usage history for many plugs concurrently."""
+        results = await self._gather_per_device(devices, self.update)
+        for device in devices:
+            if isinstance(result := results[device.mac], Exception):
+                _LOGGER.warning(f"Failed to update usage for {device.mac}: {result}")
+        return devices
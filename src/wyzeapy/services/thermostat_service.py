@@ -103,7 +103,9 @@ class ThermostatService(BaseService):
             device for device in self._devices if device.type is DeviceTypes.THERMOSTAT
         ]
 
-        return [Thermostat(thermostat.raw_dict) for thermostat in thermostats]
+        return [
+            self._registry.wrap(Thermostat, thermostat) for thermostat in thermostats
+        ]
 
     async def set_cool_point(self, thermostat: Device, temp: int):
         await self._thermostat_set_iot_prop(thermostat, ThermostatProps.COOL_SP, temp)
@@ -1,23 +1,86 @@
-from asyncio import sleep
+import asyncio
+import itertools
+import time
 from dataclasses import dataclass, field
-from heapq import heappush, heappop
-from typing import Any
-from math import ceil
+from heapq import heappush, heappop, heapify
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from aiohttp import ClientOSError, ContentTypeError
+
+from ..exceptions import CircuitOpenError, UnknownApiError
+from ..metrics import MetricsHook
+from ..rate_limiter import Priority, TokenBucket, request_priority
 from ..types import Device
 import logging
-import threading
 
 """
 Asynchronous device update scheduling and management.
 
 This module provides classes to schedule and execute periodic updates of
-Wyze devices, ensuring rate limits and fair distribution of update calls.
+Wyze devices. Updaters are kept in a heap ordered by their next monotonic due
+time, due updaters are dispatched concurrently, and a token bucket enforces a
+global request budget.
 """
 
 _LOGGER = logging.getLogger(__name__)
 
+# Default request budget: MAX_SLOTS device updates every INTERVAL seconds
 INTERVAL = 300
 MAX_SLOTS = 225
+DEFAULT_BURST = 10
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Subscriptions poll a handful of devices frequently
+DEFAULT_SUBSCRIPTION_INTERVAL = 5
+SUBSCRIPTION_REQUESTS_PER_SECOND = 10
+SUBSCRIPTION_MAX_CONCURRENCY = 4
+
+# Device attributes that are not part of its observable state
+_UNTRACKED = frozenset({"raw_dict", "changed_fields", "callback_function"})
+_MISSING = object()
+
+_sequence = itertools.count()
+
+
+def snapshot(device: Device) -> Dict[str, Any]:
+    """Capture the tracked state of a device.
+
+    Every field except the raw API payload is tracked. Dictionaries such as
+    `device_params` are flattened one level into `"attr.key"` entries, other
+    objects (e.g. a camera's last `Event`) are captured by their fields and
+    lists (e.g. irrigation `zones`) element by element, so the snapshot does
+    not change when the device is mutated in place.
+    """
+    state = {}
+    for name, value in _fields(device).items():
+        if name in _UNTRACKED:
+            continue
+        if isinstance(value, dict):
+            for key, item in value.items():
+                state[f"{name}.{key}"] = item
+        elif hasattr(value, "__dict__"):
+            state[name] = _fields(value)
+        elif isinstance(value, (list, tuple)):
+            state[name] = [
+                _fields(item) if hasattr(item, "__dict__") else item for item in value
+            ]
+        else:
+            state[name] = value
+    return state
+
+
+def _fields(obj) -> Dict[str, Any]:
+    to_dict = getattr(type(obj), "to_dict", None)
+    return to_dict(obj) if to_dict is not None else dict(vars(obj))
+
+
+def diff(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> FrozenSet[str]:
+    """Return the names of the fields that differ between two snapshots."""
+    if old is None:
+        return frozenset(new)
+    changed = {name for name, value in new.items() if old.get(name, _MISSING) != value}
+    changed.update(name for name in old if name not in new)
+    return frozenset(changed)
 
 
 @dataclass(order=True)
@@ -25,139 +88,325 @@ class DeviceUpdater(object):
     """Represents a scheduled update task for a single device.
 
     Attributes:
+        next_due: Monotonic time at which the next update is due.
         service: The service instance responsible for updating the device.
         device: The Device object to be updated.
-        update_in: Countdown ticks until the next update is due.
-        updates_per_interval: Number of updates allowed per INTERVAL.
+        interval: Target number of seconds between updates.
+        callback: Called with the updated device. Defaults to the device's
+            own callback_function.
+        cancelled: Set when the updater has been removed from its manager.
+        state: Snapshot of the device's tracked state after the last update.
+        update_count: Number of successful updates.
+        suppressed_count: Number of updates that changed nothing and so did
+            not invoke the callback.
     """
 
+    next_due: float
+    sequence: int
     device: Device = field(compare=False)
     service: Any = field(compare=False)
-    update_in: int  # Countdown ticks until this device should be updated
-    updates_per_interval: int = field(compare=False)
+    interval: float = field(compare=False)
+    callback: Optional[Callable[[Device], None]] = field(compare=False)
+    cancelled: bool = field(compare=False)
+    state: Optional[Dict[str, Any]] = field(compare=False)
+    update_count: int = field(compare=False)
+    suppressed_count: int = field(compare=False)
 
-    def __init__(self, service, device: Device, update_interval: int):
+    def __init__(
+        self,
+        service,
+        device: Device,
+        update_interval: float,
+        callback: Optional[Callable[[Device], None]] = None,
+    ):
         """
         This function initializes a DeviceUpdater object
         :param service: The WyzeApy service connected to a device
         :param device: A WyzeApy device that needs to be in the update que
-        :param update_interval: How many seconds should be targeted between updates. **Note this value may shift based on 1 call per sec and load.
+        :param update_interval: How many seconds should be targeted between updates. **Note updates may be delayed when the request budget is exhausted.
+        :param callback: Function called with the updated device, instead of device.callback_function
         """
         self.service = service
         self.device = device
-        self.update_in = 0  # Always initialize at 0 so that we get the first update ASAP. The items will shift based on priority after this.
-        self.updates_per_interval = ceil(INTERVAL / update_interval)
-
-    async def update(self, mutex: threading.Lock):
-        # We only want to update if the update_in counter is zero
-        if self.update_in <= 0:
-            _LOGGER.debug("Updating device: " + self.device.nickname)
-            # Acquire the mutex before making the async call
-            mutex.acquire()
-            try:
-                # Get the updated info for the device from Wyze's API
-                self.device = await self.service.update(self.device)
-                # Callback to provide the updated info to the subscriber
-                self.device.callback_function(self.device)
-            except Exception:
-                _LOGGER.exception("Unknown error happened during updating device info")
-            finally:
-                # Release the mutex after the async call
-                mutex.release()
-            # Once it reaches zero and we update the device we want to reset the update_in counter
-            self.update_in = ceil(INTERVAL / self.updates_per_interval)
-        else:
-            # Don't update and instead just reduce the counter by 1
-            self.tick_tock()
+        self.interval = update_interval
+        self.callback = callback
+        # Due immediately so that we get the first update ASAP
+        self.next_due = time.monotonic()
+        # Tie breaker for updaters that are due at the same time
+        self.sequence = next(_sequence)
+        self.cancelled = False
+        # No snapshot yet, so the first update always reaches the callback
+        self.state = None
+        self.update_count = 0
+        self.suppressed_count = 0
 
-    def tick_tock(self):
-        # Every time we update a device we want to reduce the update_in counter so that it will get closer to updating
-        if self.update_in > 0:
-            self.update_in -= 1
+    async def update(self) -> Optional[bool]:
+        """Update the device and invoke the callback if its state changed.
+
+        Before the callback is invoked, `device.changed_fields` is set to the
+        names of the fields that changed (see `snapshot`).
+
+        :return: Whether the state changed, or None if the update failed
+        """
+        _LOGGER.debug("Updating device: " + self.device.nickname)
+        try:
+            try:
+                # Get the updated info for the device from Wyze's API, behind
+                # any user commands waiting for the same host
+                with request_priority(Priority.POLL):
+                    self.device = await self.service.update(self.device)
+                self.update_count += 1
+            except CircuitOpenError as e:
+                # The device's backend is down: report the device unavailable
+                # right away instead of waiting for the request to time out
+                _LOGGER.debug(f"Not updating {self.device.nickname}: {e}")
+                self.device.available = False
+            state = snapshot(self.device)
+            changed = diff(self.state, state)
+            self.state = state
+            if not changed:
+                self.suppressed_count += 1
+                _LOGGER.debug("No changes for device: " + self.device.nickname)
+                return False
+            # Callback to provide the updated info to the subscriber
+            self.device.changed_fields = changed
+            callback = self.callback or self.device.callback_function
+            callback(self.device)
+            return True
+        except asyncio.CancelledError:
+            raise
+        except UnknownApiError as e:
+            _LOGGER.warning(f"The update method detected an UnknownApiError: {e}")
+        except ClientOSError as e:
+            _LOGGER.error(f"A network error was detected: {e}")
+        except ContentTypeError as e:
+            _LOGGER.error(f"Server returned unexpected ContentType: {e}")
+        except Exception:
+            _LOGGER.exception("Unknown error happened during updating device info")
 
-    def delay(self):
-        # This should be called to reduce the number of updates per interval so that new devices can be added into the queue fairly
-        if self.updates_per_interval > 1:
-            self.updates_per_interval -= 1
+    def reschedule(self, now: Optional[float] = None):
+        # Keep a steady cadence, but never schedule in the past if we fell behind
+        now = time.monotonic() if now is None else now
+        self.next_due = max(self.next_due + self.interval, now)
+        self.sequence = next(_sequence)
 
 
 class UpdateManager:
     """Manager for scheduling and executing periodic device updates.
 
-    Maintains a priority queue of DeviceUpdater instances and enforces rate
-    limits and fair distribution of update calls across devices.
+    Updaters live in a min-heap keyed on their next due time, so adding one is
+    O(log N) and finding the next due updater is O(1). Removal marks the updater
+    cancelled (and cancels it if it is running); cancelled entries are dropped
+    when they reach the top of the heap or when they make up more than half of it.
+
+    Every dispatched update takes one token from the request budget. When the
+    budget is exhausted updates are delayed rather than dropped, and the
+    earliest-due updater always goes first.
+
+    Attributes:
+        changed_updates: Number of updates that changed a device's state.
+        suppressed_updates: Number of updates that changed nothing, for which
+            the callback was skipped.
+        metrics: Hook told how late every update is dispatched, or None.
     """
 
-    updaters = []
-    removed_updaters = []
-    mutex = threading.Lock()
+    def __init__(
+        self,
+        requests_per_second: float = MAX_SLOTS / INTERVAL,
+        burst: float = DEFAULT_BURST,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        metrics: Optional[MetricsHook] = None,
+    ):
+        """
+        :param requests_per_second: Sustained number of device updates per second
+        :param burst: Number of updates that may be dispatched back to back
+        :param max_concurrency: Maximum number of updates running at the same time
+        :param metrics: Hook receiving the scheduler lag of every update
+        """
+        self.updaters: List[DeviceUpdater] = []
+        self.budget = TokenBucket(requests_per_second, burst)
+        self.max_concurrency = max_concurrency
+        self._cancelled_count = 0
+        self._dispatching: Optional[DeviceUpdater] = None
+        self._running: Dict[int, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self.changed_updates = 0
+        self.suppressed_updates = 0
+        self.metrics = metrics
+
+    def set_budget(self, requests_per_second: float, burst: float = DEFAULT_BURST):
+        """Replace the global request budget."""
+        self.budget = TokenBucket(requests_per_second, burst)
+
+    def start(self) -> asyncio.Task:
+        """Start the scheduler loop on the running event loop."""
+        if (
+            self._loop_task is None
+            or self._loop_task.done()
+            or self._loop_task.get_loop() is not asyncio.get_running_loop()
+        ):
+            self._loop_task = asyncio.create_task(self.update_next())
+        return self._loop_task
+
+    async def stop(self):
+        """Stop the scheduler loop and cancel all running updates."""
+        tasks = list(self._tasks)
+        if self._loop_task is not None:
+            tasks.append(self._loop_task)
+            self._loop_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _peek(self) -> Optional[DeviceUpdater]:
+        while self.updaters and self.updaters[0].cancelled:
+            heappop(self.updaters)
+            self._cancelled_count -= 1
+        return self.updaters[0] if self.updaters else None
 
-    def check_if_removed(self, updater: DeviceUpdater):
-        for item in self.removed_updaters:
-            if updater is item:
-                return True
-        return False
+    async def _wait(self, timeout: Optional[float]):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
 
-    # This function should be called once every second
     async def update_next(self):
-        # If there are no updaters in the queue we don't need to do anything
-        if len(self.updaters) == 0:
-            _LOGGER.debug("No devices to update in queue")
-            return
+        """Scheduler loop: dispatch updaters as they become due. Runs forever."""
+        self._wakeup = asyncio.Event()
+        slots = asyncio.Semaphore(self.max_concurrency)
         while True:
-            # First we get the next updater off the queue
-            updater = heappop(self.updaters)
-            # if the updater has been removed, pop the next and clear it from the removed updaters
-            if self.removed_updaters:
-                while self.check_if_removed(updater):
-                    self.removed_updaters.remove(updater)
-                    updater = heappop(self.updaters)
-            # We then reduce the counter for all the other updaters
-            self.tick_tock()
-            # Then we update the target device
-            await updater.update(
-                self.mutex
-            )  # It will only update if it is time for it to update. Otherwise it just reduces its update_in counter.
-            # Then we put it back at the end of the queue. Or the front again if it wasn't ready to update
-            heappush(self.updaters, updater)
-            await sleep(1)
-
-    def filled_slots(self):
-        # This just returns the number of available slots
-        current_slots = 0
-        for a_updater in self.updaters:
-            current_slots += a_updater.updates_per_interval
-
-        return current_slots
-
-    def decrease_updates_per_interval(self):
-        # This will add a delay for all devices so we can squeeze more in there
-        for a_updater in self.updaters:
-            a_updater.delay()
-
-    def tick_tock(self):
-        # This will reduce the update_in counter for all devices
-        for a_updater in self.updaters:
-            a_updater.tick_tock()
+            updater = self._peek()
+            if updater is None:
+                _LOGGER.debug("No devices to update in queue")
+                await self._wait(None)
+                continue
+
+            delay = updater.next_due - time.monotonic()
+            if delay > 0:
+                # Sleep until the next deadline or until the heap changes
+                await self._wait(delay)
+                continue
+
+            heappop(self.updaters)
+            self._dispatching = updater
+            await self.budget.acquire()
+            await slots.acquire()
+            self._dispatching = None
+            if updater.cancelled:
+                slots.release()
+                continue
+            if self.metrics is not None:
+                self.metrics.on_scheduler_lag(time.monotonic() - updater.next_due)
+
+            task = asyncio.create_task(self._dispatch(updater))
+            self._running[id(updater)] = task
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _dispatch(self, updater: DeviceUpdater):
+        try:
+            changed = await updater.update()
+            if changed:
+                self.changed_updates += 1
+            elif changed is not None:
+                self.suppressed_updates += 1
+        finally:
+            self._running.pop(id(updater), None)
+            if not updater.cancelled:
+                updater.reschedule()
+                self.add_updater(updater)
 
     def add_updater(self, updater: DeviceUpdater):
-        if len(self.updaters) >= MAX_SLOTS:
-            _LOGGER.exception("No more devices can be updated within the rate limit")
-            raise Exception("No more devices can be updated within the rate limit")
-
-        # When we add a new updater it has to fit within the max slots or we will not add it
-        while (self.filled_slots() + updater.updates_per_interval) > MAX_SLOTS:
-            _LOGGER.debug(
-                "Reducing updates per interval to fit new device as slots are full: %s",
-                self.filled_slots(),
-            )
-            # If we are overflowing the available slots we will reduce the frequency of updates evenly for all devices until we can fit in one more.
-            self.decrease_updates_per_interval()
-            updater.delay()
-
-        # Once it fits we will add the new updater to the queue
         heappush(self.updaters, updater)
+        # Wake the scheduler in case this updater is due before the current head
+        if self._wakeup is not None:
+            self._wakeup.set()
 
     def del_updater(self, updater: DeviceUpdater):
-        self.removed_updaters.append(updater)
+        if updater.cancelled:
+            return
+        updater.cancelled = True
         _LOGGER.debug("Removing device from update queue")
+        if (task := self._running.pop(id(updater), None)) is not None:
+            task.cancel()
+            return
+        if updater is self._dispatching:
+            return
+        self._cancelled_count += 1
+        # Compact the heap once cancelled entries dominate it
+        if self._cancelled_count * 2 > len(self.updaters):
+            self.updaters = [u for u in self.updaters if not u.cancelled]
+            heapify(self.updaters)
+            self._cancelled_count = 0
+
+
+class SubscriptionManager:
+    """Polls subscribed devices on the caller's event loop.
+
+    Each subscribed device is polled at its own interval and, when its state
+    changed, handed to the subscriber's callback. Polling runs on an `UpdateManager`,
+    so at most `max_concurrency` updates are in flight, a device is never polled
+    again before its previous update finished, and when the service falls
+    behind, due devices wait in deadline order instead of piling up requests.
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_SUBSCRIPTION_INTERVAL,
+        requests_per_second: float = SUBSCRIPTION_REQUESTS_PER_SECOND,
+        max_concurrency: int = SUBSCRIPTION_MAX_CONCURRENCY,
+        metrics: Optional[MetricsHook] = None,
+    ):
+        """
+        :param interval: Default number of seconds between updates of a device
+        :param requests_per_second: Sustained number of device updates per second
+        :param max_concurrency: Maximum number of updates running at the same time
+        :param metrics: Hook receiving the scheduler lag of every update
+        """
+        self.interval = interval
+        self._manager = UpdateManager(
+            requests_per_second=requests_per_second,
+            burst=max(requests_per_second, 1),
+            max_concurrency=max_concurrency,
+            metrics=metrics,
+        )
+        self._updaters: Dict[str, DeviceUpdater] = {}
+
+    @property
+    def subscribers(self) -> List[Tuple[Device, Callable[[Device], None]]]:
+        """The subscribed devices and their callbacks."""
+        return [
+            (updater.device, updater.callback) for updater in self._updaters.values()
+        ]
+
+    def subscribe(
+        self,
+        service,
+        device: Device,
+        callback: Callable[[Device], None],
+        interval: Optional[float] = None,
+    ):
+        """Start polling `device` and pass it to `callback` when its state
+        changes, with the names of the changed fields in
+        `device.changed_fields`.
+
+        Subscribing a device again replaces its previous subscription.
+        """
+        self.unsubscribe(device)
+        updater = DeviceUpdater(service, device, interval or self.interval, callback)
+        self._updaters[device.mac] = updater
+        self._manager.add_updater(updater)
+        self._manager.start()
+
+    def unsubscribe(self, device: Device):
+        """Stop polling `device`, cancelling an update that is in flight."""
+        if (updater := self._updaters.pop(device.mac, None)) is not None:
+            self._manager.del_updater(updater)
+
+    async def stop(self):
+        """Stop polling all devices."""
+        await self._manager.stop()
@@ -0,0 +1,171 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Per-plug cache of energy usage records.
+"""
+
+import json
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate, repeat
+from operator import sub, truediv
+from typing import Any, Dict, List, Optional, Tuple
+
+HOUR_MS = 3600 * 1000
+
+# Hours of usage records fetched for a plug seen for the first time
+DEFAULT_WINDOW_HOURS = 25
+# Hours of samples kept per plug
+DEFAULT_RETENTION_HOURS = 24 * 35
+
+
+def _record_samples(record: Dict[str, Any]) -> List[Tuple[int, float]]:
+    """(hour start in ms, Wh) samples of a usage_record_list record.
+
+    A record covers the hours from its `date_time` on, with one watt-hour
+    value per hour in `data` (a list, or a JSON string of one).
+    """
+    values = record["data"]
+    if isinstance(values, str):
+        values = json.loads(values)
+    start = int(record["date_time"])
+    return [
+        (start + hour * HOUR_MS, float(value))
+        for hour, value in enumerate(values)
+        if value is not None
+    ]
+
+
+class UsageCache:
+    """Usage records of one plug and the hourly energy samples they contain.
+
+    Samples are stored in two parallel typed arrays (hour start in ms and
+    watt-hours), 16 bytes per hour. `merge` replaces the samples of records
+    fetched again, e.g. the current day's record while it fills up, so a
+    poll only needs the records from `last_record_ts` on.
+
+    Attributes:
+        timestamps: Hour starts in ms since the epoch, ascending.
+        energy: Energy used in each hour, in Wh.
+        retention_hours: Hours of samples kept.
+    """
+
+    def __init__(self, retention_hours: int = DEFAULT_RETENTION_HOURS):
+        self.retention_hours = retention_hours
+        self.timestamps = array("q")
+        self.energy = array("d")
+        # record start -> (record, hours it covers)
+        self._records: Dict[int, Tuple[Dict[str, Any], int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def last_record_ts(self) -> Optional[int]:
+        """Start (ms) of the newest record, from which to fetch next time."""
+        return max(self._records) if self._records else None
+
+    def records(self, since: int) -> List[Dict[str, Any]]:
+        """Raw records covering any time from `since` (ms) on, oldest first."""
+        return [
+            record
+            for start, (record, hours) in sorted(self._records.items())
+            if start + hours * HOUR_MS > since
+        ]
+
+    def merge(self, records: List[Dict[str, Any]]) -> int:
+        """Add fetched records, replacing the ones fetched before.
+
+        :param records: A usage_record_list response
+        :return: Number of samples that are new or changed
+        """
+        # Parse everything first, so that an unreadable record changes nothing
+        parsed = [(record, _record_samples(record)) for record in records]
+        new: Dict[int, float] = {}
+        for record, samples in parsed:
+            self._records[int(record["date_time"])] = (record, len(samples))
+            new.update(samples)
+        if not new:
+            return 0
+
+        # Fetches only overlap the newest samples, so only the tail is rebuilt
+        start = bisect_left(self.timestamps, min(new))
+        tail = dict(zip(self.timestamps[start:], self.energy[start:]))
+        changed = sum(1 for ts, value in new.items() if tail.get(ts) != value)
+        tail.update(new)
+        del self.timestamps[start:]
+        del self.energy[start:]
+        for ts in sorted(tail):
+            self.timestamps.append(ts)
+            self.energy.append(tail[ts])
+
+        self._trim()
+        return changed
+
+    def _trim(self):
+        cutoff = self.timestamps[-1] - self.retention_hours * HOUR_MS
+        end = bisect_left(self.timestamps, cutoff)
+        if end:
+            del self.timestamps[:end]
+            del self.energy[:end]
+        for start in [start for start in self._records if start < cutoff]:
+            del self._records[start]
+
+    def _range(self, since: Optional[int]) -> Tuple[int, int]:
+        start = 0 if since is None else bisect_left(self.timestamps, since)
+        return start, len(self.timestamps)
+
+    def total_kwh(self, since: Optional[int] = None) -> float:
+        """Energy used since `since` (ms), or over all samples, in kWh."""
+        start, end = self._range(since)
+        return sum(self.energy[start:end]) / 1000
+
+    def hourly_kwh(self, since: Optional[int] = None) -> List[Tuple[datetime, float]]:
+        """(hour start, kWh) of every sampled hour since `since` (ms)."""
+        start, end = self._range(since)
+        return list(
+            zip(
+                map(
+                    datetime.fromtimestamp,
+                    map(truediv, self.timestamps[start:end], repeat(1000)),
+                ),
+                map(truediv, self.energy[start:end], repeat(1000)),
+            )
+        )
+
+    def daily_kwh(self, since: Optional[int] = None) -> Dict[date, float]:
+        """kWh per local calendar day since `since` (ms)."""
+        days: Dict[date, float] = {}
+        start, end = self._range(since)
+        while start < end:
+            # Local days are not always 24 hours long
+            day = datetime.fromtimestamp(self.timestamps[start] / 1000).date()
+            next_midnight = datetime.combine(day + timedelta(days=1), time.min)
+            day_end = bisect_left(
+                self.timestamps, int(next_midnight.timestamp() * 1000), start, end
+            )
+            days[day] = sum(self.energy[start:day_end]) / 1000
+            start = day_end
+        return days
+
+    def rolling_mean(self, hours: int) -> List[float]:
+        """Trailing mean of the hourly kWh over `hours` samples, one value per
+        sample (averaging fewer samples at the start)."""
+        # Window sums are differences of the running total
+        totals = list(accumulate(self.energy, initial=0.0))
+        head = min(hours, len(self.energy))
+        means = list(
+            map(truediv, totals[1 : head + 1], range(1000, 1000 * head + 1, 1000))
+        )
+        means.extend(
+            map(
+                truediv,
+                map(sub, totals[hours + 1 :], totals[1:]),
+                repeat(1000 * hours),
+            )
+        )
+        return means
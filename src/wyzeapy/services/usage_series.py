@@ -0,0 +1,160 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+NumPy analytics over the energy usage of many plugs.
+
+Requires the `numpy` package (`pip install wyzeapy[analytics]`).
+"""
+
+from datetime import timedelta
+from typing import Dict, List, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+
+from .usage_cache import UsageCache
+
+
+class UsageSeries:
+    """Energy use of several plugs on one shared time axis.
+
+    Each row of `energy` is one plug, each column one timestamp; a plug with
+    no sample at a timestamp has NaN there. Every operation works on the
+    whole matrix at once.
+
+    Attributes:
+        macs: The plugs, in row order.
+        timestamps: Sample times in ms since the epoch, ascending, shape (n,).
+        energy: Energy used in the period starting at each timestamp, in Wh,
+            shape (plugs, n).
+    """
+
+    def __init__(self, macs: Sequence[str], timestamps: np.ndarray, energy: np.ndarray):
+        energy = np.asarray(energy, dtype=np.float64)
+        if energy.ndim == 1:
+            energy = energy[np.newaxis, :]
+        if energy.shape != (len(macs), len(timestamps)):
+            raise ValueError(
+                f"energy has shape {energy.shape}, expected {(len(macs), len(timestamps))}"
+            )
+        self.macs: Tuple[str, ...] = tuple(macs)
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.energy = energy
+
+    @classmethod
+    def from_caches(cls, caches: Mapping[str, UsageCache]) -> "UsageSeries":
+        """Align the cached samples of many plugs on their combined timestamps.
+
+        :param caches: Usage caches keyed by plug mac
+        """
+        columns = {
+            mac: (np.array(cache.timestamps, dtype=np.int64), np.array(cache.energy))
+            for mac, cache in caches.items()
+        }
+        if not columns:
+            return cls((), np.empty(0, dtype=np.int64), np.empty((0, 0)))
+        timestamps = np.unique(np.concatenate([ts for ts, _ in columns.values()]))
+        energy = np.full((len(columns), len(timestamps)), np.nan)
+        for row, (ts, values) in enumerate(columns.values()):
+            energy[row, np.searchsorted(timestamps, ts)] = values
+        return cls(list(columns), timestamps, energy)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, mac: str) -> "UsageSeries":
+        """The series of one plug."""
+        row = self.macs.index(mac)
+        return UsageSeries((mac,), self.timestamps, self.energy[row : row + 1])
+
+    def _row_dict(self, values: np.ndarray) -> Dict[str, float]:
+        return dict(zip(self.macs, values.tolist()))
+
+    def _has_gaps(self) -> bool:
+        # The NaN-aware reductions copy the matrix; skip them when possible
+        return bool(np.isnan(self.energy).any())
+
+    def total_kwh(self) -> Dict[str, float]:
+        """Energy used by each plug over the whole series, in kWh."""
+        total = np.nansum if self._has_gaps() else np.sum
+        return self._row_dict(total(self.energy, axis=1) / 1000)
+
+    def sum(self) -> np.ndarray:
+        """Energy used by all plugs together at each timestamp, in Wh."""
+        total = np.nansum if self._has_gaps() else np.sum
+        return total(self.energy, axis=0)
+
+    def resample(self, period: Union[timedelta, int], origin: int = 0) -> "UsageSeries":
+        """Sum the energy of each plug over fixed periods.
+
+        :param period: Period length, as a timedelta or in ms
+        :param origin: A period start (ms). Periods are aligned to UTC
+            midnight by default; pass e.g. the local UTC offset to align
+            daily periods to local days.
+        :return: One column per period with samples, labelled by its start.
+            A plug without samples in a period has NaN there.
+        """
+        if isinstance(period, timedelta):
+            period = int(period.total_seconds() * 1000)
+        if not len(self.timestamps):
+            return self
+        buckets = (self.timestamps - origin) // period
+        starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+        if not self._has_gaps():
+            sums = np.add.reduceat(self.energy, starts, axis=1)
+        else:
+            present = ~np.isnan(self.energy)
+            sums = np.add.reduceat(np.where(present, self.energy, 0.0), starts, axis=1)
+            counts = np.add.reduceat(present, starts, axis=1)
+            sums[counts == 0] = np.nan
+        return UsageSeries(self.macs, buckets[starts] * period + origin, sums)
+
+    def percentile(
+        self, q: Union[float, Sequence[float]]
+    ) -> Dict[str, Union[float, np.ndarray]]:
+        """Percentiles of each plug's samples, in Wh.
+
+        :param q: Percentile or sequence of percentiles, between 0 and 100
+        :return: Per plug, the percentile, or an array of them when `q` is a
+            sequence
+        """
+        if self._has_gaps():
+            values = np.nanpercentile(self.energy, q, axis=1)
+        else:
+            values = np.percentile(self.energy, q, axis=1)
+        if np.ndim(q) == 0:
+            return self._row_dict(values)
+        return dict(zip(self.macs, values.T))
+
+    def peaks(self, threshold: float = 3.0) -> List[Tuple[str, int, float]]:
+        """Local maxima that stand out from a plug's typical use.
+
+        A sample is a peak when it is larger than the sample before it, at
+        least as large as the one after it, and more than `threshold`
+        standard deviations above the plug's mean.
+
+        :param threshold: Standard deviations above the mean
+        :return: (mac, timestamp in ms, Wh) of every peak, in time order per plug
+        """
+        energy = self.energy
+        if energy.shape[1] < 3:
+            return []
+        if self._has_gaps():
+            mean, std = np.nanmean(energy, axis=1), np.nanstd(energy, axis=1)
+        else:
+            mean, std = energy.mean(axis=1), energy.std(axis=1)
+        limit = mean + threshold * std
+        middle = energy[:, 1:-1]
+        is_peak = (
+            (middle > energy[:, :-2])
+            & (middle >= energy[:, 2:])
+            & (middle > limit[:, np.newaxis])
+        )
+        rows, columns = np.nonzero(is_peak)
+        columns += 1
+        return [
+            (self.macs[row], int(self.timestamps[column]), float(energy[row, column]))
+            for row, column in zip(rows.tolist(), columns.tolist())
+        ]
@@ -73,7 +73,7 @@ class WallSwitchService(BaseService):
             if device.type is DeviceTypes.COMMON and device.product_model == "LD_SS1"
         ]
 
-        return [WallSwitch(switch.raw_dict) for switch in switches]
+        return [self._registry.wrap(WallSwitch, switch) for switch in switches]
 
     async def turn_on(self, switch: WallSwitch):
         if switch.single_press_type == SinglePressType.IOT:
@@ -0,0 +1,290 @@
+#  Copyright (c) 2021. Mulliken, LLC - All Rights Reserved
+#  You may use, distribute and modify this code under the terms
+#  of the attached license. You should have received a copy of
+#  the license with this file. If not, please write to:
+#  katie@mulliken.net to receive a copy
+"""
+Columnar snapshots of the state of every device.
+
+Each device becomes one row of a fixed schema (`SNAPSHOT_SCHEMA`): identity
+columns such as mac and model, availability, and the state fields of the
+device services (on, brightness, lock and sensor state, temperatures, ...).
+A field that does not apply to a device is null.
+
+Rows are produced lazily and converted in batches, so exporting thousands of
+devices only ever holds one batch in memory:
+
+* `write_parquet` / `write_arrow` stream Parquet files or Arrow IPC streams,
+  `SnapshotWriter` writes them one batch per call, and `record_batches`
+  yields Arrow record batches (requires `pyarrow`).
+* `to_numpy` builds a NumPy structured array (requires `numpy`).
+"""
+
+from enum import Enum
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Sequence, Tuple
+
+from .types import Device
+
+# (column, type) of every snapshot column, in order
+SNAPSHOT_SCHEMA: Tuple[Tuple[str, type], ...] = (
+    ("mac", str),
+    ("nickname", str),
+    ("product_type", str),
+    ("product_model", str),
+    ("firmware_ver", str),
+    ("available", bool),
+    ("on", bool),
+    ("brightness", int),
+    ("color_temp", int),
+    ("color", str),
+    ("siren", bool),
+    ("floodlight", bool),
+    ("motion", bool),
+    ("last_event_ts", int),
+    ("unlocked", bool),
+    ("door_open", bool),
+    ("detected", bool),
+    ("temperature", float),
+    ("humidity", float),
+    ("hvac_mode", str),
+    ("cool_set_point", float),
+    ("heat_set_point", float),
+    ("switch_power", bool),
+)
+SNAPSHOT_COLUMNS = tuple(name for name, _ in SNAPSHOT_SCHEMA)
+
+# Low-cardinality columns stored dictionary-encoded in Arrow
+_CATEGORICAL = frozenset({"product_type", "product_model", "firmware_ver", "hvac_mode"})
+
+DEFAULT_BATCH_SIZE = 1024
+
+Row = Tuple[Any, ...]
+
+# The API reports many flags as 0/1, often as strings
+_BOOLEANS = {"0": False, "1": True, "false": False, "true": True, 0: False, 1: True}
+
+
+def _normalize(value: Any, kind: type) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, Enum):
+        value = value.value
+    try:
+        if kind is bool:
+            # bool("0") is True; anything unrecognised is unknown
+            return _BOOLEANS.get(value.lower() if isinstance(value, str) else value)
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def device_row(views: Sequence[Device]) -> Row:
+    """The snapshot row of one device.
+
+    :param views: Objects representing the device, most specific first (e.g.
+        its `Bulb` and then its plain `Device`). Each column is read from the
+        first object that has it.
+    :return: One value per `SNAPSHOT_SCHEMA` column
+    """
+    row = []
+    for name, kind in SNAPSHOT_SCHEMA:
+        value = None
+        for view in views:
+            value = getattr(view, name, None)
+            if value is not None:
+                break
+        row.append(_normalize(value, kind))
+    return tuple(row)
+
+
+def rows(devices: Iterable[Sequence[Device]]) -> Iterator[Row]:
+    """Lazily build the snapshot row of every device in `devices`."""
+    return (device_row(views) for views in devices)
+
+
+def batches(
+    snapshot_rows: Iterable[Row], batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[List[Row]]:
+    """Split rows into lists of at most `batch_size` rows."""
+    iterator = iter(snapshot_rows)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "Arrow and Parquet snapshots require the pyarrow package"
+        ) from e
+    return pyarrow
+
+
+def arrow_schema():
+    """The Arrow schema of snapshot record batches."""
+    pa = _import_pyarrow()
+    types = {str: pa.string(), bool: pa.bool_(), int: pa.int64(), float: pa.float64()}
+    return pa.schema(
+        [
+            pa.field(
+                name,
+                pa.dictionary(pa.int16(), pa.string())
+                if name in _CATEGORICAL
+                else types[kind],
+            )
+            for name, kind in SNAPSHOT_SCHEMA
+        ]
+    )
+
+
+def record_batch(batch: Sequence[Row]) -> Any:
+    """Convert rows into one `pyarrow.RecordBatch`."""
+    pa = _import_pyarrow()
+    schema = arrow_schema()
+    columns = zip(*batch)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def record_batches(
+    snapshot_rows: Iterable[Row], batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[Any]:
+    """Convert rows into `pyarrow.RecordBatch`es of at most `batch_size` rows."""
+    return (record_batch(batch) for batch in batches(snapshot_rows, batch_size))
+
+
+class SnapshotWriter:
+    """Incremental writer of snapshot rows into a Parquet file or an Arrow IPC
+    stream.
+
+    Each `write` call converts and writes one batch, so that the caller
+    decides how many rows are held at a time. Use as a context manager, or
+    call `close` to finish the file.
+    """
+
+    FORMATS = ("parquet", "arrow")
+
+    def __init__(self, sink: Any, format: str = "parquet"):
+        """
+        :param sink: Path or writable binary file
+        :param format: "parquet" for a Parquet file or "arrow" for an Arrow IPC
+            stream
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported snapshot format: {format}")
+        if format == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(sink, arrow_schema(), compression="zstd")
+        else:
+            self._writer = _import_pyarrow().ipc.new_stream(sink, arrow_schema())
+        self.count = 0
+
+    def write(self, batch: Sequence[Row]) -> int:
+        """Write `batch` as one row group or record batch.
+
+        :return: Number of rows written so far
+        """
+        if batch:
+            self._writer.write_batch(record_batch(batch))
+            self.count += len(batch)
+        return self.count
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_parquet(
+    snapshot_rows: Iterable[Row], sink: Any, batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Stream rows into a Parquet file.
+
+    :param snapshot_rows: Rows as built by `rows`
+    :param sink: Path or writable binary file
+    :param batch_size: Rows per row group
+    :return: Number of rows written
+    """
+    with SnapshotWriter(sink, "parquet") as writer:
+        for batch in batches(snapshot_rows, batch_size):
+            writer.write(batch)
+    return writer.count
+
+
+def write_arrow(
+    snapshot_rows: Iterable[Row], sink: Any, batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Stream rows into an Arrow IPC stream.
+
+    :param snapshot_rows: Rows as built by `rows`
+    :param sink: Path or writable binary file
+    :param batch_size: Rows per record batch
+    :return: Number of rows written
+    """
+    with SnapshotWriter(sink, "arrow") as writer:
+        for batch in batches(snapshot_rows, batch_size):
+            writer.write(batch)
+    return writer.count
+
+
+def _numpy_dtype(widths: Sequence[int]) -> List[Tuple[str, Any]]:
+    dtype: List[Tuple[str, Any]] = []
+    for (name, kind), width in zip(SNAPSHOT_SCHEMA, widths):
+        if kind is str:
+            dtype.append((name, f"U{max(width, 1)}"))
+        else:
+            dtype.append((name, {bool: "i1", int: "i8", float: "f8"}[kind]))
+    return dtype
+
+
+def to_numpy(snapshot_rows: Iterable[Row], batch_size: int = DEFAULT_BATCH_SIZE):
+    """Build a NumPy structured array with one record per row.
+
+    NumPy has no nulls, so missing values are stored as -1 in boolean (int8)
+    and integer (int64) columns, NaN in float columns and "" in string
+    columns, which are sized to their longest value.
+
+    Rows are converted `batch_size` at a time, so that only one batch of
+    them is held at once besides the arrays.
+    """
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("NumPy snapshots require the numpy package") from e
+
+    missing = {str: "", bool: -1, int: -1, float: float("nan")}
+    kinds = [kind for _, kind in SNAPSHOT_SCHEMA]
+    parts = []
+    widths = [0] * len(SNAPSHOT_SCHEMA)
+    for batch in batches(snapshot_rows, batch_size):
+        for index, kind in enumerate(kinds):
+            if kind is str:
+                width = max(len(row[index] or "") for row in batch)
+                widths[index] = max(widths[index], width)
+        parts.append(
+            np.array(
+                [
+                    tuple(
+                        missing[kind] if value is None else value
+                        for value, kind in zip(row, kinds)
+                    )
+                    for row in batch
+                ],
+                dtype=_numpy_dtype(widths),
+            )
+        )
+
+    # Earlier batches may have narrower string fields
+    dtype = _numpy_dtype(widths)
+    if not parts:
+        return np.empty(0, dtype=dtype)
+    return np.concatenate([part.astype(dtype) for part in parts])
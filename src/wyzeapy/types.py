@@ -9,7 +9,7 @@ and API response code enums.
 """
 
 from enum import Enum
-from typing import Union, List, Dict, Any
+from typing import Union, List, Dict, Any, FrozenSet, Tuple
 
 
 class Group:
@@ -51,7 +51,68 @@ class DeviceTypes(Enum):
     IRRIGATION = "Common"
 
 
-class Device:
+class _Model:
+    """Base class for objects built from Wyze API dictionaries.
+
+    Fields listed in `_fields` are copied into slots when the object is built.
+    Every other key of the API dictionary is read lazily from that dictionary
+    on attribute access, so objects do not carry a copy of rarely used fields.
+    Attributes set later (including by subclasses) are stored as usual.
+    """
+
+    __slots__ = ("_raw", "__dict__")
+    _fields: Tuple[str, ...] = ()
+    # Keys copied eagerly on construction: `_fields` plus any plain class
+    # attribute the API value has to shadow, e.g. `Lock.door_open`
+    _eager: FrozenSet[str] = frozenset()
+    # Public slots of the class and its bases
+    _slot_names: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        eager = set(cls._fields)
+        slot_names = []
+        for klass in reversed(cls.__mro__):
+            slot_names.extend(
+                name
+                for name in vars(klass).get("__slots__", ())
+                if not name.startswith("_")
+            )
+            for name, value in vars(klass).items():
+                if not name.startswith("_") and not (
+                    callable(value) or hasattr(value, "__get__")
+                ):
+                    eager.add(name)
+        cls._eager = frozenset(eager)
+        cls._slot_names = tuple(slot_names)
+
+    def __init__(self, dictionary: Dict[Any, Any]):
+        self._raw = dictionary
+        for key in dictionary.keys() & self._eager:
+            setattr(self, key, dictionary[key])
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called when regular lookup fails: fall back to the API field
+        try:
+            return object.__getattribute__(self, "_raw")[name]
+        except (AttributeError, KeyError):
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}"
+            ) from None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return all fields of the object, including the lazily read ones."""
+        data = dict(self._raw)
+        for name in self._slot_names:
+            try:
+                data[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        data.update(self.__dict__)
+        return data
+
+
+class Device(_Model):
     product_type: str
     product_model: str
     mac: str
@@ -59,13 +120,46 @@ class Device:
     device_params: Dict[str, Any]
     raw_dict: Dict[str, Any]
     callback_function = None
+    # Fields that changed in the last update delivered to callback_function
+    changed_fields: FrozenSet[str] = frozenset()
+
+    __slots__ = (
+        "product_type",
+        "product_model",
+        "mac",
+        "nickname",
+        "device_params",
+        "enr",
+        "firmware_ver",
+        "available",
+    )
+    _fields = __slots__[:-1]
 
     def __init__(self, dictionary: Dict[Any, Any]):
         self.available = False
+        super().__init__(dictionary)
 
-        self.raw_dict = dictionary
-        for k, v in dictionary.items():
-            setattr(self, k, v)
+    @property
+    def raw_dict(self) -> Dict[str, Any]:
+        """The API dictionary the device was built from."""
+        return self._raw
+
+    @raw_dict.setter
+    def raw_dict(self, dictionary: Dict[str, Any]):
+        self._raw = dictionary
+
+    def update_raw(self, dictionary: Dict[Any, Any]):
+        """Replace the API dictionary, keeping local state such as callbacks.
+
+        Fields missing from the new dictionary are cleared.
+        """
+        for name in self._fields:
+            if name in self._raw and name not in dictionary:
+                try:
+                    delattr(self, name)
+                except AttributeError:
+                    pass
+        _Model.__init__(self, dictionary)
 
     @property
     def type(self) -> DeviceTypes:
@@ -176,7 +270,7 @@ class ResponseCodesLock(Enum):
     SUCCESS = 0
 
 
-class File:
+class File(_Model):
     file_id: str
     type: Union[int, str]
     url: str
@@ -188,9 +282,22 @@ class File:
     ai_url: str
     file_params: Dict[Any, Any]
 
+    __slots__ = (
+        "file_id",
+        "type",
+        "url",
+        "status",
+        "en_algorithm",
+        "en_password",
+        "is_ai",
+        "ai_tag_list",
+        "ai_url",
+        "file_params",
+    )
+    _fields = __slots__
+
     def __init__(self, dictionary: Dict[Any, Any]):
-        for k, v in dictionary.items():
-            setattr(self, k, v)
+        super().__init__(dictionary)
 
         if self.type == 1:
             self.type = "Image"
@@ -198,7 +305,7 @@ class File:
             self.type = "Video"
 
 
-class Event:
+class Event(_Model):
     event_id: str
     device_mac: str
     device_model: str
@@ -215,9 +322,24 @@ class Event:
     tag_list: List[Any]
     read_state: int
 
-    def __init__(self, dictionary: Dict[Any, Any]):
-        for k, v in dictionary.items():
-            setattr(self, k, v)
+    __slots__ = (
+        "event_id",
+        "device_mac",
+        "device_model",
+        "event_category",
+        "event_value",
+        "event_ts",
+        "event_ack_result",
+        "is_feedback_correct",
+        "is_feedback_face",
+        "is_feedback_person",
+        "file_list",
+        "event_params",
+        "recognized_instance_list",
+        "tag_list",
+        "read_state",
+    )
+    _fields = __slots__
 
 
 class HMSStatus(Enum):
@@ -11,6 +11,7 @@ from typing import Dict, Any, List, Optional
 from Crypto.Cipher import AES
 
 from .exceptions import ParameterError, AccessTokenError, UnknownApiError
+from .metrics import report_api_error
 from .types import ResponseCodes, PropertyIDs, Device, Event
 
 """
@@ -43,7 +44,8 @@ def wyze_encrypt(key, text):
     https://paste.sr.ht/~joshmulliken/e9f67e05c4a774004b226d2ac1f070b6d341cb39
     """
     raw = pad(text)
-    key = key.encode("ascii")
+    if isinstance(key, str):
+        key = key.encode("ascii")
     iv = key  # Wyze uses the secret key for the iv as well
     cipher = AES.new(key, AES.MODE_CBC, iv)
     enc = cipher.encrypt(raw)
@@ -120,6 +122,10 @@ def check_for_errors_standard(service, response_json: Dict[str, Any]) -> None:
     """
     response_code = response_json["code"]
     if response_code != ResponseCodes.SUCCESS.value:
+        # An offline device is a device state, returned without raising, and
+        # would otherwise count as an error on every poll of that device
+        if response_code != ResponseCodes.DEVICE_OFFLINE.value:
+            report_api_error(service, "standard", response_code)
         if response_code == ResponseCodes.PARAMETER_ERROR.value:
             raise ParameterError(response_code, response_json["msg"])
         elif response_code == ResponseCodes.ACCESS_TOKEN_ERROR.value:
@@ -142,6 +148,7 @@ def check_for_errors_lock(service, response_json: Dict[str, Any]) -> None:
         response_json: The JSON response from the lock API.
     """
     if response_json["ErrNo"] != 0:
+        report_api_error(service, "lock", response_json["ErrNo"])
         if response_json.get("code") == ResponseCodes.PARAMETER_ERROR.value:
             raise ParameterError(response_json)
         elif response_json.get("code") == ResponseCodes.ACCESS_TOKEN_ERROR.value:
@@ -160,6 +167,7 @@ def check_for_errors_devicemgmt(service, response_json: Dict[Any, Any]) -> None:
         response_json: The JSON response from the device management API.
     """
     if response_json["status"] != 200:
+        report_api_error(service, "devicemgmt", response_json["status"])
         if "InvalidTokenError>" in response_json["response"]["errors"][0]["message"]:
             service._auth_lib.token.expired = True
             raise AccessTokenError("Access Token expired, attempting to refresh")
@@ -176,6 +184,7 @@ def check_for_errors_iot(service, response_json: Dict[Any, Any]) -> None:
         response_json: The JSON response from the IoT API.
     """
     if response_json["code"] != 1:
+        report_api_error(service, "iot", response_json["code"])
         if str(response_json["code"]) == ResponseCodes.ACCESS_TOKEN_ERROR.value:
             service._auth_lib.token.expired = True
             raise AccessTokenError("Access Token expired, attempting to refresh")
@@ -192,6 +201,7 @@ def check_for_errors_hms(service, response_json: Dict[Any, Any]) -> None:
         response_json: The JSON response from the HMS API.
     """
     if response_json["message"] is None:
+        report_api_error(service, "hms", None)
         service._auth_lib.token.expired = True
         raise AccessTokenError("Access Token expired, attempting to refresh")
 
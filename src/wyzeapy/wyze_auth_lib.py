@@ -6,9 +6,9 @@
 import asyncio
 import logging
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Sequence
 
-from aiohttp import TCPConnector, ClientSession, ContentTypeError
+from aiohttp import TCPConnector, ClientSession, ContentTypeError, JsonPayload
 
 from .const import (
     API_KEY,
@@ -26,6 +26,15 @@ from .exceptions import (
     TwoFactorAuthenticationEnabled,
     AccessTokenError,
 )
+from .circuit_breaker import (
+    DEFAULT_CIRCUIT_BREAKER_POLICY,
+    CircuitBreakerPolicy,
+    CircuitBreakers,
+)
+from .metrics import MetricsHook, metrics_middleware, request_size
+from .pipeline import Request, Handler, Middleware, build_handler
+from .rate_limiter import DEFAULT_RATE_LIMIT_POLICY, RateLimiter, RateLimitPolicy
+from .retry import DEFAULT_RETRY_POLICY, Retry, RetryPolicy
 from .utils import create_password, check_for_errors_standard
 
 _LOGGER = logging.getLogger(__name__)
@@ -98,6 +107,12 @@ class WyzeAuthLib:
     ]
     SANITIZE_STRING = "**Sanitized**"
 
+    # Connection pool defaults for the shared session
+    CONNECTION_LIMIT = 100
+    CONNECTION_LIMIT_PER_HOST = 10
+    KEEPALIVE_TIMEOUT = 30.0
+    DNS_CACHE_TTL = 30 * 60
+
     def __init__(
         self,
         username=None,
@@ -106,6 +121,17 @@ class WyzeAuthLib:
         api_key=None,
         token: Optional[Token] = None,
         token_callback=None,
+        session: Optional[ClientSession] = None,
+        connection_limit: int = CONNECTION_LIMIT,
+        connection_limit_per_host: int = CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+        middlewares: Sequence[Middleware] = (),
+        metrics: Optional[MetricsHook] = None,
+        retry_policy: Optional[RetryPolicy] = DEFAULT_RETRY_POLICY,
+        circuit_breaker: Optional[
+            CircuitBreakerPolicy
+        ] = DEFAULT_CIRCUIT_BREAKER_POLICY,
+        rate_limit: Optional[RateLimitPolicy] = DEFAULT_RATE_LIMIT_POLICY,
     ):
         """Initialize WyzeAuthLib for authentication and token management.
 
@@ -116,6 +142,21 @@ class WyzeAuthLib:
             api_key: Third-party API key for Wyze credentials.
             token: Existing Token instance for reuse (optional).
             token_callback: Callback to invoke on token updates.
+            session: Externally managed ClientSession to use for all requests.
+                It is never closed by this instance (optional).
+            connection_limit: Total number of pooled connections.
+            connection_limit_per_host: Pooled connections per Wyze host.
+            keepalive_timeout: Seconds an idle connection is kept open.
+            middlewares: Request pipeline stages to install from the start,
+                outermost first, so that they also see the login request.
+            metrics: Hook receiving request metrics and tracing events
+                (optional, see `wyzeapy.metrics`).
+            retry_policy: When to retry failed requests (see `wyzeapy.retry`);
+                None disables retries.
+            circuit_breaker: When to stop sending requests to a failing host
+                (see `wyzeapy.circuit_breaker`); None disables the breakers.
+            rate_limit: Request rates allowed per host (see
+                `wyzeapy.rate_limiter`); None disables rate limiting.
         """
         self._username = username
         self._password = password
@@ -127,6 +168,28 @@ class WyzeAuthLib:
         self.two_factor_type = None
         self.refresh_lock = asyncio.Lock()
         self.token_callback = token_callback
+        self._session = session
+        self._owns_session = session is None
+        self._connection_limit = connection_limit
+        self._connection_limit_per_host = connection_limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._retry: Optional[Retry] = None
+        if retry_policy is not None:
+            self._retry = Retry(retry_policy)
+            middlewares = [*middlewares, self._retry]
+        self._circuit_breakers: Optional[CircuitBreakers] = None
+        if circuit_breaker is not None:
+            self._circuit_breakers = CircuitBreakers(circuit_breaker)
+            middlewares = [*middlewares, self._circuit_breakers]
+        self._rate_limiter: Optional[RateLimiter] = None
+        if rate_limit is not None:
+            self._rate_limiter = RateLimiter(rate_limit)
+            middlewares = [*middlewares, self._rate_limiter]
+        self._middlewares: List[Middleware] = [*middlewares, self._log_request]
+        self._handler: Optional[Handler] = None
+        self._metrics: Optional[MetricsHook] = None
+        self._metrics_stage: Optional[Middleware] = None
+        self.metrics = metrics
 
     @classmethod
     async def create(
@@ -137,6 +200,7 @@ class WyzeAuthLib:
         api_key=None,
         token: Optional[Token] = None,
         token_callback=None,
+        **session_options,
     ):
         """Factory to instantiate WyzeAuthLib with credentials or existing token.
 
@@ -147,6 +211,10 @@ class WyzeAuthLib:
             api_key: Third-party API key (required for login).
             token: Existing Token instance (skip login flow).
             token_callback: Callback for token refresh events.
+            **session_options: Connection pool and pipeline options passed to
+                `__init__` (`session`, `connection_limit`,
+                `connection_limit_per_host`, `keepalive_timeout`, `middlewares`,
+                `metrics`, `retry_policy`, `circuit_breaker`, `rate_limit`).
 
         Returns:
             A configured WyzeAuthLib instance.
@@ -161,6 +229,7 @@ class WyzeAuthLib:
             api_key=api_key,
             token=token,
             token_callback=token_callback,
+            **session_options,
         )
 
         if self._username is None and self._password is None and self.token is None:
@@ -175,6 +244,40 @@ class WyzeAuthLib:
 
         return self
 
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _get_session(self) -> ClientSession:
+        """Return the shared ClientSession, creating it on first use.
+
+        All requests go through one session so that TCP/TLS connections to each
+        Wyze host are pooled and kept alive between calls.
+        """
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=TCPConnector(
+                    limit=self._connection_limit,
+                    limit_per_host=self._connection_limit_per_host,
+                    keepalive_timeout=self._keepalive_timeout,
+                    ttl_dns_cache=self.DNS_CACHE_TTL,
+                )
+            )
+            self._owns_session = True
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared session and release all pooled connections.
+
+        A session passed in by the caller is left open.
+        """
+        if self._session is not None and self._owns_session:
+            if not self._session.closed:
+                await self._session.close()
+            self._session = None
+
     async def get_token_with_username_password(
         self, username, password, key_id, api_key
     ) -> Token:
@@ -327,39 +430,176 @@ class WyzeAuthLib:
 
         headers = {"X-API-Key": API_KEY}
 
-        async with ClientSession(
-            connector=TCPConnector(ttl_dns_cache=(30 * 60))
-        ) as _session:
-            response = await _session.post(
-                "https://api.wyzecam.com/app/user/refresh_token",
-                headers=headers,
-                json=payload,
-            )
-        response_json = await response.json()
+        response_json = await self.post(
+            "https://api.wyzecam.com/app/user/refresh_token",
+            headers=headers,
+            json=payload,
+        )
         check_for_errors_standard(self, response_json)
 
         self.token.access_token = response_json["data"]["access_token"]
         self.token.refresh_token = response_json["data"]["refresh_token"]
         await self.token_callback(self.token)
         self.token.expired = False
+        if self._metrics is not None:
+            self._metrics.on_token_refresh()
 
     def sanitize(self, data):
         """Recursively sanitize sensitive fields in dicts for safe logging.
 
         Args:
-            data: The dict to sanitize; returned sanitized copy.
+            data: The dict to sanitize; a sanitized copy is returned and the
+                original is left untouched.
         """
         if data and type(data) is dict:
-            # value is unused, but it prevents us from having to split the tuple to check against SANITIZE_FIELDS
+            sanitized = {}
             for key, value in data.items():
-                if type(value) is dict:
-                    data[key] = self.sanitize(value)
                 if key in self.SANITIZE_FIELDS:
-                    data[key] = self.SANITIZE_STRING
+                    sanitized[key] = self.SANITIZE_STRING
+                elif type(value) is dict:
+                    sanitized[key] = self.sanitize(value)
+                else:
+                    sanitized[key] = value
+            return sanitized
         return data
 
+    def add_middleware(self, middleware: Middleware, index: int = 0) -> None:
+        """Insert a stage into the request pipeline.
+
+        Args:
+            middleware: Async callable taking `(request, handler)`.
+            index: Position in the chain; 0 (the default) is the outermost stage.
+        """
+        self._middlewares.insert(index, middleware)
+        self._handler = None
+
+    def remove_middleware(self, middleware: Middleware) -> None:
+        """Remove a previously added stage from the request pipeline."""
+        self._middlewares.remove(middleware)
+        self._handler = None
+
+    @property
+    def middlewares(self) -> List[Middleware]:
+        """Pipeline stages ordered from outermost to innermost."""
+        return list(self._middlewares)
+
+    @property
+    def circuit_breakers(self) -> Optional[CircuitBreakers]:
+        """Per-host circuit breakers, or None when they are disabled."""
+        return self._circuit_breakers
+
+    @property
+    def rate_limiter(self) -> Optional[RateLimiter]:
+        """Per-host request rate limiter, or None when it is disabled."""
+        return self._rate_limiter
+
+    @property
+    def metrics(self) -> Optional[MetricsHook]:
+        """Hook receiving request metrics, or None when instrumentation is off."""
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, hook: Optional[MetricsHook]) -> None:
+        # The recording stage only exists while a hook is installed, so that
+        # requests pay nothing for instrumentation when it is off. It is the
+        # innermost stage, so every attempt of a retried request is recorded.
+        if self._metrics_stage is not None:
+            self.remove_middleware(self._metrics_stage)
+            self._metrics_stage = None
+        self._metrics = hook
+        for stage in (self._retry, self._rate_limiter):
+            if stage is not None:
+                stage.metrics = hook
+        if hook is not None:
+            self._metrics_stage = metrics_middleware(hook)
+            self.add_middleware(self._metrics_stage, len(self._middlewares))
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers=None,
+        params=None,
+        json=None,
+        data=None,
+        **context,
+    ) -> Dict[Any, Any]:
+        """Send a request through the middleware pipeline.
+
+        Args:
+            method: HTTP method.
+            url: Request URL.
+            headers: Optional headers.
+            params: Optional query parameters.
+            json: Optional JSON payload.
+            data: Optional form data.
+            **context: Metadata made available to middleware via `Request.context`.
+
+        Returns:
+            Parsed JSON response.
+        """
+        if self._handler is None:
+            self._handler = build_handler(self._middlewares, self._send)
+        return await self._handler(
+            Request(
+                method.upper(),
+                url,
+                headers=headers,
+                params=params,
+                json=json,
+                data=data,
+                context=context,
+            )
+        )
+
+    async def _send(self, request: Request) -> Dict[Any, Any]:
+        """Final pipeline stage: perform the HTTP call and decode the body once.
+
+        The body size is left in `Request.context` under `bytes_sent`.
+        """
+        session = self._get_session()
+        data = request.data
+        if request.json is not None:
+            # Encoded here rather than by aiohttp, so that its size is known
+            # without serializing it a second time
+            data = JsonPayload(request.json, dumps=session.json_serialize)
+            request.context["bytes_sent"] = data.size
+        else:
+            request.context["bytes_sent"] = request_size(request)
+        response = await session.request(
+            request.method,
+            request.url,
+            headers=request.headers,
+            params=request.params,
+            data=data,
+        )
+        request.context["status"] = response.status
+        request.context["bytes_received"] = response.content_length
+        request.context["response_headers"] = response.headers
+        try:
+            return await response.json()
+        except ContentTypeError:
+            _LOGGER.debug(f"Response: {response}")
+            raise
+
+    async def _log_request(self, request: Request, handler: Handler) -> Dict[Any, Any]:
+        """Pipeline stage that logs sanitized requests and responses at DEBUG level."""
+        if not _LOGGER.isEnabledFor(logging.DEBUG):
+            return await handler(request)
+
+        _LOGGER.debug("Request:")
+        _LOGGER.debug(f"method: {request.method}")
+        _LOGGER.debug(f"url: {request.url}")
+        _LOGGER.debug(f"json: {self.sanitize(request.json)}")
+        _LOGGER.debug(f"headers: {self.sanitize(request.headers)}")
+        _LOGGER.debug(f"params: {self.sanitize(request.params)}")
+        _LOGGER.debug(f"data: {self.sanitize(request.data)}")
+        response_json = await handler(request)
+        _LOGGER.debug(f"Response Json: {self.sanitize(response_json)}")
+        return response_json
+
     async def post(self, url, json=None, headers=None, data=None) -> Dict[Any, Any]:
-        """Send an HTTP POST request with sanitized logging.
+        """Send an HTTP POST request through the request pipeline.
 
         Args:
             url: Request URL.
@@ -370,49 +610,17 @@ class WyzeAuthLib:
         Returns:
             Parsed JSON response.
         """
-        async with ClientSession(
-            connector=TCPConnector(ttl_dns_cache=(30 * 60))
-        ) as _session:
-            response = await _session.post(url, json=json, headers=headers, data=data)
-            # Relocated these below as the sanitization seems to modify the data before it goes to the post.
-            _LOGGER.debug("Request:")
-            _LOGGER.debug(f"url: {url}")
-            _LOGGER.debug(f"json: {self.sanitize(json)}")
-            _LOGGER.debug(f"headers: {self.sanitize(headers)}")
-            _LOGGER.debug(f"data: {self.sanitize(data)}")
-            # Log the response.json() if it exists, if not log the response.
-            try:
-                response_json = await response.json()
-                _LOGGER.debug(f"Response Json: {self.sanitize(response_json)}")
-            except ContentTypeError:
-                _LOGGER.debug(f"Response: {response}")
-            return await response.json()
+        return await self.request("POST", url, headers=headers, json=json, data=data)
 
     async def put(self, url, json=None, headers=None, data=None) -> Dict[Any, Any]:
-        """Send an HTTP PUT request with sanitized logging.
+        """Send an HTTP PUT request through the request pipeline.
 
         See `post` for parameter details.
         """
-        async with ClientSession(
-            connector=TCPConnector(ttl_dns_cache=(30 * 60))
-        ) as _session:
-            response = await _session.put(url, json=json, headers=headers, data=data)
-            # Relocated these below as the sanitization seems to modify the data before it goes to the post.
-            _LOGGER.debug("Request:")
-            _LOGGER.debug(f"url: {url}")
-            _LOGGER.debug(f"json: {self.sanitize(json)}")
-            _LOGGER.debug(f"headers: {self.sanitize(headers)}")
-            _LOGGER.debug(f"data: {self.sanitize(data)}")
-            # Log the response.json() if it exists, if not log the response.
-            try:
-                response_json = await response.json()
-                _LOGGER.debug(f"Response Json: {self.sanitize(response_json)}")
-            except ContentTypeError:
-                _LOGGER.debug(f"Response: {response}")
-            return await response.json()
+        return await self.request("PUT", url, headers=headers, json=json, data=data)
 
     async def get(self, url, headers=None, params=None) -> Dict[Any, Any]:
-        """Send an HTTP GET request with sanitized logging.
+        """Send an HTTP GET request through the request pipeline.
 
         Args:
             url: Request URL.
@@ -422,50 +630,19 @@ class WyzeAuthLib:
         Returns:
             Parsed JSON response.
         """
-        async with ClientSession(
-            connector=TCPConnector(ttl_dns_cache=(30 * 60))
-        ) as _session:
-            response = await _session.get(url, params=params, headers=headers)
-            # Relocated these below as the sanitization seems to modify the data before it goes to the post.
-            _LOGGER.debug("Request:")
-            _LOGGER.debug(f"url: {url}")
-            _LOGGER.debug(f"headers: {self.sanitize(headers)}")
-            _LOGGER.debug(f"params: {self.sanitize(params)}")
-            # Log the response.json() if it exists, if not log the response.
-            try:
-                response_json = await response.json()
-                _LOGGER.debug(f"Response Json: {self.sanitize(response_json)}")
-            except ContentTypeError:
-                _LOGGER.debug(f"Response: {response}")
-            return await response.json()
+        return await self.request("GET", url, headers=headers, params=params)
 
     async def patch(self, url, headers=None, params=None, json=None) -> Dict[Any, Any]:
-        """Send an HTTP PATCH request with sanitized logging.
+        """Send an HTTP PATCH request through the request pipeline.
 
         See `get`/`post` for parameter details.
         """
-        async with ClientSession(
-            connector=TCPConnector(ttl_dns_cache=(30 * 60))
-        ) as _session:
-            response = await _session.patch(
-                url, headers=headers, params=params, json=json
-            )
-            # Relocated these below as the sanitization seems to modify the data before it goes to the post.
-            _LOGGER.debug("Request:")
-            _LOGGER.debug(f"url: {url}")
-            _LOGGER.debug(f"json: {self.sanitize(json)}")
-            _LOGGER.debug(f"headers: {self.sanitize(headers)}")
-            _LOGGER.debug(f"params: {self.sanitize(params)}")
-            # Log the response.json() if it exists, if not log the response.
-            try:
-                response_json = await response.json()
-                _LOGGER.debug(f"Response Json: {self.sanitize(response_json)}")
-            except ContentTypeError:
-                _LOGGER.debug(f"Response: {response}")
-            return await response.json()
+        return await self.request(
+            "PATCH", url, headers=headers, params=params, json=json
+        )
 
     async def delete(self, url, headers=None, json=None) -> Dict[Any, Any]:
-        """Send an HTTP DELETE request with sanitized logging.
+        """Send an HTTP DELETE request through the request pipeline.
 
         Args:
             url: Request URL.
@@ -475,19 +652,4 @@ class WyzeAuthLib:
         Returns:
             Parsed JSON response.
         """
-        async with ClientSession(
-            connector=TCPConnector(ttl_dns_cache=(30 * 60))
-        ) as _session:
-            response = await _session.delete(url, headers=headers, json=json)
-            # Relocated these below as the sanitization seems to modify the data before it goes to the post.
-            _LOGGER.debug("Request:")
-            _LOGGER.debug(f"url: {url}")
-            _LOGGER.debug(f"json: {self.sanitize(json)}")
-            _LOGGER.debug(f"headers: {self.sanitize(headers)}")
-            # Log the response.json() if it exists, if not log the response.
-            try:
-                response_json = await response.json()
-                _LOGGER.debug(f"Response Json: {self.sanitize(response_json)}")
-            except ContentTypeError:
-                _LOGGER.debug(f"Response: {response}")
-            return await response.json()
+        return await self.request("DELETE", url, headers=headers, json=json)
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 from unittest.mock import AsyncMock, MagicMock
 from wyzeapy.services.bulb_service import BulbService, Bulb
@@ -123,6 +124,84 @@ class TestBulbService(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(updated_bulb.color_temp, 2700)
         self.assertTrue(updated_bulb.on)
 
+    async def test_update_all(self):
+        bulbs = [
+            Bulb(
+                {
+                    "product_model": "WLPA19",
+                    "mac": f"BULB{i}",
+                    "device_params": {"ip": f"192.168.1.{i}"},
+                    "product_type": DeviceTypes.LIGHT.value,
+                }
+            )
+            for i in range(3)
+        ]
+
+        async def get_property_list(bulb):
+            if bulb.mac == "BULB1":
+                raise Exception("Test Exception")
+            return [(PropertyIDs.ON, "1"), (PropertyIDs.BRIGHTNESS, "40")]
+
+        self.bulb_service._get_property_list.side_effect = get_property_list
+
+        updated_bulbs = await self.bulb_service.update_all(bulbs)
+
+        self.assertEqual(self.bulb_service._get_property_list.await_count, 3)
+        self.assertTrue(updated_bulbs[0].on)
+        self.assertEqual(updated_bulbs[0].brightness, 40)
+        self.assertFalse(updated_bulbs[1].on)  # failed request keeps old state
+        self.assertTrue(updated_bulbs[2].on)
+
+    async def test_update_all_bounded_concurrency(self):
+        bulbs = [
+            Bulb(
+                {
+                    "product_model": "WLPA19",
+                    "mac": f"BULB{i}",
+                    "device_params": {"ip": f"192.168.1.{i}"},
+                    "product_type": DeviceTypes.LIGHT.value,
+                }
+            )
+            for i in range(20)
+        ]
+        in_flight = 0
+        max_in_flight = 0
+
+        async def get_property_list(bulb):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            return [(PropertyIDs.ON, "1")]
+
+        self.bulb_service._get_property_list.side_effect = get_property_list
+
+        results = await self.bulb_service._get_property_lists(bulbs, concurrency=4)
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(max_in_flight, 4)
+
+    async def test_update_all_propagates_cancellation(self):
+        bulbs = [
+            Bulb(
+                {
+                    "product_model": "WLPA19",
+                    "mac": f"BULB{i}",
+                    "device_params": {"ip": f"192.168.1.{i}"},
+                    "product_type": DeviceTypes.LIGHT.value,
+                }
+            )
+            for i in range(2)
+        ]
+        self.bulb_service._get_property_list.side_effect = [
+            [(PropertyIDs.ON, "1")],
+            asyncio.CancelledError(),
+        ]
+
+        with self.assertRaises(asyncio.CancelledError):
+            await self.bulb_service._get_property_lists(bulbs)
+
     async def test_get_bulbs(self):
         mock_device = MagicMock()
         mock_device.type = DeviceTypes.LIGHT
@@ -141,3 +220,92 @@ class TestBulbService(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(len(bulbs), 1)
         self.assertIsInstance(bulbs[0], Bulb)
         self.bulb_service.get_object_list.assert_awaited_once()
+
+
+def make_bulb(mac, device_type=DeviceTypes.MESH_LIGHT):
+    return Bulb(
+        {
+            "mac": mac,
+            "nickname": mac,
+            "product_type": device_type.value,
+            "product_model": "WLPA19C",
+            "device_params": {"ip": "192.168.1.100"},
+        }
+    )
+
+
+class TestBulbGroupCommands(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.bulb_service = BulbService(auth_lib=MagicMock())
+        self.bulb_service._post_action_list = AsyncMock()
+        self.bulb_service._run_action_list = AsyncMock()
+        self.bulb_service._set_property_list = AsyncMock()
+        self.bulb_service._local_bulb_command = AsyncMock()
+
+    async def test_turn_on_group_chunks_mesh_bulbs(self):
+        bulbs = [make_bulb(f"MESH{i}") for i in range(25)]
+
+        results = await self.bulb_service.turn_on_group(bulbs, local_control=False)
+
+        self.assertEqual(results, {bulb.mac: None for bulb in bulbs})
+        chunks = [
+            c.args[0] for c in self.bulb_service._post_action_list.await_args_list
+        ]
+        self.assertEqual([len(chunk) for chunk in chunks], [20, 5])
+        self.assertEqual(
+            chunks[0][0]["action_params"]["list"][0]["plist"],
+            [{"pid": PropertyIDs.ON.value, "pvalue": "1"}],
+        )
+        self.bulb_service._run_action_list.assert_not_awaited()
+
+    async def test_group_routes_by_bulb_type(self):
+        light = make_bulb("LIGHT", DeviceTypes.LIGHT)
+        strip = make_bulb("STRIP", DeviceTypes.LIGHTSTRIP)
+        strip.cloud_fallback = True
+        local = make_bulb("LOCAL")
+        fallback = make_bulb("FALLBACK")
+        fallback.cloud_fallback = True
+        sun_match = [{"pid": PropertyIDs.SUN_MATCH.value, "pvalue": "1"}]
+
+        await self.bulb_service.turn_on_group(
+            [light, strip, local, fallback], local_control=True, options=sun_match
+        )
+
+        self.bulb_service._set_property_list.assert_any_await(
+            light, [{"pid": PropertyIDs.ON.value, "pvalue": "1"}, *sun_match]
+        )
+        # Sun match for mesh bulbs goes to set_property_list
+        self.bulb_service._set_property_list.assert_any_await(fallback, sun_match)
+        self.bulb_service._local_bulb_command.assert_awaited_once_with(
+            local, [{"pid": PropertyIDs.ON.value, "pvalue": "1"}, *sun_match]
+        )
+        (action_list,) = self.bulb_service._post_action_list.await_args.args
+        self.assertEqual(
+            [action["instance_id"] for action in action_list], ["STRIP", "FALLBACK"]
+        )
+
+    async def test_group_propagates_cancellation(self):
+        self.bulb_service._set_property_list.side_effect = asyncio.CancelledError()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await self.bulb_service.turn_on_group(
+                [make_bulb("LIGHT", DeviceTypes.LIGHT), make_bulb("MESH")],
+                local_control=False,
+            )
+
+    async def test_failed_chunk_falls_back_per_device(self):
+        self.bulb_service._post_action_list.side_effect = OSError
+        self.bulb_service._run_action_list.side_effect = [None, OSError("offline")]
+        bulbs = [make_bulb("A"), make_bulb("B")]
+
+        results = await self.bulb_service.turn_off_group(bulbs, local_control=False)
+
+        self.assertIsNone(results["A"])
+        self.assertIsInstance(results["B"], OSError)
+        self.bulb_service._run_action_list.assert_any_await(
+            bulbs[0], [{"pid": PropertyIDs.ON.value, "pvalue": "0"}]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,8 +10,6 @@ from aiohttp import ClientOSError, ContentTypeError
 
 class TestCameraService(unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
-        CameraService._updater_thread = None
-        CameraService._subscribers = []
         self.mock_auth_lib = MagicMock(spec=WyzeAuthLib)
         self.camera_service = CameraService(auth_lib=self.mock_auth_lib)
         self.camera_service._get_property_list = AsyncMock()
@@ -77,6 +75,10 @@ class TestCameraService(unittest.IsolatedAsyncioTestCase):
             }
         )
 
+    async def asyncTearDown(self):
+        if self.camera_service._subscriptions is not None:
+            await self.camera_service._subscriptions.stop()
+
     async def test_update_legacy_camera(self):
         # Mock responses
         self.camera_service._get_event_list.return_value = {
@@ -111,6 +113,49 @@ class TestCameraService(unittest.IsolatedAsyncioTestCase):
         self.assertIsNotNone(updated_camera.last_event)
         self.assertEqual(updated_camera.last_event_ts, 1234567890)
 
+    async def test_update_all(self):
+        self.camera_service._get_event_list.return_value = {
+            "data": {
+                "event_list": [
+                    {"event_ts": 1234567890, "device_mac": "TEST123"},
+                    {"event_ts": 1234567999, "device_mac": "TEST456"},
+                ]
+            }
+        }
+        self.camera_service._get_property_list.return_value = [
+            (PropertyIDs.AVAILABLE, "1"),
+            (PropertyIDs.ON, "1"),
+        ]
+        self.camera_service._get_iot_prop_devicemgmt.return_value = {
+            "data": {
+                "capabilities": [
+                    {
+                        "name": "iot-device",
+                        "properties": {
+                            "push-switch": True,
+                            "iot-power": True,
+                            "iot-state": True,
+                        },
+                    }
+                ]
+            }
+        }
+
+        await self.camera_service.update_all([self.test_camera, self.devicemgmt_camera])
+
+        self.camera_service._get_event_list.assert_awaited_once()
+        self.camera_service._get_property_list.assert_awaited_once_with(
+            self.test_camera
+        )
+        self.camera_service._get_iot_prop_devicemgmt.assert_awaited_once_with(
+            self.devicemgmt_camera
+        )
+        self.assertEqual(self.test_camera.last_event_ts, 1234567890)
+        self.assertEqual(self.devicemgmt_camera.last_event_ts, 1234567999)
+        self.assertTrue(self.test_camera.available)
+        self.assertTrue(self.devicemgmt_camera.available)
+        self.assertTrue(self.devicemgmt_camera.notify)
+
     async def test_update_devicemgmt_camera(self):
         self.camera_service._get_iot_prop_devicemgmt.return_value = {
             "data": {
@@ -311,11 +356,10 @@ class TestCameraService(unittest.IsolatedAsyncioTestCase):
     async def test_register_for_updates(self):
         mock_callback = MagicMock()
         await self.camera_service.register_for_updates(self.test_camera, mock_callback)
-        self.assertEqual(len(self.camera_service._subscribers), 1)
-        self.assertEqual(self.camera_service._subscribers[0][0], self.test_camera)
-        self.assertEqual(self.camera_service._subscribers[0][1], mock_callback)
-        self.assertIsNotNone(self.camera_service._updater_thread)
-        self.assertTrue(self.camera_service._updater_thread.is_alive())
+        subscribers = self.camera_service._subscriptions.subscribers
+        self.assertEqual(len(subscribers), 1)
+        self.assertEqual(subscribers[0][0], self.test_camera)
+        self.assertEqual(subscribers[0][1], mock_callback)
 
     async def test_deregister_for_updates(self):
         mock_callback1 = MagicMock()
@@ -323,32 +367,38 @@ class TestCameraService(unittest.IsolatedAsyncioTestCase):
         camera2 = Camera({"mac": "TEST999"})
         await self.camera_service.register_for_updates(self.test_camera, mock_callback1)
         await self.camera_service.register_for_updates(camera2, mock_callback2)
-        self.assertEqual(len(self.camera_service._subscribers), 2)
+        self.assertEqual(len(self.camera_service._subscriptions.subscribers), 2)
 
         await self.camera_service.deregister_for_updates(self.test_camera)
-        self.assertEqual(len(self.camera_service._subscribers), 1)
-        self.assertEqual(self.camera_service._subscribers[0][0], camera2)
+        subscribers = self.camera_service._subscriptions.subscribers
+        self.assertEqual(len(subscribers), 1)
+        self.assertEqual(subscribers[0][0], camera2)
 
-    async def test_update_worker_success(self):
+    async def test_subscription_updates(self):
         mock_callback = MagicMock()
         mock_callback.return_value = None  # Ensure callback doesn't return a coroutine
         self.camera_service.update = AsyncMock(return_value=self.test_camera)
 
         await self.camera_service.register_for_updates(self.test_camera, mock_callback)
 
-        # Give the worker a moment to run
-        await asyncio.sleep(0.2)
+        # Give the scheduler a moment to run
+        await asyncio.sleep(0.05)
+
+        self.camera_service.update.assert_awaited_once_with(self.test_camera)
+        mock_callback.assert_called_once_with(self.test_camera)
 
-        # Manually stop the thread for testing purposes
-        self.camera_service._subscribers = []
-        self.camera_service._updater_thread.join(timeout=1)
+    async def test_subscription_is_not_busy_looping(self):
+        self.camera_service.update = AsyncMock(return_value=self.test_camera)
+
+        await self.camera_service.register_for_updates(
+            self.test_camera, MagicMock(), interval=60
+        )
+        await asyncio.sleep(0.1)
 
-        # The update method should have been called at least once
-        self.assertGreater(self.camera_service.update.call_count, 0)
-        # The callback should have been called at least once
-        self.assertGreater(mock_callback.call_count, 0)
+        # One poll per interval, not one per loop iteration
+        self.assertEqual(self.camera_service.update.await_count, 1)
 
-    async def test_update_worker_exceptions(self):
+    async def test_subscription_update_exceptions(self):
         mock_callback = MagicMock()
 
         # Create a series of exceptions that will be raised when update is called
@@ -363,19 +413,15 @@ class TestCameraService(unittest.IsolatedAsyncioTestCase):
         self.camera_service.update = AsyncMock(side_effect=exceptions_to_raise)
 
         with (
-            patch("wyzeapy.services.camera_service._LOGGER.warning") as mock_warning,
-            patch("wyzeapy.services.camera_service._LOGGER.error") as mock_error,
+            patch("wyzeapy.services.update_manager._LOGGER.warning") as mock_warning,
+            patch("wyzeapy.services.update_manager._LOGGER.error") as mock_error,
         ):
             await self.camera_service.register_for_updates(
-                self.test_camera, mock_callback
+                self.test_camera, mock_callback, interval=0.01
             )
 
-            # Give the worker a moment to run through exceptions
-            await asyncio.sleep(0.3)
-
-            # Manually stop the thread for testing purposes
-            self.camera_service._subscribers = []
-            self.camera_service._updater_thread.join(timeout=1)
+            # Give the scheduler a moment to run through exceptions
+            await asyncio.sleep(0.1)
 
             # Check that the update method was called at least the number of exceptions we set up
             self.assertGreaterEqual(
@@ -387,6 +433,7 @@ class TestCameraService(unittest.IsolatedAsyncioTestCase):
             )
             # Check that error was called for other exceptions
             self.assertGreaterEqual(mock_error.call_count, 2)
+            mock_callback.assert_not_called()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+from aiohttp import ClientOSError
+from wyzeapy.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerPolicy,
+    CircuitBreakers,
+    CircuitState,
+)
+from wyzeapy.exceptions import CircuitOpenError
+from wyzeapy.pipeline import Request
+from wyzeapy.services.bulb_service import Bulb, BulbService
+from wyzeapy.wyze_auth_lib import WyzeAuthLib
+
+EARTH = "https://wyze-earth-service.wyzecam.com/plugin/earth/get_iot_prop"
+API = "https://api.wyzecam.com/app/v2/device/get_property_list"
+
+
+def responding(status):
+    async def handler(request):
+        request.context["status"] = status
+        return {}
+
+    return AsyncMock(side_effect=handler)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = 1000.0
+        patcher = patch(
+            "wyzeapy.circuit_breaker.time.monotonic", side_effect=lambda: self.clock
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(
+            CircuitBreakerPolicy(failure_threshold=2, reset_timeout=10)
+        )
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitState.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_in, 10)
+
+    def test_half_open_probe(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock += 10
+
+        self.assertFalse(self.breaker.is_open)
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitState.HALF_OPEN)
+        # Only one probe at a time
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitState.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock += 10
+        self.breaker.allow()
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitState.OPEN)
+        self.assertEqual(self.breaker.retry_in, 10)
+
+    def test_release_frees_probe(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock += 10
+        self.breaker.allow()
+
+        self.breaker.release()
+        self.assertTrue(self.breaker.allow())
+
+
+class TestCircuitBreakers(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.breakers = CircuitBreakers(
+            CircuitBreakerPolicy(failure_threshold=2, reset_timeout=60)
+        )
+
+    async def test_breakers_are_per_host(self):
+        failing = AsyncMock(side_effect=ClientOSError())
+        for _ in range(2):
+            with self.assertRaises(ClientOSError):
+                await self.breakers(Request("POST", EARTH), failing)
+
+        with self.assertRaises(CircuitOpenError) as cm:
+            await self.breakers(Request("POST", EARTH), failing)
+        self.assertEqual(cm.exception.host, "wyze-earth-service.wyzecam.com")
+        self.assertEqual(failing.await_count, 2)  # No round trip once open
+        self.assertTrue(self.breakers.is_open("wyze-earth-service.wyzecam.com"))
+
+        self.assertEqual(await self.breakers(Request("POST", API), responding(200)), {})
+        self.assertFalse(self.breakers.is_open("api.wyzecam.com"))
+
+    async def test_server_errors_count_as_failures(self):
+        for _ in range(2):
+            await self.breakers(Request("POST", API), responding(503))
+        self.assertTrue(self.breakers.is_open("api.wyzecam.com"))
+
+    async def test_client_errors_do_not_count(self):
+        for _ in range(3):
+            await self.breakers(Request("POST", API), responding(404))
+        self.assertEqual(self.breakers.states, {"api.wyzecam.com": CircuitState.CLOSED})
+
+    async def test_cancelled_probe_is_released(self):
+        breaker = self.breakers.get("api.wyzecam.com")
+        breaker.state = CircuitState.HALF_OPEN
+        cancelled = AsyncMock(side_effect=asyncio.CancelledError)
+
+        with self.assertRaises(asyncio.CancelledError):
+            await self.breakers(Request("POST", API), cancelled)
+        self.assertFalse(self.breakers.is_open("api.wyzecam.com"))
+
+
+class TestOpenCircuitMarksDevicesUnavailable(unittest.IsolatedAsyncioTestCase):
+    async def test_update_all(self):
+        auth_lib = WyzeAuthLib(retry_policy=None)
+        auth_lib.token = AsyncMock(access_token="token")
+        auth_lib.refresh_if_should = AsyncMock()
+        breaker = auth_lib.circuit_breakers.get("api.wyzecam.com")
+        for _ in range(breaker.policy.failure_threshold):
+            breaker.record_failure()
+
+        service = BulbService(auth_lib)
+        service._refresh_device_params = AsyncMock()
+        bulb = Bulb(
+            {
+                "mac": "A",
+                "nickname": "A",
+                "product_type": "Light",
+                "product_model": "WLPA19",
+                "device_params": {"ip": ""},
+            }
+        )
+        bulb.available = True
+
+        with patch.object(auth_lib, "_send", new_callable=AsyncMock) as send:
+            await service.update_all([bulb])
+            send.assert_not_awaited()
+        self.assertFalse(bulb.available)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from wyzeapy.services.bulb_service import Bulb, BulbService
+from wyzeapy.services.command_coalescer import CommandCoalescer
+from wyzeapy.types import Device, DeviceTypes, PropertyIDs
+
+
+def pair(pid, value):
+    return {"pid": pid, "pvalue": value}
+
+
+class TestCommandCoalescer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.coalescer = CommandCoalescer(window=0.01, max_delay=0.05)
+        self.device = Device({"mac": "A", "nickname": "A"})
+        self.send = AsyncMock(return_value="sent")
+
+    async def test_merges_with_last_write_wins(self):
+        results = await asyncio.gather(
+            self.coalescer.submit(self.device, [pair("P3", "10")], self.send),
+            self.coalescer.submit(self.device, [pair("P1501", "20")], self.send),
+            self.coalescer.submit(self.device, [pair("P3", "30")], self.send),
+        )
+
+        self.assertEqual(results, ["sent"] * 3)
+        self.send.assert_awaited_once_with(
+            self.device, [pair("P1501", "20"), pair("P3", "30")]
+        )
+        self.assertEqual((self.coalescer.submitted, self.coalescer.sent), (3, 1))
+
+    async def test_devices_are_independent(self):
+        other = Device({"mac": "B", "nickname": "B"})
+        await asyncio.gather(
+            self.coalescer.submit(self.device, [pair("P3", "10")], self.send),
+            self.coalescer.submit(other, [pair("P3", "20")], self.send),
+        )
+        self.assertEqual(self.send.await_count, 2)
+
+    async def test_different_sender_is_sent_in_order(self):
+        calls = []
+
+        def sender(name):
+            async def send(device, plist):
+                await asyncio.sleep(0)
+                calls.append((name, plist))
+
+            return send
+
+        local, cloud = sender("local"), sender("cloud")
+        await asyncio.gather(
+            self.coalescer.submit(self.device, [pair("P3", "10")], local),
+            self.coalescer.submit(self.device, [pair("P3", "20")], cloud),
+        )
+        self.assertEqual(
+            calls, [("local", [pair("P3", "10")]), ("cloud", [pair("P3", "20")])]
+        )
+
+    async def test_max_delay_bounds_debounce(self):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        task = asyncio.ensure_future(
+            self.coalescer.submit(self.device, [pair("P3", "0")], self.send)
+        )
+        # Keep the window from ever going quiet
+        followers = []
+        while not task.done():
+            followers.append(
+                asyncio.ensure_future(
+                    self.coalescer.submit(self.device, [pair("P3", "1")], self.send)
+                )
+            )
+            await asyncio.sleep(0.005)
+        self.assertLess(loop.time() - started, 0.05 + 0.03)
+        await self.coalescer.flush()
+        await asyncio.gather(*followers)
+
+    async def test_errors_reach_every_caller(self):
+        self.send.side_effect = OSError("offline")
+        results = await asyncio.gather(
+            self.coalescer.submit(self.device, [pair("P3", "10")], self.send),
+            self.coalescer.submit(self.device, [pair("P3", "20")], self.send),
+            return_exceptions=True,
+        )
+        self.assertTrue(all(isinstance(r, OSError) for r in results))
+
+    async def test_flush(self):
+        task = asyncio.ensure_future(
+            CommandCoalescer(window=60).submit(
+                self.device, [pair("P3", "1")], self.send
+            )
+        )
+        await asyncio.sleep(0)
+        self.assertFalse(task.done())
+        task.cancel()
+
+        coalescer = CommandCoalescer(window=60)
+        task = asyncio.ensure_future(
+            coalescer.submit(self.device, [pair("P3", "1")], self.send)
+        )
+        await asyncio.sleep(0)
+        await coalescer.flush()
+        self.assertEqual(await task, "sent")
+        self.assertEqual(coalescer.pending, 0)
+
+
+class TestBulbServiceCoalescing(unittest.IsolatedAsyncioTestCase):
+    async def test_slider_sends_one_request(self):
+        service = BulbService(
+            MagicMock(), command_coalescer=CommandCoalescer(window=0.01)
+        )
+        service._set_property_list = AsyncMock()
+        bulb = Bulb(
+            {
+                "mac": "A",
+                "nickname": "A",
+                "product_type": DeviceTypes.LIGHT.value,
+                "product_model": "WLPA19",
+                "device_params": {"ip": ""},
+            }
+        )
+
+        await asyncio.gather(
+            *(service.set_brightness(bulb, value) for value in range(0, 100, 10)),
+            service.set_color_temp(bulb, 3000),
+        )
+
+        service._set_property_list.assert_awaited_once_with(
+            bulb,
+            [
+                {"pid": PropertyIDs.BRIGHTNESS.value, "pvalue": "90"},
+                {"pid": PropertyIDs.COLOR_TEMP.value, "pvalue": "3000"},
+            ],
+        )
+
+    async def test_disabled_by_default(self):
+        service = BulbService(MagicMock())
+        service._set_property_list = AsyncMock()
+        bulb = Bulb(
+            {
+                "mac": "A",
+                "nickname": "A",
+                "product_type": DeviceTypes.LIGHT.value,
+                "product_model": "WLPA19",
+                "device_params": {"ip": ""},
+            }
+        )
+
+        await service.set_brightness(bulb, 10)
+        await service.set_brightness(bulb, 20)
+        self.assertEqual(service._set_property_list.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from wyzeapy.services.base_service import BaseService
+from wyzeapy.services.bulb_service import Bulb
+from wyzeapy.services.device_registry import DeviceRegistry
+from wyzeapy.services.lock_service import LockService
+from wyzeapy.wyze_auth_lib import WyzeAuthLib
+
+
+def device_list(*macs, ip="192.168.1.100"):
+    return [
+        {
+            "mac": mac,
+            "nickname": f"Device {mac}",
+            "product_type": "Light",
+            "product_model": "WLPA19",
+            "device_params": {"ip": ip},
+        }
+        for mac in macs
+    ]
+
+
+class TestDeviceRegistry(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.registry = DeviceRegistry(ttl=60)
+
+    def test_update_and_lookup(self):
+        devices = self.registry.update(device_list("A", "B"))
+
+        self.assertEqual([device.mac for device in devices], ["A", "B"])
+        self.assertIs(self.registry.get("B"), devices[1])
+        self.assertIsNone(self.registry.get("C"))
+        self.assertIn("A", self.registry)
+        self.assertEqual(len(self.registry), 2)
+
+    def test_update_in_place(self):
+        devices = self.registry.update(device_list("A", "B"))
+        updated = self.registry.update(device_list("B", "C", ip="192.168.1.200"))
+
+        self.assertIs(updated[0], devices[1])  # Same object, new data
+        self.assertEqual(updated[0].device_params["ip"], "192.168.1.200")
+        self.assertIsNone(self.registry.get("A"))  # Removed from the account
+        self.assertEqual([device.mac for device in updated], ["B", "C"])
+
+    def test_update_drops_removed_keys(self):
+        raw = device_list("A")
+        raw[0]["firmware_ver"] = "1.0"
+        device = self.registry.update(raw)[0]
+
+        self.registry.update(device_list("A"))
+        self.assertFalse(hasattr(device, "firmware_ver"))
+
+    def test_is_stale(self):
+        self.assertTrue(self.registry.is_stale)
+        self.registry.update(device_list("A"))
+        self.assertFalse(self.registry.is_stale)
+
+        self.registry.invalidate()
+        self.assertTrue(self.registry.is_stale)
+
+        self.registry.update(device_list("A"))
+        self.registry.ttl = 0
+        self.assertTrue(self.registry.is_stale)
+
+    async def test_refresh_is_single_flight(self):
+        release = asyncio.Event()
+        fetch = AsyncMock()
+
+        async def slow_fetch():
+            await release.wait()
+            return device_list("A")
+
+        fetch.side_effect = slow_fetch
+        callers = [asyncio.create_task(self.registry.refresh(fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers)
+
+        fetch.assert_awaited_once()
+        for result in results:
+            self.assertIs(result[0], results[0][0])
+
+        # Once finished, the next refresh fetches again
+        await self.registry.refresh(fetch)
+        self.assertEqual(fetch.await_count, 2)
+
+    async def test_refresh_survives_cancelled_caller(self):
+        release = asyncio.Event()
+
+        async def slow_fetch():
+            await release.wait()
+            return device_list("A")
+
+        first = asyncio.create_task(self.registry.refresh(slow_fetch))
+        second = asyncio.create_task(self.registry.refresh(slow_fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        self.assertEqual([device.mac for device in await second], ["A"])
+
+    async def test_refresh_error_propagates(self):
+        fetch = AsyncMock(side_effect=RuntimeError("boom"))
+        with self.assertRaises(RuntimeError):
+            await self.registry.refresh(fetch)
+
+        fetch.side_effect = None
+        fetch.return_value = device_list("A")
+        await self.registry.refresh(fetch)
+        self.assertIsNotNone(self.registry.get("A"))
+
+    async def test_get_devices_uses_ttl(self):
+        fetch = AsyncMock(return_value=device_list("A"))
+
+        await self.registry.get_devices(fetch)
+        await self.registry.get_devices(fetch)
+        fetch.assert_awaited_once()
+
+    def test_wrap_is_cached_until_device_changes(self):
+        device = self.registry.update(device_list("A"))[0]
+        bulb = self.registry.wrap(Bulb, device)
+
+        self.assertIsInstance(bulb, Bulb)
+        self.assertIs(self.registry.wrap(Bulb, device), bulb)
+
+        self.registry.update(device_list("A", ip="192.168.1.200"))
+        self.assertIs(self.registry.wrap(Bulb, device), bulb)
+        self.assertEqual(bulb.ip, "192.168.1.200")
+
+        self.registry.update([])
+        self.assertIsNot(self.registry.wrap(Bulb, device), bulb)
+
+
+class TestBaseServiceRegistry(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.registry = DeviceRegistry()
+        self.original_registry = BaseService._registry
+        BaseService._registry = self.registry
+        auth_lib = MagicMock(spec=WyzeAuthLib)
+        auth_lib.token = MagicMock(access_token="token")
+        auth_lib.refresh_if_should = AsyncMock()
+        auth_lib.post = AsyncMock(
+            return_value={"code": "1", "data": {"device_list": device_list("A", "B")}}
+        )
+        self.service = BaseService(auth_lib)
+
+    async def asyncTearDown(self):
+        BaseService._registry = self.original_registry
+        BaseService._devices = None
+
+    async def test_get_object_list_coalesces_concurrent_calls(self):
+        results = await asyncio.gather(
+            self.service.get_object_list(), self.service.get_object_list()
+        )
+
+        self.service._auth_lib.post.assert_awaited_once()
+        self.assertEqual(results[0], results[1])
+
+    async def test_get_updated_params(self):
+        params = await self.service.get_updated_params("B")
+        self.assertEqual(params, {"ip": "192.168.1.100"})
+
+        # Served from the registry until the TTL expires
+        self.assertEqual(await self.service.get_updated_params("missing"), {})
+        self.service._auth_lib.post.assert_awaited_once()
+
+    async def test_update_then_get_keeps_view_state(self):
+        def lock_list(nickname):
+            return {
+                "code": "1",
+                "data": {
+                    "device_list": [
+                        dict(raw, nickname=nickname, product_type="Lock")
+                        for raw in device_list("A")
+                    ]
+                },
+            }
+
+        self.service._auth_lib.post.return_value = lock_list("Front door")
+        service = LockService(self.service._auth_lib)
+        (lock,) = await service.get_locks()
+        lock_info = {
+            "onoff_line": 1,
+            "door_open_status": 1,
+            "trash_mode": 0,
+            "locker_status": {"hardlock": 2},
+        }
+        service._get_lock_info = AsyncMock(return_value={"device": lock_info})
+
+        await service.update(lock)
+        self.assertEqual(await service.get_locks(), [lock])
+        self.assertTrue(lock.available)
+        self.assertIs(lock.raw_dict, lock_info)
+
+        # A new device list refreshes the fields without losing the state
+        self.service._auth_lib.post.return_value = lock_list("Back door")
+        self.registry.invalidate()
+        await service.get_object_list()
+        self.assertIs((await service.get_locks())[0], lock)
+        self.assertTrue(lock.available)
+        self.assertTrue(lock.door_open)
+        self.assertTrue(lock.unlocked)
+        self.assertEqual(lock.nickname, "Back door")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from wyzeapy.services.camera_service import Camera, CameraService
+from wyzeapy.services.event_feed import EventCursor, EventFeed
+from wyzeapy.types import DeviceTypes, Event
+
+
+def events(*events):
+    return {
+        "data": {
+            "event_list": [
+                {"event_id": event_id, "device_mac": mac, "event_ts": ts}
+                for event_id, mac, ts in events
+            ]
+        }
+    }
+
+
+class TestEventFeed(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.fetch = AsyncMock(
+            return_value=events(("e2", "A", 200), ("e1", "B", 100), ("e0", "A", 50))
+        )
+        self.feed = EventFeed(self.fetch)
+
+    async def test_indexes_newest_event_per_device(self):
+        new_events = await self.feed.update()
+
+        self.assertEqual([event.event_id for event in new_events], ["e2", "e1", "e0"])
+        self.assertEqual(self.feed.get("A").event_id, "e2")
+        self.assertEqual(self.feed.get("B").event_id, "e1")
+        self.assertIsNone(self.feed.get("C"))
+        self.assertEqual(self.feed.last_event_ts, 200)
+
+    async def test_concurrent_readers_share_one_fetch(self):
+        results = await asyncio.gather(
+            self.feed.latest("A"), self.feed.latest("B"), self.feed.latest("C")
+        )
+
+        self.assertEqual(
+            [getattr(r, "event_id", None) for r in results], ["e2", "e1", None]
+        )
+        self.fetch.assert_awaited_once_with(10, None, None)
+
+        # Still fresh
+        await self.feed.latest("A")
+        self.fetch.assert_awaited_once()
+
+    async def test_incremental_fetch(self):
+        await self.feed.update()
+        self.fetch.return_value = events(("e3", "B", 300), ("e2", "A", 200))
+
+        new_events = await self.feed.update(force=True)
+
+        self.fetch.assert_awaited_with(10, 200, None)
+        self.assertEqual([event.event_id for event in new_events], ["e3"])
+        self.assertEqual(self.feed.get("B").event_id, "e3")
+
+    async def test_stale_after_max_age(self):
+        self.feed.max_age = 0
+        await self.feed.update()
+        self.assertTrue(self.feed.stale)
+        await self.feed.update()
+        self.assertEqual(self.fetch.await_count, 2)
+
+    async def test_pages_back_while_pages_are_full(self):
+        self.feed.page_size = 2
+        self.feed.last_event_ts = 100
+        self.fetch.side_effect = [
+            events(("e5", "A", 500), ("e4", "B", 400)),
+            events(("e4", "B", 400), ("e3", "A", 300)),
+            events(("e3", "A", 300)),
+        ]
+
+        new_events = await self.feed.update()
+
+        self.assertEqual(
+            [c.args for c in self.fetch.await_args_list],
+            [(2, 100, None), (2, 100, 400), (2, 100, 300)],
+        )
+        self.assertEqual([event.event_id for event in new_events], ["e5", "e4", "e3"])
+
+    async def test_bounded_history(self):
+        self.feed.history_size = 2
+        await self.feed.update()
+        self.fetch.return_value = events(("e3", "A", 300))
+        await self.feed.update(force=True)
+
+        self.assertEqual(
+            [event.event_id for event in self.feed.history("A")], ["e3", "e2"]
+        )
+        # Backfilled events are placed by time, once
+        self.fetch.return_value = events(("e9", "A", 250), ("e3", "A", 300))
+        await self.feed.backfill(0)
+        self.assertEqual(
+            [event.event_id for event in self.feed.history("A")], ["e3", "e9"]
+        )
+
+    async def test_listener_is_bounded(self):
+        listener = self.feed.subscribe(maxsize=2)
+
+        await self.feed.update()
+
+        self.assertEqual(
+            [listener.get_nowait().event_id for _ in range(listener.qsize())],
+            ["e1", "e2"],
+        )
+        self.assertTrue(self.feed.missed(listener))
+        self.assertFalse(self.feed.missed(listener))
+        self.feed.unsubscribe(listener)
+
+    async def test_failed_fetch_is_retried(self):
+        self.fetch.side_effect = [OSError("offline"), self.fetch.return_value]
+        with self.assertRaises(OSError):
+            await self.feed.update()
+
+        await self.feed.update()
+        self.assertEqual(self.feed.get("A").event_id, "e2")
+
+
+class TestEventCursor(unittest.TestCase):
+    def test_advance(self):
+        first, second = (
+            Event({"event_id": "a", "device_mac": "A", "event_ts": 100}),
+            Event({"event_id": "b", "device_mac": "B", "event_ts": 100}),
+        )
+        cursor = EventCursor(50).advance(first)
+
+        self.assertFalse(cursor.is_new(first))
+        self.assertTrue(cursor.is_new(second))
+        cursor = cursor.advance(second)
+        self.assertEqual(cursor, EventCursor(100, frozenset({"a", "b"})))
+        self.assertEqual(EventCursor.from_dict(cursor.to_dict()), cursor)
+
+    def test_serialized_keys_round_trip(self):
+        cursor = EventCursor(100, frozenset({"a", 7, ("AA:BB", 100)}))
+
+        restored = EventCursor.from_dict(json.loads(json.dumps(cursor.to_dict())))
+
+        self.assertEqual(restored, cursor)
+        self.assertFalse(
+            restored.is_new(Event({"device_mac": "AA:BB", "event_ts": 100}))
+        )
+
+
+class TestCameraServiceEventFeed(unittest.IsolatedAsyncioTestCase):
+    async def test_cameras_share_event_list(self):
+        service = CameraService(MagicMock())
+        service.get_updated_params = AsyncMock()
+        service._get_property_list = AsyncMock(return_value=[])
+        service._get_event_list = AsyncMock(
+            return_value=events(("e1", "A", 100), ("e2", "B", 200))
+        )
+        cameras = [
+            Camera(
+                {
+                    "mac": mac,
+                    "nickname": mac,
+                    "product_type": DeviceTypes.CAMERA.value,
+                    "product_model": "WYZE_CAKP2JFUS",
+                }
+            )
+            for mac in "AB"
+        ]
+
+        await asyncio.gather(*(service.update(camera) for camera in cameras))
+
+        service._get_event_list.assert_awaited_once_with(10, None, None)
+        self.assertEqual(cameras[0].last_event_ts, 100)
+        self.assertEqual(cameras[1].last_event_ts, 200)
+
+    async def test_stream_events(self):
+        service = CameraService(MagicMock())
+        service._get_event_list = AsyncMock(
+            side_effect=[
+                events(("e2", "B", 200), ("e1", "A", 100)),
+                events(("e3", "A", 300), ("e2", "B", 200)),
+            ]
+        )
+
+        service.event_feed.max_age = 0
+        stream = service.stream_events(EventCursor(100, frozenset({"e1"})), interval=0)
+        received = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+
+        self.assertEqual([event.event_id for event in received], ["e2", "e3"])
+        # Resumed from the cursor, then continued from the newest event
+        self.assertEqual(
+            [c.args for c in service._get_event_list.await_args_list],
+            [(10, 100, None), (10, 200, None)],
+        )
+        self.assertEqual(service.event_feed._listeners, [])
+
+    async def test_stream_resumes_from_serialized_cursor(self):
+        def without_ids(*events):
+            return {
+                "data": {
+                    "event_list": [
+                        {"device_mac": mac, "event_ts": ts} for mac, ts in events
+                    ]
+                }
+            }
+
+        service = CameraService(MagicMock())
+        service._get_event_list = AsyncMock(
+            return_value=without_ids(("B", 200), ("A", 200))
+        )
+        service.event_feed.max_age = 0
+        stream = service.stream_events(EventCursor(100), interval=0)
+        cursor = EventCursor(100)
+        for _ in range(2):
+            cursor = cursor.advance(await stream.__anext__())
+        await stream.aclose()
+
+        # After a restart
+        saved = json.loads(json.dumps(cursor.to_dict()))
+        service = CameraService(MagicMock())
+        service._get_event_list = AsyncMock(
+            return_value=without_ids(("A", 300), ("B", 200), ("A", 200))
+        )
+        stream = service.stream_events(EventCursor.from_dict(saved), interval=0)
+        event = await stream.__anext__()
+        await stream.aclose()
+
+        # The events at the cursor were not delivered again
+        self.assertEqual((event.device_mac, event.event_ts), ("A", 300))
+
+    async def test_stream_backfills_dropped_events(self):
+        service = CameraService(MagicMock())
+        feed = service.event_feed
+        feed.max_age = 0
+        subscribe = feed.subscribe
+        feed.subscribe = lambda: subscribe(maxsize=1)
+        service._get_event_list = AsyncMock(
+            side_effect=[
+                events(),
+                events(("e2", "B", 200), ("e1", "A", 100)),
+                events(("e2", "B", 200), ("e1", "A", 100)),
+            ]
+        )
+
+        stream = service.stream_events(EventCursor(50), interval=0)
+        received = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+
+        self.assertEqual([event.event_id for event in received], ["e1", "e2"])
+        self.assertEqual(service._get_event_list.await_args_list[-1].args[1], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
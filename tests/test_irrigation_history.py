@@ -0,0 +1,124 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+from wyzeapy.services.irrigation_history import IrrigationHistory
+from wyzeapy.services.irrigation_service import Irrigation, IrrigationService
+from wyzeapy.types import DeviceTypes
+
+
+def schedule(state, *zone_runs):
+    return {
+        "schedule_state": state,
+        "schedule_name": "Morning",
+        "zone_runs": [
+            {
+                "zone_number": zone,
+                "start_utc": start,
+                "end_utc": end,
+                "duration": duration,
+            }
+            for zone, start, end, duration in zone_runs
+        ],
+    }
+
+
+MONDAY = schedule(
+    "past",
+    (1, "2025-11-03T08:00:00Z", "2025-11-03T08:10:00Z", 600),
+    (2, "2025-11-03T08:10:00Z", "2025-11-03T08:30:00Z", 1200),
+)
+TUESDAY = schedule(
+    "past",
+    (1, "2025-11-04T08:00:00Z", "2025-11-04T08:05:00Z", 300),
+)
+
+
+class TestIrrigationHistory(unittest.TestCase):
+    def setUp(self):
+        self.history = IrrigationHistory()
+        self.addCleanup(self.history.close)
+
+    def test_ingest_deduplicates_runs(self):
+        self.assertEqual(self.history.ingest("MAC", [MONDAY]), 2)
+        # Overlapping responses only add the new runs
+        self.assertEqual(self.history.ingest("MAC", [TUESDAY, MONDAY]), 1)
+        self.assertEqual(self.history.ingest("MAC", [TUESDAY, MONDAY]), 0)
+
+    def test_unfinished_schedules_are_not_stored(self):
+        running = schedule(
+            "running", (3, "2025-11-05T08:00:00Z", "2025-11-05T08:10:00Z", 600)
+        )
+        self.assertEqual(self.history.ingest("MAC", [running]), 0)
+        self.assertIsNone(self.history.last_watered("MAC", 3))
+
+    def test_zone_stats(self):
+        self.history.ingest("MAC", [TUESDAY, MONDAY])
+        self.history.ingest("OTHER", [MONDAY])
+
+        stats = self.history.zone_stats("MAC")
+
+        self.assertEqual(stats.keys(), {1, 2})
+        self.assertEqual(stats[1].runs, 2)
+        self.assertEqual(stats[1].total_minutes, 15)
+        self.assertEqual(
+            stats[1].last_watered, datetime(2025, 11, 4, 8, 5, tzinfo=timezone.utc)
+        )
+        self.assertEqual(stats[2].total_minutes, 20)
+
+        recent = self.history.zone_stats(
+            "MAC", since=datetime(2025, 11, 4, tzinfo=timezone.utc)
+        )
+        self.assertEqual(recent.keys(), {1})
+        self.assertEqual(recent[1].runs, 1)
+
+    def test_history_persists(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "runs.db")
+            with IrrigationHistory(path) as history:
+                history.ingest("MAC", [MONDAY])
+            with IrrigationHistory(path) as history:
+                self.assertEqual(history.ingest("MAC", [MONDAY]), 0)
+                self.assertEqual(history.zone_stats("MAC")[2].runs, 1)
+
+
+class TestIrrigationServiceHistory(unittest.IsolatedAsyncioTestCase):
+    async def test_update_records_runs(self):
+        history = IrrigationHistory()
+        self.addCleanup(history.close)
+        service = IrrigationService(MagicMock(), history=history)
+        service.get_iot_prop = AsyncMock(return_value={"data": {"props": {}}})
+        service.get_zone_by_device = AsyncMock(
+            return_value={"data": {"zones": [{"zone_number": 1}]}}
+        )
+        service.get_schedule_runs = AsyncMock(
+            return_value={"data": {"schedules": [TUESDAY, MONDAY]}}
+        )
+        irrigation = Irrigation(
+            {
+                "mac": "MAC",
+                "product_model": "BS_WK1",
+                "product_type": DeviceTypes.IRRIGATION.value,
+            }
+        )
+
+        ingest = history.ingest
+        threads = []
+
+        def record_thread(*args):
+            threads.append(threading.get_ident())
+            return ingest(*args)
+
+        history.ingest = record_thread
+
+        await service.update(irrigation)
+
+        self.assertEqual(history.zone_stats("MAC")[1].runs, 2)
+        # The database was written off the event loop
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
+import asyncio
 import unittest
 from unittest.mock import AsyncMock, MagicMock
 from datetime import datetime, timezone
-from wyzeapy.services.irrigation_service import IrrigationService, Irrigation, Zone
+from wyzeapy.services.irrigation_service import IrrigationService, Irrigation, Zone, ZoneRunIndex
 from wyzeapy.types import DeviceTypes, IrrigationProps
 
 
@@ -327,3 +328,147 @@ class TestIrrigationService(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(updated_irrigation.sn, 'SNTEST999')
         self.assertEqual(updated_irrigation.ssid, 'TestSSID')
         self.assertFalse(updated_irrigation.available)  # disconnected
+
+    async def test_update_fetches_concurrently(self):
+        mock_irrigation = Irrigation({
+            "product_model": "BS_WK1",
+            "mac": "TEST777",
+            "product_type": DeviceTypes.IRRIGATION.value,
+        })
+        started = []
+        release = asyncio.Event()
+
+        def fetch(name, response):
+            async def call(*args, **kwargs):
+                started.append(name)
+                await release.wait()
+                return response
+            return call
+
+        self.irrigation_service.get_iot_prop.side_effect = fetch(
+            'props', {'data': {'props': {IrrigationProps.IOT_STATE.value: 'connected'}}})
+        self.irrigation_service.get_zone_by_device.side_effect = fetch(
+            'zones', {'data': {'zones': [{'zone_number': 1}]}})
+        self.irrigation_service.get_schedule_runs.side_effect = fetch(
+            'runs', {'data': {'schedules': []}})
+
+        task = asyncio.create_task(self.irrigation_service.update(mock_irrigation))
+        for _ in range(3):
+            await asyncio.sleep(0)
+        # All requests are in flight before any of them returned
+        self.assertEqual(sorted(started), ['props', 'runs', 'zones'])
+        release.set()
+        await task
+
+        self.assertTrue(mock_irrigation.available)
+        self.assertEqual(len(mock_irrigation.zones), 1)
+
+    async def test_update_applies_partial_results(self):
+        mock_irrigation = Irrigation({
+            "product_model": "BS_WK1",
+            "mac": "TEST888",
+            "product_type": DeviceTypes.IRRIGATION.value,
+        })
+        mock_irrigation.zones = [Zone({'zone_number': 1, 'name': 'Known'})]
+        self.irrigation_service.get_iot_prop.return_value = {
+            'data': {'props': {'RSSI': -40, IrrigationProps.IOT_STATE.value: 'connected'}}
+        }
+        self.irrigation_service.get_zone_by_device.side_effect = OSError("timeout")
+        self.irrigation_service.get_schedule_runs.side_effect = OSError("timeout")
+
+        updated_irrigation = await self.irrigation_service.update(mock_irrigation)
+
+        self.assertEqual(updated_irrigation.RSSI, -40)
+        self.assertTrue(updated_irrigation.available)
+        # The zones could not be fetched, so the known ones are kept
+        self.assertEqual(updated_irrigation.zones[0].name, 'Known')
+
+    async def test_update_raises_when_everything_fails(self):
+        mock_irrigation = Irrigation({
+            "product_model": "BS_WK1",
+            "mac": "TEST889",
+            "product_type": DeviceTypes.IRRIGATION.value,
+        })
+        for fetch in (
+            self.irrigation_service.get_iot_prop,
+            self.irrigation_service.get_zone_by_device,
+            self.irrigation_service.get_schedule_runs,
+        ):
+            fetch.side_effect = OSError("offline")
+
+        with self.assertRaises(OSError):
+            await self.irrigation_service.update(mock_irrigation)
+
+    async def test_update_propagates_cancellation(self):
+        mock_irrigation = Irrigation({
+            "product_model": "BS_WK1",
+            "mac": "TEST890",
+            "product_type": DeviceTypes.IRRIGATION.value,
+        })
+        self.irrigation_service.get_iot_prop.side_effect = asyncio.CancelledError()
+        self.irrigation_service.get_zone_by_device.return_value = {'data': {'zones': []}}
+        self.irrigation_service.get_schedule_runs.return_value = {'data': {'schedules': []}}
+
+        with self.assertRaises(asyncio.CancelledError):
+            await self.irrigation_service.update(mock_irrigation)
+
+
+def past_schedule(name, start_utc, end_utc, zone_runs):
+    return {
+        'schedule_state': 'past',
+        'schedule_name': name,
+        'start_utc': start_utc,
+        'end_utc': end_utc,
+        'zone_runs': [
+            {'zone_number': zone_number, 'end_utc': zone_end}
+            for zone_number, zone_end in zone_runs
+        ],
+    }
+
+
+class TestZoneRunIndex(unittest.TestCase):
+    def test_merge_keeps_most_recent_run_per_zone(self):
+        runs = ZoneRunIndex()
+        schedules = [
+            past_schedule('Old', '2025-11-06T08:00:00Z', '2025-11-06T08:20:00Z',
+                          [(1, '2025-11-06T08:10:00Z'), (2, '2025-11-06T08:20:00Z')]),
+            past_schedule('New', '2025-11-07T08:00:00Z', '2025-11-07T08:10:00Z',
+                          [(1, '2025-11-07T08:10:00Z')]),
+            {'schedule_state': 'upcoming', 'start_utc': '2025-11-09T08:00:00Z'},
+            {'schedule_state': 'upcoming', 'start_utc': '2025-11-08T08:00:00Z'},
+        ]
+
+        self.assertEqual(runs.merge(schedules), 2)
+
+        self.assertEqual(runs.last_watered[1], '2025-11-07T08:10:00Z')
+        self.assertEqual(runs.last_watered[2], '2025-11-06T08:20:00Z')
+        self.assertEqual(runs.last_run_end, '2025-11-07T08:10:00Z')
+        self.assertEqual(runs.next_scheduled_run, '2025-11-08T08:00:00Z')
+
+    def test_merge_only_processes_new_past_schedules(self):
+        runs = ZoneRunIndex()
+        first = past_schedule('A', '2025-11-06T08:00:00Z', '2025-11-06T08:10:00Z',
+                              [(1, '2025-11-06T08:10:00Z')])
+        runs.merge([first])
+
+        second = past_schedule('B', '2025-11-07T08:00:00Z', '2025-11-07T08:10:00Z',
+                               [(1, '2025-11-07T08:10:00Z')])
+        self.assertEqual(runs.merge([second, first]), 1)
+        self.assertEqual(runs.last_watered[1], '2025-11-07T08:10:00Z')
+
+        # Runs that left the response window keep their merged result
+        self.assertEqual(runs.merge([]), 0)
+        self.assertEqual(runs.last_watered[1], '2025-11-07T08:10:00Z')
+        self.assertIsNone(runs.next_scheduled_run)
+
+    def test_running_zones_come_from_latest_response(self):
+        runs = ZoneRunIndex()
+        running = {
+            'schedule_state': 'running',
+            'zone_runs': [{'zone_number': 3, 'end_utc': '2025-11-07T08:10:00Z'}],
+        }
+        runs.merge([running])
+        self.assertIn(3, runs.running)
+
+        runs.merge([])
+        self.assertEqual(runs.running, {})
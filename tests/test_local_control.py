@@ -0,0 +1,255 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from aiohttp import ClientConnectionError, ClientResponseError, web
+from aiohttp.test_utils import TestServer, unused_port
+from wyzeapy.services.bulb_service import Bulb, BulbService
+from wyzeapy.services.local_control import LocalControl
+from wyzeapy.types import DeviceTypes, PropertyIDs
+from wyzeapy.utils import wyze_decrypt, wyze_encrypt
+
+KEY = "0123456789abcdef"
+
+
+def make_bulb(mac="AA:BB", ip="127.0.0.1"):
+    bulb = Bulb(
+        {
+            "mac": mac,
+            "nickname": mac,
+            "product_type": DeviceTypes.MESH_LIGHT.value,
+            "product_model": "WLPA19C",
+            "device_params": {"ip": ip},
+        }
+    )
+    bulb.enr = KEY
+    return bulb
+
+
+class TestLocalControl(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.received = []
+        self.peers = set()
+
+        self.status = {"plist": [{"pid": "P3", "pvalue": "1"}]}
+
+        async def device_request(request):
+            self.peers.add(request.transport.get_extra_info("peername"))
+            payload = json.loads(await request.text())
+            self.received.append(payload)
+            if payload["request"] == "get_status":
+                if self.status is None:
+                    return web.Response(status=404)
+                return web.json_response(
+                    {"characteristics": wyze_encrypt(KEY, json.dumps(self.status))}
+                )
+            return web.json_response({"status": "ok"})
+
+        app = web.Application()
+        app.router.add_post("/device_request", device_request)
+        self.server = TestServer(app, host="127.0.0.1")
+        await self.server.start_server()
+        patcher = patch(
+            "wyzeapy.services.local_control.LOCAL_CONTROL_PORT", self.server.port
+        )
+        patcher.start()
+        self.addAsyncCleanup(self.server.close)
+        self.addCleanup(patcher.stop)
+
+        self.local_control = LocalControl(failure_threshold=2)
+        self.addAsyncCleanup(self.local_control.close)
+
+    async def test_send_reuses_connection(self):
+        bulb = make_bulb()
+        plist = [{"pid": "P3", "pvalue": "1"}]
+
+        for _ in range(3):
+            await self.local_control.send(bulb, plist)
+
+        self.assertEqual(len(self.received), 3)
+        self.assertEqual(len(self.peers), 1)
+        characteristics = self.received[0]["characteristics"].replace("\\/", "/")
+        decrypted = json.loads(wyze_decrypt(KEY, characteristics).rstrip("\x05"))
+        self.assertEqual(decrypted["mac"], "AA:BB")
+        self.assertEqual(decrypted["plist"], plist)
+
+    async def test_send_many(self):
+        bulbs = [make_bulb("A"), make_bulb("B")]
+
+        results = await self.local_control.send_many(
+            [(bulb, [{"pid": "P3", "pvalue": "0"}]) for bulb in bulbs]
+        )
+
+        self.assertEqual(results, {"A": None, "B": None})
+        self.assertEqual(len(self.received), 2)
+
+    async def test_send_many_propagates_cancellation(self):
+        bulbs = [make_bulb("A"), make_bulb("B")]
+        self.local_control.send = AsyncMock(
+            side_effect=[None, asyncio.CancelledError()]
+        )
+
+        with self.assertRaises(asyncio.CancelledError):
+            await self.local_control.send_many([(bulb, []) for bulb in bulbs])
+
+    async def test_failure_threshold(self):
+        bulb = make_bulb()
+        with patch("wyzeapy.services.local_control.LOCAL_CONTROL_PORT", unused_port()):
+            with self.assertRaises(ClientConnectionError):
+                await self.local_control.send(bulb, [])
+            self.assertFalse(bulb.cloud_fallback)
+            self.assertEqual(self.local_control.failures(bulb), 1)
+
+            with self.assertRaises(ClientConnectionError):
+                await self.local_control.send(bulb, [])
+            self.assertTrue(bulb.cloud_fallback)
+
+    async def test_success_resets_failures(self):
+        bulb = make_bulb()
+        with patch("wyzeapy.services.local_control.LOCAL_CONTROL_PORT", unused_port()):
+            with self.assertRaises(ClientConnectionError):
+                await self.local_control.send(bulb, [])
+        await self.local_control.send(bulb, [])
+        self.assertEqual(self.local_control.failures(bulb), 0)
+
+    async def test_check_and_recover(self):
+        bulb = make_bulb()
+        bulb.cloud_fallback = True
+
+        await self.local_control.recover([bulb])
+        self.assertFalse(bulb.cloud_fallback)
+
+        with patch("wyzeapy.services.local_control.LOCAL_CONTROL_PORT", unused_port()):
+            self.assertFalse(await self.local_control.check(bulb))
+            bulb.cloud_fallback = True
+            # Checked recently, so no new attempt
+            self.local_control.check = AsyncMock()
+            await self.local_control.recover([bulb])
+            self.local_control.check.assert_not_awaited()
+
+    async def test_get_status(self):
+        self.status["plist"].append({"pid": "P1501", "pvalue": "80"})
+        self.status["plist"].append({"pid": "unknown", "pvalue": "?"})
+
+        properties = await self.local_control.get_status(make_bulb())
+
+        self.assertEqual(self.received[0]["request"], "get_status")
+        self.assertEqual(
+            properties,
+            [
+                (PropertyIDs.ON, "1"),
+                (PropertyIDs.BRIGHTNESS, "80"),
+                (PropertyIDs.AVAILABLE, "1"),
+            ],
+        )
+
+    async def test_unreadable_status_is_not_queried_again(self):
+        bulb = make_bulb()
+        self.status = {"something": "else"}
+
+        with self.assertRaises(ValueError):
+            await self.local_control.get_status(bulb)
+        self.assertFalse(self.local_control.supports_status(bulb))
+
+    async def test_rejected_status_does_not_fall_back(self):
+        bulb = make_bulb()
+        self.status = None
+
+        for _ in range(2):
+            with self.assertRaises(ClientResponseError):
+                await self.local_control.get_status(bulb)
+        self.assertFalse(self.local_control.supports_status(bulb))
+        self.assertEqual(self.local_control.failures(bulb), 0)
+        self.assertFalse(bulb.cloud_fallback)
+
+    async def test_unreachable_status_does_not_fall_back(self):
+        bulb = make_bulb()
+        with patch("wyzeapy.services.local_control.LOCAL_CONTROL_PORT", unused_port()):
+            for _ in range(2):
+                with self.assertRaises(ClientConnectionError):
+                    await self.local_control.get_status(bulb)
+        self.assertTrue(self.local_control.supports_status(bulb))
+        self.assertFalse(bulb.cloud_fallback)
+        # The bulb itself is reachable
+        self.assertEqual(self.local_control.failures(bulb), 0)
+
+    async def test_key_follows_enr(self):
+        bulb = make_bulb()
+        self.assertEqual(self.local_control._key(bulb), KEY.encode())
+        bulb.enr = "fedcba9876543210"
+        self.assertEqual(self.local_control._key(bulb), b"fedcba9876543210")
+
+
+class TestBulbServiceLocalCommand(unittest.IsolatedAsyncioTestCase):
+    async def test_falls_back_to_cloud(self):
+        local_control = MagicMock(LocalControl)
+        local_control.send = AsyncMock(side_effect=ClientConnectionError)
+        service = BulbService(MagicMock(), local_control=local_control)
+        service._run_action_list = AsyncMock()
+        bulb = make_bulb()
+        plist = [{"pid": "P3", "pvalue": "1"}]
+
+        await service.turn_on(bulb, local_control=True)
+
+        local_control.send.assert_awaited_once_with(bulb, plist)
+        service._run_action_list.assert_awaited_once_with(bulb, plist)
+
+
+class TestBulbServiceLocalState(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.local_control = MagicMock(LocalControl)
+        self.local_control.supports_status.return_value = True
+        self.local_control.recover = AsyncMock()
+        self.service = BulbService(
+            MagicMock(), local_control=self.local_control, local_state=True
+        )
+        self.service._refresh_device_params = AsyncMock()
+        self.service.get_updated_params = AsyncMock(return_value={"ip": "127.0.0.1"})
+        self.service._get_property_list = AsyncMock(
+            return_value=[(PropertyIDs.ON, "0")]
+        )
+
+    async def test_update_all_reads_locally_first(self):
+        local, unreachable, fallback = make_bulb("A"), make_bulb("B"), make_bulb("C")
+        fallback.cloud_fallback = True
+
+        async def get_status(bulb):
+            if bulb is unreachable:
+                raise ClientConnectionError()
+            return [(PropertyIDs.ON, "1")]
+
+        self.local_control.get_status = AsyncMock(side_effect=get_status)
+
+        await self.service.update_all([local, unreachable, fallback])
+
+        self.assertTrue(local.on)
+        self.assertFalse(unreachable.on)
+        self.assertEqual(
+            [c.args[0] for c in self.service._get_property_list.await_args_list],
+            [unreachable, fallback],
+        )
+
+    async def test_update(self):
+        self.local_control.get_status = AsyncMock(
+            return_value=[(PropertyIDs.ON, "1"), (PropertyIDs.AVAILABLE, "1")]
+        )
+        bulb = make_bulb()
+
+        await self.service.update(bulb)
+
+        self.assertTrue(bulb.on)
+        self.assertTrue(bulb.available)
+        self.service._get_property_list.assert_not_awaited()
+
+    async def test_disabled_by_default(self):
+        self.service.local_state = False
+        self.local_control.get_status = AsyncMock()
+
+        await self.service.update(make_bulb())
+
+        self.local_control.get_status.assert_not_awaited()
+        self.service._get_property_list.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
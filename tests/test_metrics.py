@@ -0,0 +1,215 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from wyzeapy.exceptions import UnknownApiError
+from wyzeapy.metrics import (
+    CombinedHook,
+    Histogram,
+    Metrics,
+    MetricsHook,
+    metrics_middleware,
+    request_size,
+)
+from wyzeapy.pipeline import Request
+from wyzeapy.rate_limiter import Priority
+from wyzeapy.services.update_manager import DeviceUpdater, UpdateManager
+from wyzeapy.types import Device
+from wyzeapy.utils import check_for_errors_iot, check_for_errors_standard
+from wyzeapy.wyze_auth_lib import WyzeAuthLib, Token
+
+
+def session_mock(status=200, content_length=42, body=None):
+    response = AsyncMock()
+    response.status = status
+    response.content_length = content_length
+    response.json.return_value = body if body is not None else {"code": "1"}
+    session = AsyncMock()
+    session.closed = False
+    session.json_serialize = json.dumps
+    session.request.return_value = response
+    return MagicMock(return_value=session)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_record_and_quantile(self):
+        histogram = Histogram(bounds=(0.1, 1.0))
+        for value in (0.05, 0.05, 0.5, 5.0):
+            histogram.record(value)
+
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.mean, 1.4)
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.75), 1.0)
+        self.assertEqual(histogram.quantile(1.0), float("inf"))
+
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.quantile(0.99), 0.0)
+        self.assertEqual(histogram.mean, 0.0)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_snapshot(self):
+        metrics = Metrics()
+        request = Request("POST", "https://api.wyzecam.com/app/v2/x?a=1")
+        metrics.on_request(request, 200, 0.02, 10, 100, None)
+        metrics.on_request(request, None, 0.5, 10, None, OSError())
+        metrics.on_api_error("standard", "2001")
+        metrics.on_retry(request, 2, 0.1)
+        metrics.on_token_refresh()
+        metrics.on_scheduler_lag(0.3)
+        metrics.on_rate_limit_wait(request, Priority.POLL, 0.2)
+
+        snapshot = metrics.snapshot()
+        endpoint = snapshot["endpoints"]["api.wyzecam.com/app/v2/x"]
+        self.assertEqual(endpoint["count"], 2)
+        self.assertEqual(endpoint["errors"], 1)
+        self.assertEqual(endpoint["statuses"], {200: 1})
+        self.assertEqual(endpoint["bytes_sent"], 20)
+        self.assertEqual(endpoint["bytes_received"], 100)
+        self.assertEqual(snapshot["api_errors"], {"standard:2001": 1})
+        self.assertEqual(snapshot["retries"], {"api.wyzecam.com/app/v2/x": 1})
+        self.assertEqual(snapshot["token_refreshes"], 1)
+        self.assertEqual(snapshot["scheduler_lag"]["count"], 1)
+        self.assertEqual(snapshot["rate_limit_wait"]["poll"]["count"], 1)
+        self.assertEqual(metrics.request_count, 2)
+
+        metrics.reset()
+        self.assertEqual(metrics.request_count, 0)
+
+    def test_combined_hook(self):
+        first, second = Metrics(), Metrics()
+        hook = CombinedHook(first, second)
+        hook.on_token_refresh()
+        hook.on_api_error("iot", 3)
+        self.assertEqual(first.token_refreshes, 1)
+        self.assertEqual(second.api_errors, {("iot", "3"): 1})
+
+    def test_request_size(self):
+        self.assertEqual(request_size(Request("GET", "http://x")), 0)
+        self.assertEqual(request_size(Request("POST", "http://x", json={"a": 1})), 8)
+        self.assertEqual(request_size(Request("POST", "http://x", data="abc")), 3)
+        self.assertEqual(request_size(Request("POST", "http://x", data={"a": "b"})), 3)
+
+
+class TestMetricsMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def test_records_errors(self):
+        hook = MagicMock(spec=MetricsHook)
+        stage = metrics_middleware(hook)
+        handler = AsyncMock(side_effect=asyncio.TimeoutError)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await stage(Request("GET", "http://x"), handler)
+
+        args = hook.on_request.call_args.args
+        self.assertIsNone(args[1])
+        self.assertIsInstance(args[5], asyncio.TimeoutError)
+
+
+class TestAuthLibMetrics(unittest.IsolatedAsyncioTestCase):
+    def test_disabled_by_default(self):
+        auth_lib = WyzeAuthLib()
+        self.assertIsNone(auth_lib.metrics)
+        self.assertEqual(auth_lib.middlewares[-1], auth_lib._log_request)
+
+    def test_install_and_remove(self):
+        stages = WyzeAuthLib().middlewares
+        auth_lib = WyzeAuthLib(metrics=Metrics())
+        self.assertEqual(len(auth_lib.middlewares), len(stages) + 1)
+        self.assertEqual(auth_lib.middlewares[-2], auth_lib._log_request)
+
+        auth_lib.metrics = Metrics()
+        self.assertEqual(len(auth_lib.middlewares), len(stages) + 1)
+
+        auth_lib.metrics = None
+        self.assertEqual(auth_lib.middlewares[-1], auth_lib._log_request)
+        self.assertEqual(len(auth_lib.middlewares), len(stages))
+
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=session_mock)
+    async def test_records_requests(self, mock_session):
+        metrics = Metrics()
+        auth_lib = WyzeAuthLib(metrics=metrics)
+        await auth_lib.post("https://api.wyzecam.com/app/v2/x", json={"a": 1})
+
+        stats = metrics.endpoints["api.wyzecam.com/app/v2/x"]
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(stats.statuses, {200: 1})
+        self.assertEqual(stats.bytes_sent, 8)
+        self.assertEqual(stats.bytes_received, 42)
+
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=session_mock)
+    async def test_body_serialized_once(self, mock_session):
+        metrics = Metrics()
+        auth_lib = WyzeAuthLib(metrics=metrics)
+        dumps = MagicMock(wraps=json.dumps)
+        mock_session.return_value.json_serialize = dumps
+        await auth_lib.post("https://api.wyzecam.com/app/v2/x", json={"a": 1})
+
+        dumps.assert_called_once_with({"a": 1})
+        self.assertEqual(metrics.endpoints["api.wyzecam.com/app/v2/x"].bytes_sent, 8)
+
+    @patch(
+        "wyzeapy.wyze_auth_lib.ClientSession",
+        new_callable=lambda: session_mock(
+            body={"code": "1", "data": {"access_token": "a", "refresh_token": "r"}}
+        ),
+    )
+    async def test_records_token_refresh(self, mock_session):
+        metrics = Metrics()
+        auth_lib = WyzeAuthLib(
+            token=Token("old", "refresh"),
+            token_callback=AsyncMock(),
+            metrics=metrics,
+        )
+        await auth_lib.refresh()
+        self.assertEqual(metrics.token_refreshes, 1)
+
+    def test_records_api_errors(self):
+        metrics = Metrics()
+        service = MagicMock()
+        service._auth_lib.metrics = metrics
+
+        with self.assertRaises(UnknownApiError):
+            check_for_errors_standard(service, {"code": "5000", "msg": "boom"})
+        with self.assertRaises(UnknownApiError):
+            check_for_errors_iot(service, {"code": 5000})
+
+        self.assertEqual(
+            metrics.api_errors, {("standard", "5000"): 1, ("iot", "5000"): 1}
+        )
+
+    def test_offline_device_is_not_an_api_error(self):
+        hook = MagicMock(spec=MetricsHook)
+        service = MagicMock()
+        service._auth_lib.metrics = hook
+
+        check_for_errors_standard(service, {"code": "3019", "msg": ""})
+
+        hook.on_api_error.assert_not_called()
+
+
+class TestSchedulerLag(unittest.IsolatedAsyncioTestCase):
+    async def test_reports_dispatch_lag(self):
+        hook = MagicMock(spec=MetricsHook)
+        manager = UpdateManager(metrics=hook)
+        service = MagicMock()
+        service.update = AsyncMock(side_effect=lambda device: device)
+        device = Device({"mac": "A", "nickname": "A"})
+        manager.add_updater(DeviceUpdater(service, device, 60, MagicMock()))
+        manager.start()
+        try:
+            for _ in range(10):
+                await asyncio.sleep(0)
+                if hook.on_scheduler_lag.called:
+                    break
+        finally:
+            await manager.stop()
+
+        (lag,) = hook.on_scheduler_lag.call_args.args
+        self.assertGreaterEqual(lag, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
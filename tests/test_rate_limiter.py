@@ -0,0 +1,133 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from wyzeapy.metrics import MetricsHook
+from wyzeapy.pipeline import Request
+from wyzeapy.rate_limiter import (
+    HostLimiter,
+    Priority,
+    RateLimiter,
+    RateLimitPolicy,
+    TokenBucket,
+    request_priority,
+)
+
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0, 1)
+        with self.assertRaises(ValueError):
+            TokenBucket(1, 0)
+
+    def test_try_acquire(self):
+        bucket = TokenBucket(rate=0.001, capacity=2)
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+    def test_put(self):
+        bucket = TokenBucket(rate=0.001, capacity=2)
+        bucket.try_acquire(2)
+        bucket.put(0.5)
+        self.assertAlmostEqual(bucket.tokens, 0.5, places=2)
+        bucket.put(5)
+        self.assertEqual(bucket.tokens, 2)
+
+    async def test_acquire_waits_for_refill(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        self.assertLess(await bucket.acquire(), 0.01)
+
+        waited = await bucket.acquire()
+        self.assertGreater(waited, 0.01)
+
+    async def test_acquire_more_than_capacity(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        with self.assertRaises(ValueError):
+            await bucket.acquire(2)
+
+    async def test_acquire_serves_waiters_in_order(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        bucket.try_acquire()
+        order = []
+
+        async def waiter(name):
+            await bucket.acquire()
+            order.append(name)
+
+        await asyncio.gather(waiter("first"), waiter("second"), waiter("third"))
+        self.assertEqual(order, ["first", "second", "third"])
+
+
+class TestHostLimiter(unittest.IsolatedAsyncioTestCase):
+    @staticmethod
+    def release_one(limiter):
+        """Hand out one token now instead of waiting for the refill timer."""
+        limiter._timer.cancel()
+        limiter.bucket.put(1)
+        limiter._release()
+
+    async def test_commands_preempt_polls(self):
+        # Too slow to refill during the test, so tokens only come from release_one
+        limiter = HostLimiter(rate=0.001, capacity=1)
+        await limiter.acquire()
+        order = []
+
+        async def waiter(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+
+        polls = [
+            asyncio.create_task(waiter(f"poll{i}", Priority.POLL)) for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        command = asyncio.create_task(waiter("command", Priority.COMMAND))
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.waiting, 4)
+
+        for _ in range(4):
+            self.release_one(limiter)
+            await asyncio.sleep(0)
+        await asyncio.gather(*polls, command)
+
+        self.assertEqual(order, ["command", "poll0", "poll1", "poll2"])
+
+    async def test_cancelled_waiter_is_skipped(self):
+        limiter = HostLimiter(rate=200, capacity=1)
+        await limiter.acquire()
+        cancelled = asyncio.create_task(limiter.acquire())
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        self.assertGreater(await waiting, 0)
+        self.assertEqual(limiter.waiting, 0)
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_limits_per_host(self):
+        limiter = RateLimiter(
+            RateLimitPolicy(
+                requests_per_second=1000, burst=5, hosts={"slow.example": (1, 1)}
+            )
+        )
+        self.assertEqual(limiter.get("slow.example").bucket.rate, 1)
+        self.assertEqual(limiter.get("fast.example").bucket.capacity, 5)
+
+    async def test_priority_from_context(self):
+        limiter = RateLimiter(metrics=MagicMock(MetricsHook))
+        handler = AsyncMock(return_value={})
+
+        await limiter(Request("GET", "https://api.wyzecam.com/x"), handler)
+        with request_priority(Priority.POLL):
+            await limiter(Request("GET", "https://api.wyzecam.com/x"), handler)
+        await limiter(
+            Request(
+                "GET", "https://api.wyzecam.com/x", context={"priority": Priority.POLL}
+            ),
+            handler,
+        )
+
+        lanes = [c.args[1] for c in limiter.metrics.on_rate_limit_wait.call_args_list]
+        self.assertEqual(lanes, [Priority.COMMAND, Priority.POLL, Priority.POLL])
+        self.assertEqual(handler.await_count, 3)
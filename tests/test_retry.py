@@ -0,0 +1,142 @@
+import unittest
+from email.utils import formatdate
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+from aiohttp import ClientOSError
+from wyzeapy.metrics import MetricsHook
+from wyzeapy.pipeline import Request
+from wyzeapy.retry import Retry, RetryBudget, RetryPolicy, retry_after
+from wyzeapy.wyze_auth_lib import WyzeAuthLib
+
+PROPERTY_LIST = "https://api.wyzecam.com/app/v2/device/get_property_list"
+LOCK_CONTROL = "https://yd-saas-toc.wyzecam.com/openapi/lock/v1/control"
+
+
+def responding(*outcomes):
+    """Handler returning or raising `outcomes` in turn.
+
+    An outcome is an exception, or a `(status, body, headers)` tuple.
+    """
+    outcomes = list(outcomes)
+
+    async def handler(request):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        status, body, headers = outcome
+        request.context["status"] = status
+        request.context["response_headers"] = headers
+        return body
+
+    return AsyncMock(side_effect=handler)
+
+
+OK = (200, {"code": "1"}, {})
+
+
+@patch("wyzeapy.retry.asyncio.sleep", new_callable=AsyncMock)
+class TestRetry(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.retry = Retry(RetryPolicy(jitter=False), metrics=MagicMock(MetricsHook))
+
+    async def test_retries_idempotent_request(self, sleep):
+        handler = responding(ClientOSError(), (503, {}, {}), OK)
+
+        response = await self.retry(Request("POST", PROPERTY_LIST), handler)
+
+        self.assertEqual(response, {"code": "1"})
+        self.assertEqual(handler.await_count, 3)
+        self.assertEqual([c.args[0] for c in sleep.await_args_list], [0.5, 1.0])
+        self.assertEqual(self.retry.metrics.on_retry.call_count, 2)
+
+    async def test_gives_up_after_max_attempts(self, sleep):
+        handler = responding(ClientOSError(), ClientOSError(), ClientOSError())
+
+        with self.assertRaises(ClientOSError):
+            await self.retry(Request("GET", PROPERTY_LIST), handler)
+        self.assertEqual(handler.await_count, 3)
+
+    async def test_does_not_repeat_commands(self, sleep):
+        handler = responding(ClientOSError(), OK)
+        with self.assertRaises(ClientOSError):
+            await self.retry(Request("POST", LOCK_CONTROL), handler)
+
+        handler = responding((502, {}, {}), OK)
+        self.assertEqual(await self.retry(Request("POST", LOCK_CONTROL), handler), {})
+        sleep.assert_not_awaited()
+
+    async def test_idempotent_context_overrides_path(self, sleep):
+        handler = responding(ClientOSError(), OK)
+        request = Request("POST", LOCK_CONTROL, context={"idempotent": True})
+        self.assertEqual(await self.retry(request, handler), {"code": "1"})
+
+        handler = responding(ClientOSError(), OK)
+        request = Request("GET", PROPERTY_LIST, context={"idempotent": False})
+        with self.assertRaises(ClientOSError):
+            await self.retry(request, handler)
+
+    async def test_rate_limit_honors_retry_after(self, sleep):
+        handler = responding((429, {}, {"Retry-After": "7"}), OK)
+
+        # Rejected requests were never executed, so even commands are retried
+        response = await self.retry(Request("POST", LOCK_CONTROL), handler)
+
+        self.assertEqual(response, {"code": "1"})
+        sleep.assert_awaited_once_with(7.0)
+
+    async def test_rate_limit_code_in_body(self, sleep):
+        self.retry.policy = RetryPolicy(jitter=False, rate_limit_codes=frozenset({"9"}))
+        handler = responding((200, {"code": 9}, {}), OK)
+
+        self.assertEqual(
+            await self.retry(Request("POST", LOCK_CONTROL), handler), {"code": "1"}
+        )
+
+    async def test_long_retry_after_gives_up(self, sleep):
+        handler = responding((503, {"msg": "busy"}, {"Retry-After": "3600"}), OK)
+
+        response = await self.retry(Request("GET", PROPERTY_LIST), handler)
+
+        self.assertEqual(response, {"msg": "busy"})
+        sleep.assert_not_awaited()
+
+    async def test_budget_stops_retry_storm(self, sleep):
+        self.retry.budget = RetryBudget(ratio=0.5, min_per_second=0.001, capacity=1)
+        self.retry.budget.withdraw()
+
+        # Two requests earn one retry between them
+        first = responding(ClientOSError(), ClientOSError())
+        with self.assertRaises(ClientOSError):
+            await self.retry(Request("GET", PROPERTY_LIST), first)
+        second = responding(ClientOSError(), OK)
+        self.assertEqual(
+            await self.retry(Request("GET", PROPERTY_LIST), second), {"code": "1"}
+        )
+        third = responding(ClientOSError(), OK)
+        with self.assertRaises(ClientOSError):
+            await self.retry(Request("GET", PROPERTY_LIST), third)
+        self.assertEqual(sleep.await_count, 1)
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_parse(self):
+        self.assertIsNone(retry_after({}))
+        self.assertIsNone(retry_after(None))
+        self.assertIsNone(retry_after({"Retry-After": "soon"}))
+        self.assertEqual(retry_after({"Retry-After": "2.5"}), 2.5)
+        delay = retry_after({"Retry-After": formatdate(time.time() + 60, usegmt=True)})
+        self.assertAlmostEqual(delay, 60, delta=2)
+
+
+class TestAuthLibRetry(unittest.TestCase):
+    def test_enabled_by_default(self):
+        auth_lib = WyzeAuthLib()
+        self.assertTrue(any(isinstance(m, Retry) for m in auth_lib.middlewares))
+
+    def test_disabled(self):
+        auth_lib = WyzeAuthLib(retry_policy=None)
+        self.assertFalse(any(isinstance(m, Retry) for m in auth_lib.middlewares))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 from unittest.mock import AsyncMock, MagicMock
 from wyzeapy.services.sensor_service import SensorService, Sensor
@@ -13,9 +14,6 @@ class TestSensorService(unittest.IsolatedAsyncioTestCase):
         self.sensor_service.get_updated_params = AsyncMock()
         self.sensor_service.get_object_list = AsyncMock()
 
-        # Reset the class-level subscribers list
-        self.sensor_service._subscribers = []
-
         # Create test sensors
         self.motion_sensor = Sensor(
             {
@@ -112,15 +110,20 @@ class TestSensorService(unittest.IsolatedAsyncioTestCase):
         self.assertIsInstance(sensors[1], Sensor)
         self.sensor_service.get_object_list.assert_awaited_once()
 
+    async def asyncTearDown(self):
+        if self.sensor_service._subscriptions is not None:
+            await self.sensor_service._subscriptions.stop()
+
     async def test_register_for_updates(self):
         mock_callback = MagicMock()
         await self.sensor_service.register_for_updates(
             self.motion_sensor, mock_callback
         )
 
-        self.assertEqual(len(self.sensor_service._subscribers), 1)
-        self.assertEqual(self.sensor_service._subscribers[0][0], self.motion_sensor)
-        self.assertEqual(self.sensor_service._subscribers[0][1], mock_callback)
+        subscribers = self.sensor_service._subscriptions.subscribers
+        self.assertEqual(len(subscribers), 1)
+        self.assertEqual(subscribers[0][0], self.motion_sensor)
+        self.assertEqual(subscribers[0][1], mock_callback)
 
     async def test_deregister_for_updates(self):
         mock_callback = MagicMock()
@@ -129,7 +132,42 @@ class TestSensorService(unittest.IsolatedAsyncioTestCase):
         )
         await self.sensor_service.deregister_for_updates(self.motion_sensor)
 
-        self.assertEqual(len(self.sensor_service._subscribers), 0)
+        self.assertEqual(len(self.sensor_service._subscriptions.subscribers), 0)
+
+    async def test_subscription_polls_at_interval(self):
+        mock_callback = MagicMock()
+        states = iter(["0", "1"])
+
+        async def update(sensor):
+            sensor.device_params["motion_state"] = next(states)
+            return sensor
+
+        self.sensor_service.update = AsyncMock(side_effect=update)
+
+        await self.sensor_service.register_for_updates(
+            self.motion_sensor, mock_callback, interval=0.1
+        )
+        await asyncio.sleep(0.03)
+        mock_callback.assert_called_once_with(self.motion_sensor)
+
+        await asyncio.sleep(0.12)
+        self.assertEqual(mock_callback.call_count, 2)
+        self.assertEqual(self.sensor_service.update.await_count, 2)
+        self.assertEqual(
+            self.motion_sensor.changed_fields, {"device_params.motion_state"}
+        )
+
+    async def test_subscription_skips_unchanged_updates(self):
+        mock_callback = MagicMock()
+        self.sensor_service.update = AsyncMock(return_value=self.motion_sensor)
+
+        await self.sensor_service.register_for_updates(
+            self.motion_sensor, mock_callback, interval=0.05
+        )
+        await asyncio.sleep(0.12)
+
+        self.assertGreaterEqual(self.sensor_service.update.await_count, 2)
+        mock_callback.assert_called_once_with(self.motion_sensor)
 
     async def test_update_with_unknown_property(self):
         self.sensor_service._get_device_info.return_value = {
@@ -0,0 +1,199 @@
+import io
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from wyzeapy import Wyzeapy, snapshot
+from wyzeapy.services.base_service import BaseService
+from wyzeapy.services.bulb_service import Bulb
+from wyzeapy.services.device_registry import DeviceRegistry
+from wyzeapy.services.lock_service import Lock
+from wyzeapy.services.thermostat_service import HVACMode, Thermostat
+from wyzeapy.types import DeviceTypes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def raw_device(mac, product_type, model="MODEL"):
+    return {
+        "mac": mac,
+        "nickname": f"Device {mac}",
+        "product_type": product_type,
+        "product_model": model,
+        "firmware_ver": "1.0",
+        "conn_state": 1,
+        "device_params": {"ip": "10.0.0.2"},
+    }
+
+
+class SnapshotTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.registry = DeviceRegistry()
+        devices = self.registry.update(
+            [
+                raw_device("B1", DeviceTypes.LIGHT.value, "WLPA19"),
+                raw_device("T1", DeviceTypes.THERMOSTAT.value, "CO_EA1"),
+                raw_device("P1", DeviceTypes.PLUG.value, "WLPP1"),
+            ]
+        )
+        bulb = self.registry.wrap(Bulb, devices[0])
+        bulb.on = True
+        bulb.brightness = 80
+        bulb.available = True
+        thermostat = self.registry.wrap(Thermostat, devices[1])
+        thermostat.temperature = 21.5
+        thermostat.hvac_mode = HVACMode.HEAT
+
+        self.wyze = Wyzeapy()
+        self.wyze._service = MagicMock(get_object_list=AsyncMock())
+        self._saved_registry = BaseService._registry
+        BaseService._registry = self.registry
+        self.addCleanup(setattr, BaseService, "_registry", self._saved_registry)
+
+    def column(self, rows, name):
+        index = snapshot.SNAPSHOT_COLUMNS.index(name)
+        return [row[index] for row in rows]
+
+
+class TestSnapshotRows(SnapshotTestCase):
+    async def test_rows_merge_device_views(self):
+        rows = list(await self.wyze.snapshot_rows())
+
+        self.assertEqual(self.column(rows, "mac"), ["B1", "T1", "P1"])
+        self.assertEqual(self.column(rows, "on"), [True, None, None])
+        self.assertEqual(self.column(rows, "brightness"), [80, None, None])
+        self.assertEqual(self.column(rows, "temperature"), [None, 21.5, None])
+        self.assertEqual(self.column(rows, "hvac_mode"), [None, "heat", None])
+        available = self.column(rows, "available")
+        self.assertEqual((available[0], available[2]), (True, False))
+        # The device list was fresh, so nothing was fetched
+        self.wyze._service.get_object_list.assert_not_awaited()
+
+    async def test_stale_registry_is_refreshed(self):
+        self.registry.invalidate()
+        await self.wyze.snapshot_rows()
+        self.wyze._service.get_object_list.assert_awaited_once()
+
+    async def test_string_booleans(self):
+        bulb = self.registry.wrap(Bulb, self.registry.get("B1"))
+        bulb.on = "0"
+        bulb.siren = "1"
+        bulb.motion = 0
+        bulb.detected = "unknown"
+
+        rows = list(await self.wyze.snapshot_rows())
+
+        self.assertEqual(
+            [
+                self.column(rows, name)[0]
+                for name in ("on", "siren", "motion", "detected")
+            ],
+            [False, True, False, None],
+        )
+
+    async def test_view_with_own_raw_dict_is_exported(self):
+        self.registry.update(
+            [device.raw_dict for device in self.registry.devices]
+            + [raw_device("L1", DeviceTypes.LOCK.value, "YD.LO1")]
+        )
+        lock = self.registry.wrap(Lock, self.registry.get("L1"))
+        # As LockService.update does
+        lock.raw_dict = {"onoff_line": 1, "locker_status": {"hardlock": 2}}
+        lock.available = True
+        lock.unlocked = True
+
+        rows = list(await self.wyze.snapshot_rows())
+
+        self.assertEqual(self.column(rows, "mac")[-1], "L1")
+        self.assertEqual(self.column(rows, "available")[-1], True)
+        self.assertEqual(self.column(rows, "unlocked")[-1], True)
+
+    def test_batches(self):
+        self.assertEqual(
+            [len(batch) for batch in snapshot.batches(iter(range(5)), 2)], [2, 2, 1]
+        )
+
+    async def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            await self.wyze.export_snapshot(io.BytesIO(), format="csv")
+
+
+@unittest.skipUnless(pyarrow, "pyarrow is not installed")
+class TestArrowSnapshot(SnapshotTestCase):
+    async def test_parquet_is_written_in_batches(self):
+        sink = io.BytesIO()
+
+        count = await self.wyze.export_snapshot(sink, batch_size=2)
+
+        self.assertEqual(count, 3)
+        sink.seek(0)
+        parquet_file = pyarrow.parquet.ParquetFile(sink)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+        table = parquet_file.read()
+        self.assertEqual(table.column_names, list(snapshot.SNAPSHOT_COLUMNS))
+        self.assertEqual(table["brightness"].to_pylist(), [80, None, None])
+        self.assertEqual(table["hvac_mode"].to_pylist(), [None, "heat", None])
+
+    async def test_rows_are_built_per_batch(self):
+        built = []
+        device_rows = snapshot.rows
+
+        def rows(devices):
+            for row in device_rows(devices):
+                built.append(row)
+                yield row
+
+        written = []
+        write = snapshot.SnapshotWriter.write
+
+        def record(writer, batch):
+            written.append((len(batch), len(built)))
+            return write(writer, batch)
+
+        with (
+            patch.object(snapshot, "rows", rows),
+            patch.object(snapshot.SnapshotWriter, "write", record),
+        ):
+            await self.wyze.export_snapshot(io.BytesIO(), batch_size=2)
+
+        # (rows in the batch, rows built so far) at each write
+        self.assertEqual(written, [(2, 2), (1, 3)])
+
+    async def test_arrow_stream(self):
+        sink = io.BytesIO()
+
+        await self.wyze.export_snapshot(sink, format="arrow")
+
+        table = pyarrow.ipc.open_stream(sink.getvalue()).read_all()
+        self.assertEqual(table["mac"].to_pylist(), ["B1", "T1", "P1"])
+        self.assertEqual(table.schema, snapshot.arrow_schema())
+
+
+@unittest.skipUnless(numpy, "numpy is not installed")
+class TestNumpySnapshot(SnapshotTestCase):
+    async def test_structured_array(self):
+        array = await self.wyze.snapshot_array()
+
+        self.assertEqual(array.dtype.names, snapshot.SNAPSHOT_COLUMNS)
+        self.assertEqual(list(array["mac"]), ["B1", "T1", "P1"])
+        self.assertEqual(list(array["on"]), [1, -1, -1])
+        self.assertEqual(array["temperature"][1], 21.5)
+        self.assertTrue(numpy.isnan(array["temperature"][0]))
+        self.assertEqual(list(array["hvac_mode"]), ["", "heat", ""])
+
+    async def test_structured_array_in_batches(self):
+        array = await self.wyze.snapshot_array(batch_size=1)
+
+        self.assertEqual(list(array["mac"]), ["B1", "T1", "P1"])
+        self.assertEqual(list(array["hvac_mode"]), ["", "heat", ""])
+        self.assertEqual(array.dtype["hvac_mode"], numpy.dtype("U4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -50,6 +50,30 @@ class TestSwitchService(unittest.IsolatedAsyncioTestCase):
         self.assertFalse(updated_switch.on)
         self.assertTrue(updated_switch.available)
 
+    async def test_update_all(self):
+        other_switch = Switch(
+            {
+                "product_type": DeviceTypes.PLUG.value,
+                "product_model": "WLPP1",
+                "mac": "SWITCH456",
+                "device_params": {},
+            }
+        )
+
+        async def get_property_list(switch):
+            if switch.mac == "SWITCH456":
+                raise Exception("Test Exception")
+            return [(PropertyIDs.ON, "1"), (PropertyIDs.AVAILABLE, "1")]
+
+        self.switch_service._get_property_list.side_effect = get_property_list
+
+        await self.switch_service.update_all([self.test_switch, other_switch])
+
+        self.assertTrue(self.test_switch.on)
+        self.assertTrue(self.test_switch.available)
+        self.assertFalse(other_switch.on)
+        self.assertEqual(self.switch_service.get_updated_params.await_count, 2)
+
     async def test_get_switches(self):
         mock_plug = MagicMock()
         mock_plug.type = DeviceTypes.PLUG
@@ -91,6 +115,45 @@ class TestSwitchService(unittest.IsolatedAsyncioTestCase):
             self.test_switch, PropertyIDs.ON.value, "0"
         )
 
+    async def test_turn_on_group(self):
+        self.switch_service._post_action_list = AsyncMock()
+        other = Switch(
+            {
+                "product_type": DeviceTypes.PLUG.value,
+                "product_model": "WLPP1",
+                "mac": "SWITCH456",
+                "nickname": "Other Switch",
+            }
+        )
+
+        results = await self.switch_service.turn_on_group([self.test_switch, other])
+
+        self.assertEqual(results, {"SWITCH123": None, "SWITCH456": None})
+        (action_list,) = self.switch_service._post_action_list.await_args.args
+        self.assertEqual(
+            [(a["instance_id"], a["action_key"]) for a in action_list],
+            [("SWITCH123", "power_on"), ("SWITCH456", "power_on")],
+        )
+        self.switch_service._set_property.assert_not_awaited()
+
+    async def test_turn_off_group_falls_back_per_device(self):
+        self.switch_service._post_action_list = AsyncMock(side_effect=OSError)
+        other = Switch(
+            {
+                "product_type": DeviceTypes.PLUG.value,
+                "product_model": "WLPP1",
+                "mac": "SWITCH456",
+                "nickname": "Other Switch",
+            }
+        )
+        self.switch_service._set_property.side_effect = [None, OSError("offline")]
+
+        results = await self.switch_service.turn_off_group([self.test_switch, other])
+
+        self.assertIsNone(results["SWITCH123"])
+        self.assertIsInstance(results["SWITCH456"], OSError)
+        self.assertEqual(self.switch_service._set_property.await_count, 2)
+
 
 class TestSwitchUsageService(unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
@@ -144,6 +207,74 @@ class TestSwitchUsageService(unittest.IsolatedAsyncioTestCase):
             args[2], expected_end_time, delta=2
         )  # Allow 2ms difference
 
+    async def test_update_fetches_only_new_records(self):
+        day = int(
+            datetime.now()
+            .replace(hour=0, minute=0, second=0, microsecond=0)
+            .timestamp()
+            * 1000
+        )
+        yesterday = day - 24 * 3600 * 1000
+        self.usage_service._get_plug_history.return_value = [
+            {"date_time": yesterday, "data": [10] * 24},
+            {"date_time": day, "data": [5]},
+        ]
+        await self.usage_service.update(self.test_switch)
+
+        self.usage_service._get_plug_history.return_value = [
+            {"date_time": day, "data": [5, 7]},
+        ]
+        updated_switch = await self.usage_service.update(self.test_switch)
+
+        args, _ = self.usage_service._get_plug_history.call_args
+        self.assertEqual(args[1], day)
+        self.assertEqual(updated_switch.usage_history[-1]["data"], [5, 7])
+        cache = self.usage_service.usage(self.test_switch)
+        self.assertEqual(cache.total_kwh(since=day), 0.012)
+
+    async def test_failed_merge_refetches_full_window(self):
+        day = int(
+            datetime.now()
+            .replace(hour=0, minute=0, second=0, microsecond=0)
+            .timestamp()
+            * 1000
+        )
+        yesterday = day - 24 * 3600 * 1000
+        full_window = [
+            {"date_time": yesterday, "data": [10] * 24},
+            {"date_time": day, "data": [5]},
+        ]
+        self.usage_service._get_plug_history.return_value = full_window
+        await self.usage_service.update(self.test_switch)
+
+        self.usage_service._get_plug_history.side_effect = [
+            [{"date_time": day}],
+            full_window,
+        ]
+        updated_switch = await self.usage_service.update(self.test_switch)
+
+        first, second = self.usage_service._get_plug_history.call_args_list[-2:]
+        self.assertEqual(first.args[1], day)
+        self.assertLess(second.args[1], day)
+        self.assertEqual(updated_switch.usage_history, full_window)
+        self.assertEqual(len(self.usage_service.usage(self.test_switch)), 25)
+
+    async def test_usage_series(self):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        self.usage_service._get_plug_history.return_value = [
+            {"date_time": 0, "data": [100, 200]},
+        ]
+        await self.usage_service.update(self.test_switch)
+
+        series = self.usage_service.usage_series()
+
+        self.assertEqual(series.macs, ("SWITCH123",))
+        self.assertEqual(series.total_kwh(), {"SWITCH123": 0.3})
+        self.assertEqual(len(self.usage_service.usage_series([])), 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -42,6 +42,43 @@ class TestTypes(unittest.TestCase):
         self.assertEqual(device.type, DeviceTypes.LIGHT)
         self.assertEqual(str(device), "<Device: DeviceTypes.LIGHT, ABC>")
 
+    def test_device_extra_fields_are_read_lazily(self):
+        data = {
+            "product_type": "Light",
+            "mac": "ABC",
+            "device_params": {},
+            "timezone_name": "America/Chicago",
+        }
+        device = Device(data)
+        self.assertEqual(device.timezone_name, "America/Chicago")
+        self.assertIs(device.raw_dict, data)
+        self.assertFalse(hasattr(device, "parent_device_mac"))
+
+        # Local values take precedence over the API dictionary
+        device.timezone_name = "UTC"
+        self.assertEqual(device.timezone_name, "UTC")
+        self.assertEqual(device.to_dict()["timezone_name"], "UTC")
+        self.assertFalse(device.to_dict()["available"])
+
+    def test_device_update_raw(self):
+        device = Device({"mac": "ABC", "firmware_ver": "1.0", "conn_state": 1})
+        device.available = True
+        device.callback_function = print
+
+        new_data = {"mac": "ABC", "conn_state": 0}
+        device.update_raw(new_data)
+        self.assertIs(device.raw_dict, new_data)
+        self.assertEqual(device.conn_state, 0)
+        self.assertFalse(hasattr(device, "firmware_ver"))
+        self.assertTrue(device.available)
+        self.assertIs(device.callback_function, print)
+
+    def test_api_field_overrides_class_default(self):
+        class Shadowing(Device):
+            door_open = False
+
+        self.assertTrue(Shadowing({"mac": "ABC", "door_open": True}).door_open)
+
     def test_device_type_unknown(self):
         data = {
             "product_type": "UnknownType",
@@ -146,6 +183,11 @@ class TestTypes(unittest.TestCase):
         self.assertEqual(event.event_id, "e1")
         self.assertEqual(event.device_mac, "mac1")
 
+        data["event_seq"] = 7
+        event = Event(data)
+        self.assertEqual(event.event_seq, 7)
+        self.assertEqual(event.to_dict(), data)
+
     def test_hms_status_enum(self):
         self.assertEqual(HMSStatus.HOME.value, "home")
 
@@ -1,7 +1,16 @@
+import asyncio
+import time
 import unittest
-from unittest.mock import AsyncMock, MagicMock, patch
-from wyzeapy.services.update_manager import DeviceUpdater, UpdateManager, MAX_SLOTS
-from wyzeapy.types import Device
+from unittest.mock import AsyncMock, MagicMock
+from wyzeapy.services.update_manager import (
+    DeviceUpdater,
+    UpdateManager,
+    diff,
+    snapshot,
+)
+from wyzeapy.exceptions import CircuitOpenError
+from wyzeapy.services.irrigation_service import Irrigation, Zone
+from wyzeapy.types import Device, DeviceTypes, Event
 
 
 class TestDeviceUpdater(unittest.IsolatedAsyncioTestCase):
@@ -12,188 +21,257 @@ class TestDeviceUpdater(unittest.IsolatedAsyncioTestCase):
         self.mock_device.callback_function = AsyncMock()
 
     def test_init(self):
+        before = time.monotonic()
         updater = DeviceUpdater(self.mock_service, self.mock_device, 60)
         self.assertEqual(updater.service, self.mock_service)
         self.assertEqual(updater.device, self.mock_device)
-        self.assertEqual(updater.update_in, 0)
-        self.assertEqual(updater.updates_per_interval, 5)  # ceil(300/60)
+        self.assertEqual(updater.interval, 60)
+        self.assertFalse(updater.cancelled)
+        # Due immediately
+        self.assertGreaterEqual(updater.next_due, before)
+        self.assertLessEqual(updater.next_due, time.monotonic())
 
-    async def test_update_when_ready(self):
+    async def test_update(self):
         updater = DeviceUpdater(self.mock_service, self.mock_device, 60)
-        updater.update_in = 0
         self.mock_service.update = AsyncMock(return_value=self.mock_device)
-        mock_mutex = MagicMock()
-        mock_mutex.acquire = MagicMock()
-        mock_mutex.release = MagicMock()
 
-        await updater.update(mock_mutex)
+        await updater.update()
 
         self.mock_service.update.assert_awaited_once_with(self.mock_device)
         self.mock_device.callback_function.assert_called_once_with(self.mock_device)
-        mock_mutex.acquire.assert_called_once()
-        mock_mutex.release.assert_called_once()
-        self.assertEqual(
-            updater.update_in, 60
-        )  # Reset to ceil(INTERVAL / updates_per_interval)
-
-    async def test_update_when_not_ready(self):
-        updater = DeviceUpdater(self.mock_service, self.mock_device, 60)
-        updater.update_in = 3
-        self.mock_service.update = AsyncMock()
-        mock_mutex = MagicMock()
-        mock_mutex.acquire = MagicMock()
-        mock_mutex.release = MagicMock()
-
-        await updater.update(mock_mutex)
-
-        self.mock_service.update.assert_not_awaited()
-        self.mock_device.callback_function.assert_not_called()
-        mock_mutex.acquire.assert_not_called()
-        mock_mutex.release.assert_not_called()
-        self.assertEqual(updater.update_in, 2)  # update_in reduced by 1
 
     async def test_update_exception_handling(self):
         updater = DeviceUpdater(self.mock_service, self.mock_device, 60)
-        updater.update_in = 0
         self.mock_service.update = AsyncMock(side_effect=Exception("Test Exception"))
-        mock_mutex = MagicMock()
-        mock_mutex.acquire = MagicMock()
-        mock_mutex.release = MagicMock()
 
-        await updater.update(mock_mutex)
+        await updater.update()
 
         self.mock_service.update.assert_awaited_once_with(self.mock_device)
         self.mock_device.callback_function.assert_not_called()
-        mock_mutex.acquire.assert_called_once()
-        mock_mutex.release.assert_called_once()
-        self.assertEqual(updater.update_in, 60)  # Still resets update_in
 
-    def test_tick_tock(self):
-        updater = DeviceUpdater(self.mock_service, self.mock_device, 60)
-        updater.update_in = 5
-        updater.tick_tock()
-        self.assertEqual(updater.update_in, 4)
+    async def test_update_with_open_circuit_marks_device_unavailable(self):
+        device = Device({"mac": "A", "nickname": "A"})
+        device.available = True
+        callback = MagicMock()
+        updater = DeviceUpdater(self.mock_service, device, 60, callback)
+        self.mock_service.update = AsyncMock(return_value=device)
+        await updater.update()
+
+        self.mock_service.update.side_effect = CircuitOpenError("api.wyzecam.com", 30)
+        self.assertTrue(await updater.update())
+
+        self.assertFalse(device.available)
+        self.assertEqual(device.changed_fields, frozenset({"available"}))
+        self.assertEqual(callback.call_count, 2)
+        self.assertEqual(updater.update_count, 1)
+
+    async def test_update_skips_callback_without_changes(self):
+        device = Device({"mac": "ABC", "nickname": "Bulb", "device_params": {"on": 1}})
+        callback = MagicMock()
+        self.mock_service.update = AsyncMock(return_value=device)
+        updater = DeviceUpdater(self.mock_service, device, 60, callback)
+
+        self.assertTrue(await updater.update())  # First update always notifies
+        self.assertFalse(await updater.update())
+        callback.assert_called_once_with(device)
+        self.assertEqual(updater.update_count, 2)
+        self.assertEqual(updater.suppressed_count, 1)
+
+        device.device_params["on"] = 0
+        device.available = True
+        self.assertTrue(await updater.update())
+        self.assertEqual(callback.call_count, 2)
+        self.assertEqual(device.changed_fields, {"device_params.on", "available"})
+
+    def test_snapshot(self):
+        device = Device(
+            {"mac": "ABC", "nickname": "Cam", "device_params": {"ip": "10.0.0.2"}}
+        )
+        device.last_event = Event({"event_id": "1", "event_ts": 100})
+        state = snapshot(device)
 
-        updater.update_in = 0
-        updater.tick_tock()
-        self.assertEqual(updater.update_in, 0)  # Should not go below 0
+        self.assertNotIn("raw_dict", state)
+        self.assertEqual(state["device_params.ip"], "10.0.0.2")
+        self.assertEqual(state["last_event"], {"event_id": "1", "event_ts": 100})
 
-    def test_delay(self):
+        # In-place mutation does not leak into an earlier snapshot
+        device.device_params["ip"] = "10.0.0.3"
+        device.last_event.event_ts = 200
+        self.assertEqual(
+            diff(state, snapshot(device)), {"device_params.ip", "last_event"}
+        )
+
+    def test_snapshot_of_zones(self):
+        device = Irrigation(
+            {"mac": "IR1", "product_type": DeviceTypes.IRRIGATION.value}
+        )
+        device.zones = [Zone({"zone_number": 1}), Zone({"zone_number": 2})]
+        state = snapshot(device)
+
+        # Rebuilt but equal zones are not a change
+        device.zones = [Zone({"zone_number": 1}), Zone({"zone_number": 2})]
+        self.assertEqual(diff(state, snapshot(device)), frozenset())
+
+        device.zones[1].is_running = True
+        self.assertEqual(diff(state, snapshot(device)), {"zones"})
+
+    def test_diff(self):
+        self.assertEqual(diff(None, {"a": 1}), {"a"})
+        self.assertEqual(diff({"a": 1}, {"a": 1}), frozenset())
+        self.assertEqual(diff({"a": 1, "b": 2}, {"a": 2, "c": None}), {"a", "b", "c"})
+
+    def test_reschedule(self):
         updater = DeviceUpdater(self.mock_service, self.mock_device, 60)
-        updater.updates_per_interval = 5
-        updater.delay()
-        self.assertEqual(updater.updates_per_interval, 4)
+        updater.next_due = 100.0
 
-        updater.updates_per_interval = 1
-        updater.delay()
-        self.assertEqual(updater.updates_per_interval, 1)  # Should not go below 1
+        updater.reschedule(now=101.0)
+        self.assertEqual(updater.next_due, 160.0)  # Keeps a steady cadence
 
+        updater.reschedule(now=500.0)
+        self.assertEqual(updater.next_due, 500.0)  # Never scheduled in the past
 
-class TestUpdateManager(unittest.IsolatedAsyncioTestCase):
-    def setUp(self):
-        # Reset the class-level attributes before each test
-        UpdateManager.updaters = []
-        UpdateManager.removed_updaters = []
-        self.update_manager = UpdateManager()
-        # For logging assertions
-        import logging
-
-        self.caplog = logging.getLogger("wyzeapy.services.update_manager")
-        self.caplog.setLevel(logging.DEBUG)
-
-    def test_check_if_removed(self):
-        mock_updater1 = MagicMock()
-        mock_updater2 = MagicMock()
-        self.update_manager.removed_updaters.append(mock_updater1)
-
-        self.assertTrue(self.update_manager.check_if_removed(mock_updater1))
-        self.assertFalse(self.update_manager.check_if_removed(mock_updater2))
-
-    @patch("asyncio.sleep", new_callable=AsyncMock)
-    async def test_update_next_no_updaters(self, mock_sleep):
-        with self.assertLogs("wyzeapy.services.update_manager", level="DEBUG") as cm:
-            await self.update_manager.update_next()
-            self.assertIn("No devices to update in queue", cm.output[0])
-        mock_sleep.assert_not_awaited()
-
-    def test_filled_slots(self):
-        updater1 = DeviceUpdater(
-            MagicMock(), MagicMock(), 60
-        )  # updates_per_interval = 5
-        updater2 = DeviceUpdater(
-            MagicMock(), MagicMock(), 150
-        )  # updates_per_interval = 2
-        self.update_manager.updaters.extend([updater1, updater2])
-        self.assertEqual(self.update_manager.filled_slots(), 7)
-
-    def test_decrease_updates_per_interval(self):
-        updater1 = DeviceUpdater(
-            MagicMock(), MagicMock(), 60
-        )  # updates_per_interval = 5
-        updater2 = DeviceUpdater(
-            MagicMock(), MagicMock(), 150
-        )  # updates_per_interval = 2
-        self.update_manager.updaters.extend([updater1, updater2])
-
-        self.update_manager.decrease_updates_per_interval()
-        self.assertEqual(updater1.updates_per_interval, 4)
-        self.assertEqual(updater2.updates_per_interval, 1)
-
-    def test_tick_tock_manager(self):
-        updater1 = DeviceUpdater(MagicMock(), MagicMock(), 60)
-        updater1.update_in = 5
-        updater2 = DeviceUpdater(MagicMock(), MagicMock(), 150)
-        updater2.update_in = 2
-        self.update_manager.updaters.extend([updater1, updater2])
-
-        self.update_manager.tick_tock()
-        self.assertEqual(updater1.update_in, 4)
-        self.assertEqual(updater2.update_in, 1)
-
-    def test_add_updater_success(self):
-        updater = DeviceUpdater(
-            MagicMock(), MagicMock(), 60
-        )  # updates_per_interval = 5
-        self.update_manager.add_updater(updater)
-        self.assertIn(updater, self.update_manager.updaters)
-        self.assertEqual(self.update_manager.filled_slots(), 5)
+    def test_ordering(self):
+        first = DeviceUpdater(MagicMock(), MagicMock(), 60)
+        second = DeviceUpdater(MagicMock(), MagicMock(), 60)
+        second.next_due = first.next_due
+        self.assertLess(first, second)  # Ties go to the older updater
 
-    def test_add_updater_exceeds_max_slots(self):
-        # Directly set updaters to exceed MAX_SLOTS
-        UpdateManager.updaters = [MagicMock()] * (MAX_SLOTS + 1)
+        first.next_due += 1
+        self.assertLess(second, first)
 
-        new_updater = DeviceUpdater(
-            MagicMock(), MagicMock(), 1
-        )  # updates_per_interval = 300
 
-        with self.assertRaises(Exception) as cm:
-            self.update_manager.add_updater(new_updater)
-        self.assertIn(
-            "No more devices can be updated within the rate limit", str(cm.exception)
-        )
+class TestUpdateManager(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.update_manager = UpdateManager(requests_per_second=1000, burst=100)
+
+    async def asyncTearDown(self):
+        await self.update_manager.stop()
 
-    def test_add_updater_reduces_frequency(self):
-        # Add updaters that will cause overflow, forcing frequency reduction
-        updater1 = DeviceUpdater(MagicMock(), MagicMock(), 1)  # 300 updates/interval
-        updater2 = DeviceUpdater(MagicMock(), MagicMock(), 1)  # 300 updates/interval
-        updater3 = DeviceUpdater(MagicMock(), MagicMock(), 1)  # 300 updates/interval
+    def make_updater(self, interval=60, update=None):
+        service = MagicMock()
+        device = MagicMock(spec=Device)
+        device.nickname = "TestDevice"
+        device.callback_function = MagicMock()
+        service.update = update or AsyncMock(return_value=device)
+        return DeviceUpdater(service, device, interval)
 
-        # Set MAX_SLOTS to a small number for easier testing of overflow
-        with patch("wyzeapy.services.update_manager.MAX_SLOTS", 500):
-            self.update_manager.add_updater(updater1)
-            self.update_manager.add_updater(updater2)
-            self.update_manager.add_updater(updater3)
+    def test_add_updater_keeps_heap_order(self):
+        updaters = [self.make_updater() for _ in range(5)]
+        for offset, updater in zip([3, 1, 4, 0, 2], updaters):
+            updater.next_due += offset
+            self.update_manager.add_updater(updater)
 
-            # Check that updates_per_interval has been reduced for existing updaters
-            self.assertLess(updater1.updates_per_interval, 300)
-            self.assertLess(updater2.updates_per_interval, 300)
-            self.assertLess(updater3.updates_per_interval, 300)
+        self.assertIs(self.update_manager.updaters[0], updaters[3])
 
     def test_del_updater(self):
-        updater = DeviceUpdater(MagicMock(), MagicMock(), 60)
-        self.update_manager.updaters.append(updater)
-        self.assertIn(updater, self.update_manager.updaters)
+        updater = self.make_updater()
+        self.update_manager.add_updater(updater)
 
         with self.assertLogs("wyzeapy.services.update_manager", level="DEBUG") as cm:
             self.update_manager.del_updater(updater)
             self.assertIn("Removing device from update queue", cm.output[0])
+        self.assertTrue(updater.cancelled)
+        self.assertNotIn(updater, self.update_manager.updaters)
+
+    def test_del_updater_compacts_lazily(self):
+        updaters = [self.make_updater() for _ in range(4)]
+        for updater in updaters:
+            self.update_manager.add_updater(updater)
+
+        self.update_manager.del_updater(updaters[1])
+        self.assertEqual(len(self.update_manager.updaters), 4)  # Marked only
+
+        self.update_manager.del_updater(updaters[2])
+        self.update_manager.del_updater(updaters[3])
+        self.assertEqual(self.update_manager.updaters, [updaters[0]])
+
+    async def test_dispatches_due_updaters_concurrently(self):
+        release = asyncio.Event()
+        started = []
+
+        async def slow_update(device):
+            started.append(device)
+            await release.wait()
+            return device
+
+        updaters = [self.make_updater(update=slow_update) for _ in range(3)]
+        for updater in updaters:
+            self.update_manager.add_updater(updater)
+
+        self.update_manager.start()
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(started), 3)  # All in flight at the same time
+
+        release.set()
+        await asyncio.sleep(0.05)
+        for updater in updaters:
+            updater.device.callback_function.assert_called_once()
+            self.assertIn(updater, self.update_manager.updaters)  # Rescheduled
+
+    async def test_waits_for_next_deadline(self):
+        updater = self.make_updater(interval=0.1)
+        self.update_manager.add_updater(updater)
+
+        self.update_manager.start()
+        await asyncio.sleep(0.03)
+        self.assertEqual(updater.service.update.await_count, 1)
+        await asyncio.sleep(0.12)
+        self.assertEqual(updater.service.update.await_count, 2)
+
+    async def test_start_with_empty_queue(self):
+        self.update_manager.start()
+        await asyncio.sleep(0.01)
+
+        updater = self.make_updater()
+        self.update_manager.add_updater(updater)
+        await asyncio.sleep(0.01)
+
+        updater.service.update.assert_awaited_once()
+
+    async def test_del_updater_cancels_running_update(self):
+        cancelled = asyncio.Event()
+
+        async def hanging_update(device):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        updater = self.make_updater(update=hanging_update)
+        self.update_manager.add_updater(updater)
+        self.update_manager.start()
+        await asyncio.sleep(0.01)
+
+        self.update_manager.del_updater(updater)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        self.assertNotIn(updater, self.update_manager.updaters)
+
+    async def test_budget_limits_dispatch_rate(self):
+        self.update_manager.set_budget(requests_per_second=10, burst=1)
+        updaters = [self.make_updater() for _ in range(3)]
+        for updater in updaters:
+            self.update_manager.add_updater(updater)
+
+        self.update_manager.start()
+        await asyncio.sleep(0.01)
+        dispatched = sum(u.service.update.await_count for u in updaters)
+        self.assertEqual(dispatched, 1)
+
+        await asyncio.sleep(0.25)
+        dispatched = sum(u.service.update.await_count for u in updaters)
+        self.assertEqual(dispatched, 3)
+
+    async def test_counts_suppressed_updates(self):
+        device = Device({"mac": "ABC", "nickname": "Plug"})
+        service = MagicMock()
+        service.update = AsyncMock(return_value=device)
+        updater = DeviceUpdater(service, device, 0.05, MagicMock())
+        self.update_manager.add_updater(updater)
+
+        self.update_manager.start()
+        await asyncio.sleep(0.12)
+
+        self.assertEqual(self.update_manager.changed_updates, 1)
+        self.assertGreaterEqual(self.update_manager.suppressed_updates, 1)
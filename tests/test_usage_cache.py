@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime, timedelta
+from wyzeapy.services.usage_cache import HOUR_MS, UsageCache
+
+# Local midnight, so that records line up with calendar days
+DAY = int(datetime(2025, 11, 3).timestamp() * 1000)
+
+
+def record(start, values):
+    return {"date_time": start, "data": values}
+
+
+class TestUsageCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = UsageCache()
+
+    def test_merge_replaces_refetched_record(self):
+        self.assertEqual(self.cache.merge([record(DAY, [100, 200])]), 2)
+        # The day's record was still filling up
+        self.assertEqual(self.cache.merge([record(DAY, "[100, 250, 300]")]), 2)
+
+        self.assertEqual(
+            list(self.cache.timestamps), [DAY, DAY + HOUR_MS, DAY + 2 * HOUR_MS]
+        )
+        self.assertEqual(list(self.cache.energy), [100, 250, 300])
+        self.assertEqual(self.cache.last_record_ts, DAY)
+        self.assertEqual(self.cache.records(DAY), [record(DAY, "[100, 250, 300]")])
+
+    def test_unreadable_records_change_nothing(self):
+        self.cache.merge([record(DAY, [100])])
+        with self.assertRaises(KeyError):
+            self.cache.merge([record(DAY + 24 * HOUR_MS, [5]), {"total_power": 1}])
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.last_record_ts, DAY)
+
+    def test_aggregations(self):
+        next_day = int(datetime(2025, 11, 4).timestamp() * 1000)
+        self.cache.merge([record(DAY, [1000, 3000]), record(next_day, [500])])
+
+        self.assertEqual(self.cache.total_kwh(), 4.5)
+        self.assertEqual(self.cache.total_kwh(since=DAY + HOUR_MS), 3.5)
+        self.assertEqual(self.cache.hourly_kwh()[1], (datetime(2025, 11, 3, 1), 3.0))
+        self.assertEqual(
+            self.cache.daily_kwh(),
+            {datetime(2025, 11, 3).date(): 4.0, datetime(2025, 11, 4).date(): 0.5},
+        )
+        self.assertEqual(self.cache.rolling_mean(2), [1.0, 2.0, 1.75])
+
+    def test_retention(self):
+        cache = UsageCache(retention_hours=24)
+        cache.merge([record(DAY, [1] * 24)])
+        cache.merge(
+            [record(DAY + int(timedelta(days=1).total_seconds() * 1000), [2] * 2)]
+        )
+
+        self.assertEqual(len(cache), 25)
+        self.assertEqual(cache.records(0)[0]["data"], [2, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from datetime import timedelta
+from wyzeapy.services.usage_cache import HOUR_MS, UsageCache
+
+try:
+    import numpy as np
+    from wyzeapy.services.usage_series import UsageSeries
+except ImportError:
+    np = None
+
+
+def cache(start, values):
+    usage = UsageCache()
+    usage.merge([{"date_time": start, "data": values}])
+    return usage
+
+
+@unittest.skipUnless(np, "numpy is not installed")
+class TestUsageSeries(unittest.TestCase):
+    def setUp(self):
+        self.series = UsageSeries.from_caches(
+            {
+                "A": cache(0, [100, 200, 300, 400]),
+                "B": cache(2 * HOUR_MS, [50, 50, 50]),
+            }
+        )
+
+    def test_from_caches_aligns_timestamps(self):
+        self.assertEqual(self.series.macs, ("A", "B"))
+        self.assertEqual(
+            self.series.timestamps.tolist(), [i * HOUR_MS for i in range(5)]
+        )
+        np.testing.assert_array_equal(
+            self.series.energy[1], [np.nan, np.nan, 50, 50, 50]
+        )
+
+    def test_totals(self):
+        self.assertEqual(self.series.total_kwh(), {"A": 1.0, "B": 0.15})
+        self.assertEqual(self.series.sum().tolist(), [100, 200, 350, 450, 50])
+
+    def test_resample(self):
+        daily = self.series.resample(timedelta(hours=2))
+
+        self.assertEqual(daily.timestamps.tolist(), [0, 2 * HOUR_MS, 4 * HOUR_MS])
+        np.testing.assert_array_equal(
+            daily.energy, [[300, 700, np.nan], [np.nan, 100, 50]]
+        )
+
+    def test_percentile(self):
+        self.assertEqual(self.series.percentile(50), {"A": 250.0, "B": 50.0})
+        self.assertEqual(
+            self.series["A"].percentile([0, 100])["A"].tolist(), [100, 400]
+        )
+
+    def test_peaks(self):
+        energy = np.ones((2, 50))
+        energy[0, 10] = 20
+        energy[1, 30] = 30
+        energy[1, 31] = 30
+        series = UsageSeries(("A", "B"), np.arange(50) * HOUR_MS, energy)
+
+        self.assertEqual(
+            series.peaks(), [("A", 10 * HOUR_MS, 20.0), ("B", 30 * HOUR_MS, 30.0)]
+        )
+
+    def test_shape_is_checked(self):
+        with self.assertRaises(ValueError):
+            UsageSeries(("A",), np.arange(3), np.ones((2, 3)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest.mock import patch, MagicMock, AsyncMock
 from wyzeapy.wyze_auth_lib import (
@@ -7,27 +8,40 @@ from wyzeapy.wyze_auth_lib import (
     AccessTokenError,
     UnknownApiError,
 )
+import logging
 import time
 import aiohttp  # Import aiohttp
 
 
+def shared_session_mock():
+    # WyzeAuthLib keeps one long-lived session, so the mocked ClientSession
+    # returns a session whose request methods can be awaited directly.
+    session = AsyncMock()
+    session.closed = False
+    session.json_serialize = json.dumps
+    return MagicMock(return_value=session)
+
+
 class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        connector_patcher = patch("wyzeapy.wyze_auth_lib.TCPConnector")
+        self.mock_connector = connector_patcher.start()
+        self.addCleanup(connector_patcher.stop)
+
     def test_initialization(self):
         auth_lib = WyzeAuthLib(username="test_user", password="test_password")
         self.assertEqual(auth_lib._username, "test_user")
         self.assertEqual(auth_lib._password, "test_password")
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_login_success(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.return_value = {
             "access_token": "test_access_token",
             "refresh_token": "test_refresh_token",
         }
-        # The session context manager returns an object that has an async post method
-        mock_session.return_value.__aenter__.return_value.post.return_value = (
-            mock_response
-        )
+        # The shared session exposes an async post method
+        mock_session.return_value.request.return_value = mock_response
 
         # Mock the token_callback
         mock_token_callback = AsyncMock()
@@ -44,7 +58,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
         self.assertIsInstance(token, Token)
         mock_token_callback.assert_called_once_with(token)
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_2fa_sms(self, mock_session):
         # First response indicates 2FA is needed
         mock_2fa_response = AsyncMock()
@@ -58,7 +72,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
         mock_sms_sent_response.json.return_value = {"session_id": "some_new_session_id"}
 
         # Set up the mock session to return the responses in order
-        mock_session.return_value.__aenter__.return_value.post.side_effect = [
+        mock_session.return_value.request.side_effect = [
             mock_2fa_response,
             mock_sms_sent_response,
         ]
@@ -73,7 +87,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(auth_lib.two_factor_type, "SMS")
         self.assertEqual(auth_lib.session_id, "some_new_session_id")
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_2fa_totp(self, mock_session):
         # First response indicates 2FA is needed
         mock_2fa_response = AsyncMock()
@@ -83,9 +97,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
         }
 
         # Set up the mock session to return the responses in order
-        mock_session.return_value.__aenter__.return_value.post.side_effect = [
-            mock_2fa_response
-        ]
+        mock_session.return_value.request.side_effect = [mock_2fa_response]
 
         auth_lib = WyzeAuthLib(username="test_user", password="test_password")
 
@@ -134,16 +146,14 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
         auth_lib = await WyzeAuthLib.create(token=mock_token)
         self.assertEqual(auth_lib.token, mock_token)
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_login_access_token_error(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.return_value = {
             "errorCode": 1000,
             "msg": "Access Token Error",
         }
-        mock_session.return_value.__aenter__.return_value.post.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib(username="test_user", password="test_password")
         with self.assertRaises(AccessTokenError):
@@ -151,13 +161,11 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
                 "test_user", "test_password", "test_key_id", "test_api_key"
             )
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_login_unknown_api_error(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.return_value = {"errorCode": 9999, "msg": "Unknown Error"}
-        mock_session.return_value.__aenter__.return_value.post.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib(username="test_user", password="test_password")
         with self.assertRaises(UnknownApiError):
@@ -165,7 +173,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
                 "test_user", "test_password", "test_key_id", "test_api_key"
             )
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     @patch("wyzeapy.wyze_auth_lib.check_for_errors_standard")
     async def test_refresh_success(self, mock_check_for_errors_standard, mock_session):
         mock_response = AsyncMock()
@@ -173,9 +181,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
             "code": 1,  # ResponseCodes.SUCCESS.value
             "data": {"access_token": "new_access", "refresh_token": "new_refresh"},
         }
-        mock_session.return_value.__aenter__.return_value.post.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         mock_token = Token(
             "old_access", "old_refresh", refresh_time=time.time() - 100
@@ -191,7 +197,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
         mock_token_callback.assert_called_once_with(auth_lib.token)
         mock_check_for_errors_standard.assert_called_once()
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     @patch("wyzeapy.wyze_auth_lib.check_for_errors_standard")
     async def test_refresh_access_token_error(
         self, mock_check_for_errors_standard, mock_session
@@ -207,9 +213,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
             "code": "2001",  # Access Token Error
             "msg": "Refresh Token Error",
         }
-        mock_session.return_value.__aenter__.return_value.post.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         mock_token = Token("old_access", "old_refresh", refresh_time=time.time() - 100)
         auth_lib = WyzeAuthLib(token=mock_token)
@@ -219,7 +223,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
         self.assertTrue(auth_lib.token.expired)
         mock_check_for_errors_standard.assert_called_once()
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     @patch(
         "wyzeapy.wyze_auth_lib.check_for_errors_standard", side_effect=UnknownApiError
     )
@@ -228,9 +232,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
     ):
         mock_response = AsyncMock()
         mock_response.json.return_value = {"code": 9999, "msg": "Unknown Refresh Error"}
-        mock_session.return_value.__aenter__.return_value.post.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         mock_token = Token("old_access", "old_refresh", refresh_time=time.time() - 100)
         auth_lib = WyzeAuthLib(token=mock_token)
@@ -288,67 +290,62 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(sanitized_data["nested"]["non_sensitive"], "value")
         self.assertEqual(sanitized_data["non_sensitive_top"], "another_value")
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_post_success(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.return_value = {"status": "success"}
-        mock_session.return_value.__aenter__.return_value.post.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib()
         result = await auth_lib.post("http://test.com", json={"key": "value"})
         self.assertEqual(result, {"status": "success"})
+        self.assertEqual(mock_session.return_value.request.call_args.args[0], "POST")
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_put_success(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.return_value = {"status": "success"}
-        mock_session.return_value.__aenter__.return_value.put.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib()
         result = await auth_lib.put("http://test.com", json={"key": "value"})
         self.assertEqual(result, {"status": "success"})
+        self.assertEqual(mock_session.return_value.request.call_args.args[0], "PUT")
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_get_success(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.return_value = {"status": "success"}
-        mock_session.return_value.__aenter__.return_value.get.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib()
         result = await auth_lib.get("http://test.com", params={"key": "value"})
         self.assertEqual(result, {"status": "success"})
+        self.assertEqual(mock_session.return_value.request.call_args.args[0], "GET")
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_patch_success(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.return_value = {"status": "success"}
-        mock_session.return_value.__aenter__.return_value.patch.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib()
         result = await auth_lib.patch("http://test.com", json={"key": "value"})
         self.assertEqual(result, {"status": "success"})
+        self.assertEqual(mock_session.return_value.request.call_args.args[0], "PATCH")
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_delete_success(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.return_value = {"status": "success"}
-        mock_session.return_value.__aenter__.return_value.delete.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib()
         result = await auth_lib.delete("http://test.com", json={"key": "value"})
         self.assertEqual(result, {"status": "success"})
+        self.assertEqual(mock_session.return_value.request.call_args.args[0], "DELETE")
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_post_content_type_error(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.side_effect = aiohttp.ContentTypeError(
@@ -357,15 +354,13 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
             message="Not JSON",
             headers=MagicMock(),
         )
-        mock_session.return_value.__aenter__.return_value.post.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib()
         with self.assertRaises(aiohttp.ContentTypeError):
             await auth_lib.post("http://test.com", json={"key": "value"})
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_put_content_type_error(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.side_effect = aiohttp.ContentTypeError(
@@ -374,15 +369,13 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
             message="Not JSON",
             headers=MagicMock(),
         )
-        mock_session.return_value.__aenter__.return_value.put.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib()
         with self.assertRaises(aiohttp.ContentTypeError):
             await auth_lib.put("http://test.com", json={"key": "value"})
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_get_content_type_error(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.side_effect = aiohttp.ContentTypeError(
@@ -391,15 +384,13 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
             message="Not JSON",
             headers=MagicMock(),
         )
-        mock_session.return_value.__aenter__.return_value.get.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib()
         with self.assertRaises(aiohttp.ContentTypeError):
             await auth_lib.get("http://test.com", params={"key": "value"})
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_patch_content_type_error(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.side_effect = aiohttp.ContentTypeError(
@@ -408,15 +399,13 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
             message="Not JSON",
             headers=MagicMock(),
         )
-        mock_session.return_value.__aenter__.return_value.patch.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib()
         with self.assertRaises(aiohttp.ContentTypeError):
             await auth_lib.patch("http://test.com", json={"key": "value"})
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_delete_content_type_error(self, mock_session):
         mock_response = AsyncMock()
         mock_response.json.side_effect = aiohttp.ContentTypeError(
@@ -425,15 +414,13 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
             message="Not JSON",
             headers=MagicMock(),
         )
-        mock_session.return_value.__aenter__.return_value.delete.return_value = (
-            mock_response
-        )
+        mock_session.return_value.request.return_value = mock_response
 
         auth_lib = WyzeAuthLib()
         with self.assertRaises(aiohttp.ContentTypeError):
             await auth_lib.delete("http://test.com", json={"key": "value"})
 
-    @patch("wyzeapy.wyze_auth_lib.ClientSession")
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
     async def test_get_token_with_2fa_sms_success(self, mock_session):
         # Mock the initial login response to indicate SMS 2FA is required
         mock_login_response = AsyncMock()
@@ -454,7 +441,7 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
         mock_sms_sent_response.json.return_value = {"session_id": "some_new_session_id"}
 
         # Set up the mock session to return responses for all calls
-        mock_session.return_value.__aenter__.return_value.post.side_effect = [
+        mock_session.return_value.request.side_effect = [
             mock_login_response,  # First post call in get_token_with_username_password
             mock_sms_sent_response,  # Second post call in get_token_with_username_password
             mock_2fa_verify_response,  # Post call in get_token_with_2fa
@@ -477,6 +464,134 @@ class TestWyzeAuthLib(unittest.IsolatedAsyncioTestCase):
         token = await auth_lib.get_token_with_2fa("123456")
 
         self.assertIsInstance(token, Token)
-        self.assertEqual(token.access_token, auth_lib.SANITIZE_STRING)
-        self.assertEqual(token.refresh_token, auth_lib.SANITIZE_STRING)
+        self.assertEqual(token.access_token, "verified_access_token")
+        self.assertEqual(token.refresh_token, "verified_refresh_token")
         mock_token_callback.assert_called_once_with(token)
+
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
+    async def test_session_is_reused(self, mock_session):
+        mock_response = AsyncMock()
+        mock_response.json.return_value = {"status": "success"}
+        mock_session.return_value.request.return_value = mock_response
+        mock_session.return_value.request.return_value = mock_response
+
+        auth_lib = WyzeAuthLib(connection_limit_per_host=4)
+        await auth_lib.post("http://test.com", json={"key": "value"})
+        await auth_lib.get("http://test.com")
+
+        mock_session.assert_called_once()
+        self.mock_connector.assert_called_once()
+        self.assertEqual(self.mock_connector.call_args.kwargs["limit_per_host"], 4)
+
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
+    async def test_close(self, mock_session):
+
+        async with WyzeAuthLib() as auth_lib:
+            auth_lib._get_session()
+
+        mock_session.return_value.close.assert_awaited_once()
+        self.assertIsNone(auth_lib._session)
+
+    async def test_close_leaves_external_session_open(self):
+        external_session = MagicMock()
+        external_session.closed = False
+        external_session.close = AsyncMock()
+
+        auth_lib = WyzeAuthLib(session=external_session)
+        self.assertIs(auth_lib._get_session(), external_session)
+        await auth_lib.close()
+
+        external_session.close.assert_not_awaited()
+
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
+    async def test_response_decoded_once(self, mock_session):
+        mock_response = AsyncMock()
+        mock_response.json.return_value = {"status": "success"}
+        mock_session.return_value.request.return_value = mock_response
+
+        auth_lib = WyzeAuthLib()
+        with self.assertLogs("wyzeapy.wyze_auth_lib", level="DEBUG"):
+            await auth_lib.post("http://test.com", json={"key": "value"})
+
+        mock_response.json.assert_awaited_once()
+
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
+    async def test_payload_not_sanitized_in_place(self, mock_session):
+        mock_response = AsyncMock()
+        mock_response.json.return_value = {"access_token": "secret"}
+        mock_session.return_value.request.return_value = mock_response
+        payload = {"password": "hunter2", "nested": {"email": "a@b.c"}}
+
+        auth_lib = WyzeAuthLib()
+        with self.assertLogs("wyzeapy.wyze_auth_lib", level="DEBUG") as cm:
+            result = await auth_lib.post("http://test.com", json=payload)
+
+        self.assertEqual(payload["password"], "hunter2")
+        self.assertEqual(payload["nested"]["email"], "a@b.c")
+        self.assertEqual(result["access_token"], "secret")
+        self.assertNotIn("hunter2", "".join(cm.output))
+
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
+    async def test_sanitize_skipped_without_debug(self, mock_session):
+        mock_response = AsyncMock()
+        mock_response.json.return_value = {"status": "success"}
+        mock_session.return_value.request.return_value = mock_response
+
+        auth_lib = WyzeAuthLib()
+        auth_lib.sanitize = MagicMock()
+        with patch.object(
+            logging.getLogger("wyzeapy.wyze_auth_lib"),
+            "isEnabledFor",
+            return_value=False,
+        ):
+            await auth_lib.get("http://test.com")
+
+        auth_lib.sanitize.assert_not_called()
+
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
+    async def test_middleware_order(self, mock_session):
+        mock_response = AsyncMock()
+        mock_response.json.return_value = {"status": "success"}
+        mock_session.return_value.request.return_value = mock_response
+        calls = []
+
+        def make_middleware(name):
+            async def middleware(request, handler):
+                calls.append(name)
+                request.context[name] = True
+                return await handler(request)
+
+            return middleware
+
+        outer = make_middleware("outer")
+        inner = make_middleware("inner")
+        auth_lib = WyzeAuthLib()
+        auth_lib.add_middleware(inner)
+        auth_lib.add_middleware(outer)
+        await auth_lib.get("http://test.com")
+        self.assertEqual(calls, ["outer", "inner"])
+
+        auth_lib.remove_middleware(outer)
+        await auth_lib.get("http://test.com")
+        self.assertEqual(calls, ["outer", "inner", "inner"])
+
+    @patch("wyzeapy.wyze_auth_lib.ClientSession", new_callable=shared_session_mock)
+    async def test_middleware_short_circuit(self, mock_session):
+        async def cached(request, handler):
+            return {"cached": True}
+
+        auth_lib = WyzeAuthLib()
+        auth_lib.add_middleware(cached)
+        result = await auth_lib.post("http://test.com")
+
+        self.assertEqual(result, {"cached": True})
+        mock_session.return_value.request.assert_not_called()
+
+    async def test_middlewares_from_constructor(self):
+        async def cached(request, handler):
+            return {"cached": True}
+
+        auth_lib = WyzeAuthLib(middlewares=[cached])
+        self.assertEqual(auth_lib.middlewares[0], cached)
+        self.assertEqual(auth_lib.middlewares[-1], auth_lib._log_request)
+        self.assertEqual(await auth_lib.get("http://test.com"), {"cached": True})
@@ -172,6 +172,19 @@ async def test_disable_notifications(mock_auth_lib):
     wyze._service.set_push_info.assert_called_once_with(False)
 
 
+@pytest.mark.asyncio
+async def test_close(mock_auth_lib):
+    async with await Wyzeapy.create() as wyze:
+        await wyze.login("test@example.com", "password", "key_id", "api_key")
+    mock_auth_lib.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_close_before_login():
+    wyze = await Wyzeapy.create()
+    await wyze.close()
+
+
 @pytest.mark.asyncio
 async def test_valid_login_success(mock_auth_lib):
     mock_auth_lib.should_refresh = False
@@ -179,6 +192,7 @@ async def test_valid_login_success(mock_auth_lib):
         "test@example.com", "password", "key_id", "api_key"
     )
     assert is_valid is True
+    mock_auth_lib.close.assert_awaited_once()
 
 
 @pytest.mark.asyncio